@@ -1,17 +1,51 @@
 __version__ = "0.1.5"
-from pastesian.schemas import input_schema, output_schema
-from pastesian.action_update_demand import action_update_demand
-from pastesian.main import solve
+from importlib import import_module
+
+# The public names below are only imported when first used, through the module-level __getattr__, so that importing
+# pastesian (e.g., for its *_config dicts or __version__) doesn't pay for ticdat, pandas and pulp
+_lazy_imports = {
+    'input_schema': 'pastesian.schemas',
+    'output_schema': 'pastesian.schemas',
+    'action_update_demand': 'pastesian.action_update_demand',
+    'solve': 'pastesian.main',
+    'solve_many': 'pastesian.batch',
+    'PastesianModel': 'pastesian.model',
+    'SolutionCache': 'pastesian.cache',
+    'sweep_demand': 'pastesian.sweep',
+    'solve_stochastic': 'pastesian.stochastic',
+    'find_integrity_failures': 'pastesian.integrity',
+    'ScenarioOverlay': 'pastesian.overlay',
+    'solve_decomposed': 'pastesian.decomposition',
+    'solve_hierarchical': 'pastesian.hierarchy',
+    }
+
+__all__ = ['input_schema', 'output_schema', 'action_update_demand', 'solve', 'solve_many', 'PastesianModel',
+           'SolutionCache', 'sweep_demand', 'solve_stochastic', 'find_integrity_failures',
+           'ScenarioOverlay', 'solve_decomposed', 'solve_hierarchical']
+
+
+def __getattr__(name):
+    if name not in _lazy_imports:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(_lazy_imports[name]), name)
+    globals()[name] = value  # cached, so later lookups don't go through __getattr__ (this also replaces the
+    # pastesian.action_update_demand submodule, which the import above sets as an attribute, by the function)
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy_imports))
 
-__all__ = ['input_schema', 'output_schema', 'action_update_demand', 'solve']
 
 input_tables_config = {
     'hidden_tables': ['parameters'],
     'categories': dict(),
-    'order': ['time_periods', 'demand', 'costs'],
+    'order': ['time_periods', 'demand', 'costs', 'capacities', 'setups', 'sites', 'product_demand', 'product_costs',
+              'product_inventory', 'scenarios', 'scenario_demand'],
     'tables_display_names': dict(),
     'columns_display_names': {
         'costs': {'Production Cost': 'Production ($/unit)', 'Inventory Cost': 'Inventory ($/unit)'},
+        'capacities': {'Production Capacity': 'Production (units)', 'Inventory Capacity': 'Inventory (units)'},
         },
     'hidden_columns': dict()
     }
@@ -37,6 +71,9 @@ parameters_config = {
         'Inventory Capacity': "Maximum number of lasagnas that can be stored throughout each period. Set it "
                                "to -1 (default) when there isn't such maximum storage",
         'Lasagnas To Be Left': "Number of lasagnas expected at the end of the planning horizon, default=0",
-        'Lasagnas To Start': "Number of lasagnas in the inventory at the beginning of the planning horizon, default=50"
+        'Lasagnas To Start': "Number of lasagnas in the inventory at the beginning of the planning horizon, default=50",
+        'Setup Cost': "Fixed cost of each production run, which makes the model a MIP when positive, default=0",
+        'Minimum Batch Size': "Least number of lasagnas of each production run, which makes the model a MIP when "
+                              "positive, default=0"
         }
     }
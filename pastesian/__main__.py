@@ -6,11 +6,94 @@ This module will be called when "pastesian" package is executed from the command
 Take a look at https://github.com/ticdat/ticdat/tree/master/examples/expert_section/diet_simple_package for an example,
 as well as at standard_main function inside ticdat package. The link https://github.com/ticdat/ticdat/issues/164
 contains an example for running the package and testing data integrity, from command line.
-"""
 
+Besides the formats of standard_main, an input or output directory ending in .parquet, .feather or .arrow is read or
+written in that columnar format, with pastesian.columnar (which requires pyarrow), e.g.:
+
+>> python -m pastesian -i inputs.parquet -o outputs.feather
+
+Input data sets may leave out the optional tables (see pastesian.schemas.OPTIONAL_INPUT_TABLES) without a warning, and
+the optional output tables that are empty (e.g., 'run_stats' or 'diagnostics') are not written.
+
+Finally, `python -m pastesian serve` (or `pastesian serve`, once installed) starts the HTTP/JSON solve service of
+pastesian.server, see `python -m pastesian serve --help`, and `python -m pastesian watch -i <input_directory> -o
+<output_directory>` re-plans whenever the CSV files of the input directory change, see pastesian.watch and
+`python -m pastesian watch --help`.
+"""
+import getopt
+import os
+import sys
 from ticdat import standard_main
 from pastesian import input_schema, output_schema, solve
+from pastesian.columnar import columnar_format, read_columnar, write_columnar
+from pastesian.utils import quiet_optional_tables, without_empty_optional_tables
+
+
+def _read(schema, path):
+    if columnar_format(path):
+        return read_columnar(schema, path)
+    with quiet_optional_tables():
+        if path.endswith('.json'):
+            return schema.json.create_pan_dat(path)
+        if path.endswith(('.xls', '.xlsx')):
+            return schema.xls.create_pan_dat(path)
+        if path.endswith('.db'):
+            return schema.sql.create_pan_dat(path)
+        return schema.csv.create_pan_dat(path)
+
+
+def _write(schema, dat, path):
+    if columnar_format(path):
+        write_columnar(schema, dat, path)
+    elif path.endswith('.json'):
+        schema.json.write_file(dat, path)
+    elif path.endswith(('.xls', '.xlsx')):
+        schema.xls.write_file(dat, path)
+    elif path.endswith('.db'):
+        schema.sql.write_file(dat, path)
+    else:
+        schema.csv.write_directory(dat, path)
+
+
+def main(argv=None):
+    """
+    Command-line entry point. With the -h, -f or -e arguments, it's ticdat's standard_main.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ['serve']:
+        from pastesian.server import main as serve
+        return serve(argv[1:])
+    if argv[:1] == ['watch']:
+        from pastesian.watch import main as watch
+        return watch(argv[1:])
+    opts, _ = getopt.getopt(argv, 'hi:o:f:e:', ['help', 'input=', 'output=', 'foresta=', 'errors='])
+    paths = {option.lstrip('-')[0]: value for option, value in opts}
+    input_file, output_file = paths.get('i', 'input.xlsx'), paths.get('o', 'output.xlsx')
+    if ('f' in paths or 'e' in paths) and (columnar_format(input_file) or columnar_format(output_file)):
+        print('The -f and -e command line arguments are not supported with the columnar formats.')
+        return 2
+    if 'h' in paths or 'f' in paths or 'e' in paths:
+        sys.argv = sys.argv[:1] + argv
+        standard_main(input_schema, output_schema, solve)
+        return 0
+    if not os.path.exists(input_file):
+        print(f'{input_file} is not a valid input file or directory')
+        return 1
+
+    print(f'input data from {input_file}')
+    dat = _read(input_schema, input_file)
+    sln = solve(dat)
+    print(f'output {output_file}')
+    schema, sln = without_empty_optional_tables(sln)
+    _write(schema, sln, output_file)
+    if os.path.isdir(output_file):  # files of the tables not written this time, left by a previous run
+        extension = os.path.splitext(os.path.normpath(output_file))[1] if columnar_format(output_file) else '.csv'
+        for table_name in set(output_schema.all_tables).difference(schema.all_tables):
+            path = os.path.join(output_file, f'{table_name}{extension}')
+            if os.path.exists(path):
+                os.remove(path)
+    return 0
 
 
 if __name__ == "__main__":
-    standard_main(input_schema, output_schema, solve)
+    sys.exit(main())
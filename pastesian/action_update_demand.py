@@ -2,6 +2,7 @@
 This is just an example of input action. It updates the demand using as multiplier the production capacity parameter
 """
 from pastesian import input_schema
+from pastesian.overlay import ScenarioOverlay
 
 
 def action_update_demand(dat):
@@ -11,22 +12,18 @@ def action_update_demand(dat):
 
     Parameters
     ----------
-    dat : PanDat
+    dat : PanDat or ScenarioOverlay
         A PanDat object containing the input data.
 
     Returns
     -------
-    dat : PanDat
-        A PanDat object containing the input data with updated 'Demand' field from 'demand.csv' table.
+    dat : ScenarioOverlay
+        A scenario of the input data with updated 'Demand' field from 'demand.csv' table, which shares all the other
+        tables with dat. Use input_schema.copy_pan_dat on it to get a standalone PanDat.
     """
-    new_dat = input_schema.copy_pan_dat(dat)
-    demand = new_dat.demand.copy()
     multiplier = input_schema.create_full_parameters_dict(dat)['Production Capacity']
-    demand['Demand'] = multiplier * demand['Demand']
+    demand = multiplier * dat.demand['Demand']
 
     # keep demand an integer number, as defined in the input_schema
-    demand = demand.round({'Demand': 0})
-    demand = demand.astype({'Demand': int})
-
-    new_dat.demand = demand
-    return new_dat
+    demand = demand.round(0).astype(int)
+    return ScenarioOverlay(dat, columns={('demand', 'Demand'): demand})
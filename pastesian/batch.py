@@ -0,0 +1,57 @@
+"""
+Batch solving of independent scenarios across a pool of processes.
+
+PanDat objects cannot be pickled (their class is created inside PanDatFactory), so each scenario travels to the worker
+processes as a plain {table_name: DataFrame} dictionary and is rebuilt there, and the same is done with the solution
+on the way back.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pastesian import input_schema, output_schema
+from pastesian.main import solve
+
+
+def _solve_tables(tables, solve_kwargs):
+    """
+    Worker function: rebuild the input PanDat, solve it and return the output tables, or the error that was raised.
+    """
+    try:
+        sln = solve(input_schema.PanDat(**tables), **solve_kwargs)
+    except Exception as e:  # one bad scenario must not kill the whole batch
+        return None, e
+    return {t: getattr(sln, t) for t in output_schema.all_tables}, None
+
+
+def solve_many(dats, workers=None, **solve_kwargs):
+    """
+    Solve many independent scenarios in parallel, yielding each result as soon as it is available.
+
+    Parameters
+    ----------
+    dats : dict or iterable
+        Either a dictionary structured as {scenario_key: dat} or an iterable of dat objects, in which case the position
+        of each dat is used as its key. Each dat is a PanDat object compatible with the input_schema.
+    workers : int, optional
+        Number of worker processes, defaults to os.cpu_count().
+    **solve_kwargs
+        Keyword arguments passed along to solve() for every scenario, e.g., engine='flow'.
+
+    Yields
+    ------
+    key : hashable
+        The key of the scenario, as defined above.
+    sln : PanDat
+        A PanDat object containing the output data, compatible with the output schema, or None when solve() raised.
+    error : Exception
+        The exception raised by solve() for this scenario (typically a ValueError from the 'Period ID' checks), or
+        None when the scenario was solved.
+    """
+    items = dats.items() if isinstance(dats, dict) else enumerate(dats)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {executor.submit(_solve_tables, {t: getattr(dat, t) for t in input_schema.all_tables},
+                                   solve_kwargs): key
+                   for key, dat in items}
+        for future in as_completed(futures):
+            tables, error = future.result()
+            sln = output_schema.PanDat(**tables) if tables is not None else None
+            yield futures[future], sln, error
@@ -0,0 +1,362 @@
+"""
+Synthetic instances and benchmarks of pastesian, to see how it scales beyond the small test data sets.
+
+generate_instance creates reproducible random PanDat objects compatible with the input_schema, and run_benchmark times
+each phase of solve() on instances of increasing size. Results can be saved as JSON and compared against a baseline
+saved earlier, so that regressions show up. From the command line:
+
+>> python -m pastesian.bench --sizes 10 1000 100000 --engines flow highs -o results.json -b baseline.json
+
+which exits with status 1 when some phase got slower than the baseline.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+import pandas as pd
+import pastesian
+from pastesian import input_schema
+from pastesian.engines import ENGINES, optimize
+from pastesian.feasibility import find_infeasibilities, diagnostics_table
+from pastesian.main import create_optimization_parameters, create_capacity_parameters, populate_output_schema
+from pastesian.stats import RunStats, PHASES
+from pastesian.utils import check_each_period_id_column
+
+DEFAULT_SIZES = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+DEMAND_DISTRIBUTIONS = ('uniform', 'poisson', 'seasonal')
+CAPACITIES = ('none', 'loose', 'tight')
+
+
+def generate_instance(n_periods, seed=None, demand='uniform', demand_range=(50, 500), cost_range=(5.0, 15.0),
+                      holding_ratio=0.2, capacity='none', start_amount=50, freq='h'):
+    """
+    Generate a random, always feasible, instance of the pastesian problem.
+
+    Parameters
+    ----------
+    n_periods : int
+        Length of the planning horizon.
+    seed : int, optional
+        Seed of the random number generator, the same seed (and arguments) always generate the same instance.
+    demand : str, optional
+        Distribution of the demand, one of DEMAND_DISTRIBUTIONS: 'uniform' (default) in demand_range, 'poisson' with
+        the mean of demand_range, or 'seasonal', a sine wave of period 12 through demand_range plus some noise.
+    demand_range : tuple, optional
+        Minimum and maximum demand per period, default=(50, 500).
+    cost_range : tuple, optional
+        Minimum and maximum production cost per period, uniformly distributed, default=(5.0, 15.0).
+    holding_ratio : float, optional
+        The inventory cost of each period is uniformly distributed between 0 and holding_ratio times its production
+        cost, default=0.2.
+    capacity : str, optional
+        One of CAPACITIES: 'none' (default) leaves both capacity parameters as -1; 'loose' sets the production capacity
+        to twice the maximum demand; 'tight' sets it 5% above the smallest capacity that meets the demand on time.
+    start_amount : int, optional
+        The 'Lasagnas To Start' parameter, default=50.
+    freq : str, optional
+        Frequency of the 'Time Period' dates, as understood by pandas.date_range. Default is hourly, the only common
+        one whose dates don't overflow pandas timestamps at a million periods.
+
+    Returns
+    -------
+    dat : PanDat
+        A PanDat object compatible with the input_schema.
+
+    Raises
+    ------
+    ValueError
+        When demand or capacity are not one of the allowed values.
+    """
+    if demand not in DEMAND_DISTRIBUTIONS:
+        raise ValueError(f"demand must be one of {', '.join(map(repr, DEMAND_DISTRIBUTIONS))}, not {demand!r}")
+    if capacity not in CAPACITIES:
+        raise ValueError(f"capacity must be one of {', '.join(map(repr, CAPACITIES))}, not {capacity!r}")
+    rng = np.random.default_rng(seed)
+    periods = np.arange(1, n_periods + 1)
+    low, high = demand_range
+
+    # region Demand
+    if demand == 'uniform':
+        demand_values = rng.integers(low, high, endpoint=True, size=n_periods)
+    elif demand == 'poisson':
+        demand_values = rng.poisson((low + high) / 2, size=n_periods)
+    else:
+        wave = (low + high) / 2 + (high - low) / 2 * np.sin(2 * np.pi * periods / 12)
+        demand_values = np.rint(wave + rng.normal(0, (high - low) / 20, size=n_periods))
+    demand_values = np.clip(demand_values, 0, None).astype(np.int64)
+    # endregion
+
+    # region Costs
+    production_cost = np.round(rng.uniform(*cost_range, size=n_periods), 2)
+    inventory_cost = np.round(rng.uniform(0, holding_ratio, size=n_periods) * production_cost, 2)
+    # endregion
+
+    # region Capacities: the smallest constant capacity C meeting the demand on time satisfies
+    # start_amount + k * C >= cumulative demand of the first k periods, for every k
+    production_capacity = -1
+    if capacity == 'loose':
+        production_capacity = 2 * int(demand_values.max())
+    elif capacity == 'tight':
+        needed = np.max((np.cumsum(demand_values) - start_amount) / periods)
+        production_capacity = max(int(np.ceil(1.05 * needed)), 1)
+    # endregion
+
+    dat = input_schema.PanDat()
+    dat.parameters = pd.DataFrame([['Production Capacity', production_capacity], ['Inventory Capacity', -1],
+                                   ['Lasagnas To Be Left', 0], ['Lasagnas To Start', start_amount]],
+                                  columns=['Name', 'Value'])
+    dat.time_periods = pd.DataFrame({'Period ID': periods,
+                                     'Time Period': pd.date_range('2000-01-01', periods=n_periods, freq=freq)})
+    dat.demand = pd.DataFrame({'Period ID': periods, 'Demand': demand_values})
+    dat.costs = pd.DataFrame({'Period ID': periods, 'Production Cost': production_cost,
+                              'Inventory Cost': inventory_cost})
+    return dat
+
+
+def generate_multi_product_instance(n_products, n_sites, n_periods, seed=None, density=1.0, demand_range=(0, 50),
+                                    cost_range=(5.0, 15.0), holding_ratio=0.2, capacity='none', freq='W'):
+    """
+    Generate a random, always feasible, multi-product instance of the pastesian problem (see pastesian.multi).
+
+    Parameters
+    ----------
+    n_products : int
+        Number of products, labeled 'P1', 'P2', ....
+    n_sites : int
+        Number of sites, labeled 'S1', 'S2', ....
+    n_periods : int
+        Length of the planning horizon.
+    seed : int, optional
+        Seed of the random number generator, the same seed (and arguments) always generate the same instance.
+    density : float, optional
+        Fraction of the (product, site) pairs that are made, each over the whole horizon, default=1.0.
+    demand_range : tuple, optional
+        Minimum and maximum demand per (product, site, period), uniformly distributed, default=(0, 50).
+    cost_range : tuple, optional
+        Minimum and maximum production cost per (product, site, period), uniformly distributed, default=(5.0, 15.0).
+    holding_ratio : float, optional
+        The inventory cost of each row is uniformly distributed between 0 and holding_ratio times its production cost,
+        default=0.2.
+    capacity : str, optional
+        One of CAPACITIES, for the production capacity of each site, as in generate_instance but from the total demand
+        of the site. Inventory capacities are left as -1.
+    freq : str, optional
+        Frequency of the 'Time Period' dates, as understood by pandas.date_range. Default is weekly.
+
+    Returns
+    -------
+    dat : PanDat
+        A PanDat object compatible with the input_schema, whose 'product_costs' table has rows.
+    """
+    if capacity not in CAPACITIES:
+        raise ValueError(f"capacity must be one of {', '.join(map(repr, CAPACITIES))}, not {capacity!r}")
+    rng = np.random.default_rng(seed)
+    pairs = np.flatnonzero(rng.random(n_products * n_sites) < density)
+    if not len(pairs):
+        pairs = np.array([0])
+    n_rows = len(pairs) * n_periods
+    product = np.repeat(pairs % n_products, n_periods)
+    site = np.repeat(pairs // n_products, n_periods)
+    period = np.tile(np.arange(1, n_periods + 1), len(pairs))
+    demand = rng.integers(*demand_range, endpoint=True, size=n_rows)
+    production_cost = np.round(rng.uniform(*cost_range, size=n_rows), 2)
+    inventory_cost = np.round(rng.uniform(0, holding_ratio, size=n_rows) * production_cost, 2)
+    products = np.array([f'P{p + 1}' for p in range(n_products)], dtype=object)
+    sites = np.array([f'S{k + 1}' for k in range(n_sites)], dtype=object)
+
+    # region Site capacities, with no starting inventory
+    production_capacity = np.full(n_sites, -1)
+    site_demand = np.zeros((n_sites, n_periods))
+    np.add.at(site_demand, (site, period - 1), demand)
+    if capacity == 'loose':
+        production_capacity = 2 * site_demand.max(axis=1).astype(np.int64)
+    elif capacity == 'tight':
+        needed = np.max(np.cumsum(site_demand, axis=1) / np.arange(1, n_periods + 1), axis=1)
+        production_capacity = np.maximum(np.ceil(1.05 * needed), 1).astype(np.int64)
+    # endregion
+
+    dat = input_schema.PanDat()
+    dat.time_periods = pd.DataFrame({'Period ID': np.arange(1, n_periods + 1),
+                                     'Time Period': pd.date_range('2000-01-01', periods=n_periods, freq=freq)})
+    dat.sites = pd.DataFrame({'Site ID': sites, 'Production Capacity': production_capacity,
+                              'Inventory Capacity': -1})
+    keys = {'Product ID': products[product], 'Site ID': sites[site], 'Period ID': period}
+    dat.product_demand = pd.DataFrame(dict(keys, Demand=demand))
+    dat.product_costs = pd.DataFrame(dict(keys, **{'Production Cost': production_cost,
+                                                   'Inventory Cost': inventory_cost}))
+    return dat
+
+
+def time_phases(dat, engine='flow'):
+    """
+    Solve dat like solve() does, timing each of its phases without the memory tracing of solve(dat, stats=True).
+
+    The phases are 'validation' (check_each_period_id_column), 'parameters' (create_optimization_parameters and
+    friends), 'presolve' (find_infeasibilities), 'build' (the PuLP model or the sparse matrices, always zero for the
+    'flow' engine, which has no model), 'solve' (the solver, including reading the solution back) and 'output'
+    (populate_output_schema). As in solve(), an infeasible data set is neither built nor solved.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with the input_schema and contains the input data.
+    engine : str, optional
+        One of ENGINES, see solve(). Default is 'flow'.
+
+    Returns
+    -------
+    seconds : dict
+        A dictionary structured as {phase: wall_clock_seconds}, for all PHASES.
+    status : str
+        The solver status, following pulp.LpStatus names.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(map(repr, ENGINES))}, not {engine!r}")
+    stats = RunStats(trace_memory=False)
+    with stats.phase('validation'):
+        check_each_period_id_column(dat)
+    with stats.phase('parameters'):
+        d, pc, ic, I = create_optimization_parameters(dat)
+        parameters = input_schema.create_full_parameters_dict(dat)
+        pcap, icap = create_capacity_parameters(dat, I, parameters)
+    with stats.phase('presolve'):
+        infeasibilities = find_infeasibilities(d, I, parameters, pcap, icap)
+    if infeasibilities:
+        x_sol, s_sol, status = [], [], 'Infeasible'
+    else:
+        x_sol, s_sol, status = optimize(d, pc, ic, I, parameters, pcap, icap, engine, stats)
+    with stats.phase('output'):
+        sln = populate_output_schema(x_sol, s_sol, dat)
+        sln.diagnostics = diagnostics_table(infeasibilities)
+    seconds = dict(dict.fromkeys(PHASES, 0.0), **stats.seconds())
+    return seconds, status
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, engines=('flow',), repeat=1, seed=0, **instance_kwargs):
+    """
+    Time each phase of solve() on generated instances of the given sizes, with each of the given engines.
+
+    Parameters
+    ----------
+    sizes : iterable, optional
+        Horizon lengths to benchmark, default=DEFAULT_SIZES, i.e., from 10 to 1M periods. Note that 'pulp' and 'highs'
+        take long on the largest ones.
+    engines : iterable, optional
+        Engines to benchmark, default=('flow',).
+    repeat : int, optional
+        Number of timed runs of each case; the minimum time of each phase is reported, default=1.
+    seed : int, optional
+        Seed passed along to generate_instance, default=0.
+    **instance_kwargs
+        Other keyword arguments passed along to generate_instance, e.g., capacity='tight'.
+
+    Returns
+    -------
+    results : dict
+        A JSON-serializable dictionary with the environment ('pastesian', 'python', 'platform'), the arguments
+        ('seed', 'instance') and the 'cases', a list of dictionaries with 'n_periods', 'engine', 'status', 'seconds'
+        ({phase: seconds}) and 'total' (seconds).
+    """
+    cases = []
+    for n_periods in sizes:
+        dat = generate_instance(n_periods, seed=seed, **instance_kwargs)
+        for engine in engines:
+            runs = [time_phases(dat, engine) for _ in range(repeat)]
+            seconds = {phase: min(run[0][phase] for run in runs) for phase in PHASES}
+            cases.append({'n_periods': n_periods, 'engine': engine, 'status': runs[-1][1], 'seconds': seconds,
+                          'total': sum(seconds.values())})
+    return {'pastesian': pastesian.__version__, 'python': platform.python_version(), 'platform': platform.platform(),
+            'seed': seed, 'instance': instance_kwargs, 'cases': cases}
+
+
+def save_results(results, path):
+    """
+    Save the results of run_benchmark as a JSON file.
+    """
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    """
+    Load the results of run_benchmark from a JSON file, as saved by save_results.
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.005):
+    """
+    Find the phases that got slower than in a baseline, for the cases (size and engine) found in both.
+
+    Parameters
+    ----------
+    results : dict
+        The results of run_benchmark.
+    baseline : dict
+        The results of an earlier run_benchmark, usually loaded with load_results.
+    tolerance : float, optional
+        Relative slowdown tolerated before reporting a regression, default=0.25 (i.e., 25% slower).
+    min_seconds : float, optional
+        Phases that take less than this in both runs are ignored, since they are mostly noise, default=0.005.
+
+    Returns
+    -------
+    regressions : list
+        A list of dictionaries with 'n_periods', 'engine', 'phase', 'baseline' (seconds), 'current' (seconds) and
+        'ratio' (current / baseline), one per regression found. It's empty when there is none.
+    """
+    baseline_cases = {(case['n_periods'], case['engine']): case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        base = baseline_cases.get((case['n_periods'], case['engine']))
+        if base is None:
+            continue
+        for phase in PHASES:
+            current, previous = case['seconds'][phase], base['seconds'].get(phase, 0.0)
+            if max(current, previous) < min_seconds:
+                continue
+            if current > previous * (1 + tolerance):
+                regressions.append({'n_periods': case['n_periods'], 'engine': case['engine'], 'phase': phase,
+                                    'baseline': previous, 'current': current,
+                                    'ratio': current / previous if previous else float('inf')})
+    return regressions
+
+
+def main(argv=None):
+    """
+    Command-line entry point, see the module docstring. Returns the exit status.
+    """
+    parser = argparse.ArgumentParser(prog='python -m pastesian.bench', description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES), help='horizon lengths')
+    parser.add_argument('--engines', nargs='+', default=['flow'], choices=ENGINES, help='engines to benchmark')
+    parser.add_argument('--repeat', type=int, default=1, help='timed runs per case, the minimum is reported')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated instances')
+    parser.add_argument('--demand', default='uniform', choices=DEMAND_DISTRIBUTIONS, help='demand distribution')
+    parser.add_argument('--capacity', default='none', choices=CAPACITIES, help='production capacity')
+    parser.add_argument('-o', '--output', help='JSON file where the results are saved')
+    parser.add_argument('-b', '--baseline', help='JSON file with the baseline results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='relative slowdown tolerated, default=0.25')
+    args = parser.parse_args(argv)
+
+    results = run_benchmark(args.sizes, args.engines, args.repeat, args.seed, demand=args.demand,
+                            capacity=args.capacity)
+    for case in results['cases']:
+        phases = ' '.join(f'{phase}={case["seconds"][phase]:.4f}s' for phase in PHASES)
+        print(f'{case["n_periods"]:>9} periods  {case["engine"]:<5}  {case["status"]:<10}  {phases}  '
+              f'total={case["total"]:.4f}s')
+    if args.output:
+        save_results(results, args.output)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        for r in regressions:
+            print(f'REGRESSION: {r["n_periods"]} periods, {r["engine"]}, {r["phase"]}: {r["baseline"]:.4f}s -> '
+                  f'{r["current"]:.4f}s ({r["ratio"]:.2f}x)')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
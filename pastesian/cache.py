@@ -0,0 +1,203 @@
+"""
+Content-addressed cache of solutions, used by solve() when a SolutionCache is passed as its 'cache' argument.
+
+The key of an input is a SHA-256 hash of the tables the solution depends on (all input tables but 'time_periods'),
+normalized so that row order and the int/float representation of numbers don't matter, together with the package
+version and the solve() options. Solutions are kept in an in-memory LRU and, optionally, in a directory on disk whose
+total size is bounded by evicting the least recently used files.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+from collections import OrderedDict
+from pandas.util import hash_pandas_object
+import pastesian
+from pastesian import input_schema, output_schema
+
+
+def _normalized_table(dat, table_name):
+    primary_key_fields = list(input_schema.primary_key_fields[table_name])
+    table = getattr(dat, table_name)[primary_key_fields + list(input_schema.data_fields[table_name])]
+    table = table.sort_values(by=primary_key_fields, kind='stable', ignore_index=True)
+    for field_name in input_schema.data_fields[table_name]:
+        try:
+            table = table.astype({field_name: float})
+        except (TypeError, ValueError):
+            pass  # leave non-numeric data as is, solve() will report it
+    return table
+
+
+class SolutionCache:
+    """
+    In-memory LRU cache of solutions, optionally backed by a directory on disk.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        Maximum number of solutions kept in memory, default=128.
+    directory : str, optional
+        Directory where solutions are also stored, one pickle file per key. It's created if it doesn't exist. When
+        None (default), solutions are only kept in memory.
+    max_disk_bytes : int, optional
+        Maximum total size of the files in directory. The least recently used ones are deleted when it's exceeded.
+        When None (default), the directory is not bounded.
+
+    Attributes
+    ----------
+    hits : int
+        Number of lookups that found a solution, either in memory or on disk.
+    misses : int
+        Number of lookups that didn't find a solution.
+    """
+
+    def __init__(self, maxsize=128, directory=None, max_disk_bytes=None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._memory)
+
+    @staticmethod
+    def key(dat, **solve_kwargs):
+        """
+        Compute the key of an input data set, which doesn't depend on the order of the rows.
+
+        Parameters
+        ----------
+        dat : PanDat
+            PanDat object which is compatible with the input_schema and contains the input data.
+        **solve_kwargs
+            The solve() options that may change the solution, e.g., engine='flow'.
+
+        Returns
+        -------
+        key : str
+            A hexadecimal SHA-256 digest.
+        """
+        sha = hashlib.sha256()
+        sha.update(f'pastesian {pastesian.__version__} {sorted(solve_kwargs.items())!r}'.encode())
+        for table_name in ('parameters', 'demand', 'costs', 'capacities', 'setups', 'sites', 'product_demand',
+                           'product_costs', 'product_inventory'):
+            table = _normalized_table(dat, table_name)
+            sha.update(f'{table_name} {list(table.columns)!r}'.encode())
+            sha.update(hash_pandas_object(table, index=False).values.tobytes())
+        return sha.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def get(self, key):
+        """
+        Look a solution up, first in memory and then on disk.
+
+        Parameters
+        ----------
+        key : str
+            The key of the input data set, as computed by SolutionCache.key.
+
+        Returns
+        -------
+        sln : PanDat
+            A PanDat object compatible with the output schema, or None when the key is not in the cache.
+        """
+        tables = self._memory.get(key)
+        if tables is not None:
+            self._memory.move_to_end(key)
+        elif self.directory is not None and os.path.exists(self._path(key)):
+            tables = self._load(self._path(key))
+            if tables is not None:
+                self._remember(key, tables)
+        if tables is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return output_schema.PanDat(**{t: df.copy() for t, df in tables.items()})
+
+    def put(self, key, sln):
+        """
+        Store a solution in memory and, if there is a directory, on disk.
+
+        Parameters
+        ----------
+        key : str
+            The key of the input data set, as computed by SolutionCache.key.
+        sln : PanDat
+            A PanDat object compatible with the output schema.
+
+        Returns
+        -------
+        None
+        """
+        tables = {t: getattr(sln, t).copy() for t in output_schema.all_tables}
+        self._remember(key, tables)
+        if self.directory is not None:
+            # written to a temporary file first, so that other processes never read a partial file
+            fd, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary_path, self._path(key))
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+            self._evict_files()
+
+    def clear(self):
+        """
+        Remove all solutions, from memory and disk, and reset the hit and miss counters.
+
+        Returns
+        -------
+        None
+        """
+        self._memory.clear()
+        self.hits = 0
+        self.misses = 0
+        if self.directory is not None:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pkl'):
+                    os.remove(entry.path)
+
+    @staticmethod
+    def _load(path):
+        """
+        Read the tables of a file, or None when it's unreadable (e.g., truncated by a killed process), which is removed.
+        """
+        try:
+            with open(path, 'rb') as f:
+                tables = pickle.load(f)
+        except (EOFError, pickle.UnpicklingError, OSError):
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # already removed, e.g., by another process
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return tables
+
+    def _remember(self, key, tables):
+        self._memory[key] = tables
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
+    def _evict_files(self):
+        if self.max_disk_bytes is None:
+            return
+        entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.pkl')]
+        total = sum(entry.stat().st_size for entry in entries)
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            if total <= self.max_disk_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
@@ -0,0 +1,154 @@
+"""
+Columnar binary readers and writers (Parquet and Arrow IPC, a.k.a. Feather) for the input and output schemas.
+
+Like the CSV format of ticdat, a data set is a directory with one file per table, named after the table. The format is
+given by the extension of the directory, e.g., 'inputs.parquet' holds 'demand.parquet', 'costs.parquet', ..., and
+'inputs.feather' (or 'inputs.arrow') holds 'demand.feather', .... Columns are written with the types of the schema
+(integers, floats, timestamps), so that reading them back needs neither type inference nor casting, and files are read
+through memory maps. Feather files are written uncompressed by default, so that the numeric columns of big tables like
+'demand' and 'costs' are used straight from the memory map rather than decoded into new buffers.
+
+These formats require pyarrow, which can be installed with `pip install pyarrow`.
+"""
+import os
+import pandas as pd
+from pastesian.schemas import OPTIONAL_INPUT_TABLES, OPTIONAL_OUTPUT_TABLES
+
+try:
+    import pyarrow as pa
+    from pyarrow import feather, parquet
+except ImportError:  # pyarrow is an optional dependency, only needed by the columnar formats
+    pa = None
+    feather = None
+    parquet = None
+
+FORMATS = {'.parquet': 'parquet', '.feather': 'feather', '.arrow': 'feather'}
+
+
+def columnar_format(path):
+    """
+    Return the columnar format implied by the extension of path ('parquet' or 'feather'), or None if there is none.
+    """
+    return FORMATS.get(os.path.splitext(os.path.normpath(path))[1].lower())
+
+
+def _check_format(path):
+    if pa is None:
+        raise ImportError('The Parquet and Feather formats require pyarrow, which can be installed with '
+                          '`pip install pyarrow`')
+    file_format = columnar_format(path)
+    if file_format is None:
+        raise ValueError(f"{path} must end with one of {', '.join(FORMATS)}")
+    return file_format, os.path.splitext(os.path.normpath(path))[1]
+
+
+def _arrow_type(schema, table_name, field_name):
+    """
+    The Arrow type of a field, from its data type in the schema, or None when it's left to Arrow to infer it.
+    """
+    data_type = schema.data_types.get(table_name, {}).get(field_name)
+    if data_type is None or data_type.datetime:
+        return None
+    if data_type.number_allowed and not data_type.strings_allowed:
+        # nullable integers are floats in pandas, as ticdat reads them
+        return pa.int64() if data_type.must_be_int and not data_type.nullable else pa.float64()
+    if data_type.strings_allowed and not data_type.number_allowed:
+        return pa.string()
+    return None
+
+
+def _arrow_column(schema, table_name, field_name, column):
+    data_type = schema.data_types.get(table_name, {}).get(field_name)
+    if data_type is not None and data_type.datetime:
+        column = pd.to_datetime(column)
+    arrow_type = _arrow_type(schema, table_name, field_name)
+    if arrow_type is None and data_type is not None and data_type.number_allowed and data_type.strings_allowed:
+        # numbers and strings in the same column (e.g., run_stats 'Value') can't share an Arrow type
+        column = column.map(lambda v: None if pd.isna(v) else str(v))
+        arrow_type = pa.string()
+    return pa.array(column, type=arrow_type, from_pandas=True)
+
+
+def write_columnar(schema, dat, path, compression=None):
+    """
+    Write a PanDat object as a directory with one Parquet or Feather file per table.
+
+    Parameters
+    ----------
+    schema : PanDatFactory
+        The schema of dat, i.e., input_schema or output_schema.
+    dat : PanDat
+        PanDat object compatible with schema.
+    path : str
+        The directory, created if it doesn't exist, whose extension gives the format (see FORMATS).
+    compression : str, optional
+        The compression codec, passed along to pyarrow. Default is None, i.e., 'snappy' for Parquet and
+        'uncompressed' for Feather.
+
+    Returns
+    -------
+    None
+
+    Raises
+    ------
+    ValueError
+        When path has no columnar extension.
+    """
+    file_format, extension = _check_format(path)
+    os.makedirs(path, exist_ok=True)
+    for table_name in schema.all_tables:
+        table = getattr(dat, table_name)
+        fields = list(schema.primary_key_fields[table_name]) + list(schema.data_fields[table_name])
+        arrow_table = pa.Table.from_arrays([_arrow_column(schema, table_name, f, table[f]) for f in fields],
+                                           names=fields)
+        file_path = os.path.join(path, table_name + extension)
+        if file_format == 'parquet':
+            parquet.write_table(arrow_table, file_path, compression=compression or 'snappy')
+        else:
+            feather.write_feather(arrow_table, file_path, compression=compression or 'uncompressed')
+
+
+def read_columnar(schema, path):
+    """
+    Read a PanDat object from a directory with one Parquet or Feather file per table, through memory maps.
+
+    Tables without a file are empty, as for ticdat's readers, which are listed unless they're optional (see
+    pastesian.schemas.OPTIONAL_INPUT_TABLES and OPTIONAL_OUTPUT_TABLES).
+
+    Parameters
+    ----------
+    schema : PanDatFactory
+        The schema of the data set, i.e., input_schema or output_schema.
+    path : str
+        The directory, whose extension gives the format (see FORMATS).
+
+    Returns
+    -------
+    dat : PanDat
+        PanDat object compatible with schema.
+
+    Raises
+    ------
+    ValueError
+        When path has no columnar extension or is not a directory.
+    """
+    file_format, extension = _check_format(path)
+    if not os.path.isdir(path):
+        raise ValueError(f'{path} is not a directory')
+    tables = {}
+    missing = []
+    for table_name in schema.all_tables:
+        file_path = os.path.join(path, table_name + extension)
+        if not os.path.exists(file_path):
+            if table_name not in OPTIONAL_INPUT_TABLES + OPTIONAL_OUTPUT_TABLES:
+                missing.append(table_name)
+            continue
+        if file_format == 'parquet':
+            arrow_table = parquet.read_table(file_path, memory_map=True)
+        else:
+            arrow_table = feather.read_table(file_path, memory_map=True)
+        tables[table_name] = arrow_table.to_pandas(split_blocks=True)
+    if missing:
+        print('The following table names could not be found in the %s directory.\n%s\n' % (file_format,
+                                                                                           '\n'.join(missing)))
+    return schema.PanDat(**tables)
@@ -0,0 +1,252 @@
+"""
+Horizon decomposition: the horizon is cut where the inventory of some optimal plan is known beforehand, and the
+segments are solved independently, in parallel, see solve_decomposed.
+
+As in pastesian.feasibility, let Y(i) be the cumulative supply ('Lasagnas To Start' plus the production up to period
+i) and D(i) the cumulative demand, so that the inventory at the end of period i is Y(i) - D(i). Passes of prefix sums
+and running minima/maxima give the interval [lo(i), hi(i)] of the supplies Y(i) of all the feasible plans (see
+pastesian.feasibility.supply_interval), and the horizon can be cut after period k, with a known inventory, in two cases:
+
+- Pinned inventory: lo(k) == hi(k), i.e., every feasible plan has the same inventory at the end of period k, e.g.,
+  when the inventory capacity of k is 0, or the capacities leave no choice.
+- Regeneration: producing in period k + 1 is at least as cheap as producing in any earlier period and holding until
+  k + 1, i.e., pc[k + 1] <= min over i <= k of pc[i] + ic[i] + ... + ic[k], and the production capacity of k + 1 can
+  absorb anything produced before. Then lowering the cumulative production up to k to the least that is feasible,
+  and producing the difference in k + 1, never costs more, so some optimal plan has Y(k) == lo(k).
+
+Fixing the inventory at every cut to those values keeps some optimal plan of the whole horizon feasible, so the sum of
+the optimal costs of the segments, with their 'Lasagnas To Start' and 'Lasagnas To Be Left' taken from the cuts, is the
+optimal cost of the whole horizon. Each segment is a pastesian.overlay.ScenarioOverlay of the input data, whose tables
+with a 'Period ID' column are sliced and renumbered, solved by solve() through pastesian.batch.solve_many.
+"""
+import os
+import time
+import numpy as np
+import pandas as pd
+from pastesian import input_schema, output_schema
+from pastesian.batch import solve_many
+from pastesian.feasibility import find_infeasibilities, supply_interval
+from pastesian.main import solve, create_optimization_parameters, create_capacity_parameters
+from pastesian.mip import create_setup_parameters, has_setups
+from pastesian.multi import is_multi_product
+from pastesian.overlay import ScenarioOverlay
+from pastesian.utils import check_each_period_id_column
+
+
+def find_split_points(d, pc, ic, I, parameters, pcap=None, icap=None):
+    """
+    Find the periods after which the horizon can be cut, with the inventory of some optimal plan at the cut.
+
+    Parameters
+    ----------
+    d, pc, ic, I, parameters, pcap, icap
+        The optimization parameters, see pastesian.engines.build_model. The model must be feasible, see
+        pastesian.feasibility.find_infeasibilities.
+
+    Returns
+    -------
+    splits : dict
+        A dictionary structured as {period_id: inventory}, ordered by period, for the periods k < len(I) such that
+        fixing the inventory at the end of each k to its value keeps some optimal plan feasible.
+    """
+    n = len(I)
+    if n < 2:
+        return {}
+    periods = range(1, n + 1)
+    production_cost = np.fromiter((pc[i] for i in periods), dtype=float, count=n)
+    inventory_cost = np.fromiter((ic[i] for i in periods), dtype=float, count=n)
+    cum_demand, lo, hi, production_capacity = supply_interval(d, I, parameters, pcap, icap)
+    tol = 1e-9 * max(1.0, abs(lo[-1]) + parameters['Lasagnas To Start'])
+
+    # region Cuts after k = 1, ..., n - 1 (index k - 1)
+    pinned = hi[:-1] - lo[:-1] <= tol
+    cum_inventory_cost = np.cumsum(inventory_cost)
+    # cheapest cost of a lasagna produced up to k and held until the end of k
+    held_cost = np.minimum.accumulate(production_cost - cum_inventory_cost + inventory_cost) + cum_inventory_cost
+    cost_scale = 1e-9 * max(1.0, np.abs(held_cost).max())
+    regeneration = (production_cost[1:] <= held_cost[:-1] + cost_scale) & \
+                   (production_capacity[1:] >= hi[1:] - lo[:-1] - tol)
+    cuts = np.flatnonzero(pinned | regeneration)
+    # endregion
+    return {int(k) + 1: float(lo[k] - cum_demand[k]) for k in cuts}
+
+
+def group_segments(splits, n, segments):
+    """
+    Choose at most segments - 1 of the split points, so that the segments have about the same number of periods.
+
+    Parameters
+    ----------
+    splits : iterable
+        The periods after which the horizon can be cut, as found by find_split_points.
+    n : int
+        The number of periods.
+    segments : int
+        The largest number of segments.
+
+    Returns
+    -------
+    bounds : list
+        A list of (first_period, last_period) pairs, one per segment, ordered by period.
+    """
+    splits = np.asarray(sorted(splits), dtype=np.int64)
+    cuts = []
+    if len(splits) and segments > 1:
+        targets = np.arange(1, segments) * n / segments
+        nearest = np.clip(np.searchsorted(splits, targets), 1, len(splits)) - 1
+        closer = np.minimum(nearest + 1, len(splits) - 1)
+        nearest = np.where(np.abs(splits[closer] - targets) < np.abs(splits[nearest] - targets), closer, nearest)
+        cuts = np.unique(splits[nearest]).tolist()
+    firsts = [1] + [k + 1 for k in cuts]
+    lasts = cuts + [n]
+    return list(zip(firsts, lasts))
+
+
+def segment_data(dat, first, last, start, left):
+    """
+    The data set of the periods first, ..., last of dat, renumbered from 1, with the given 'Lasagnas To Start' and
+    'Lasagnas To Be Left'.
+
+    Returns
+    -------
+    segment : ScenarioOverlay
+        An overlay of dat, which shares the tables without a 'Period ID' column but 'parameters' with it.
+    """
+    tables = {}
+    for table_name in input_schema.all_tables:
+        table = getattr(dat, table_name)
+        if 'Period ID' in table.columns:
+            rows = table[table['Period ID'].between(first, last)]
+            tables[table_name] = rows.assign(**{'Period ID': rows['Period ID'] - (first - 1)})
+    parameters = dat.parameters
+    parameters = parameters[~parameters['Name'].isin(['Lasagnas To Start', 'Lasagnas To Be Left'])]
+    tables['parameters'] = pd.concat([parameters, pd.DataFrame({'Name': ['Lasagnas To Start', 'Lasagnas To Be Left'],
+                                                                'Value': [start, left]})], ignore_index=True)
+    return ScenarioOverlay(dat, tables=tables)
+
+
+def decomposable_parameters(dat, mode):
+    """
+    Validate dat and create its optimization parameters, for the modes that solve the horizon in segments.
+
+    Parameters
+    ----------
+    dat : PanDat or ScenarioOverlay
+        PanDat object which is compatible with the input_schema and contains the input data.
+    mode : str
+        The name of the mode, for the error messages.
+
+    Returns
+    -------
+    d, pc, ic, I, parameters, pcap, icap
+        The optimization parameters, see pastesian.engines.build_model.
+
+    Raises
+    ------
+    ValueError
+        The same cases as solve(), and when dat has multiple products or setups.
+    """
+    check_each_period_id_column(dat)
+    if is_multi_product(dat):
+        raise ValueError(f'{mode} is not supported with multi-product data sets')
+    parameters = input_schema.create_full_parameters_dict(dat)
+    d, pc, ic, I = create_optimization_parameters(dat)
+    pcap, icap = create_capacity_parameters(dat, I, parameters)
+    if has_setups(*create_setup_parameters(dat, I, parameters)):
+        raise ValueError(f'{mode} is not supported with setup costs or minimum batch sizes, whose optimal plans have '
+                         f'no split points of this kind')
+    return d, pc, ic, I, parameters, pcap, icap
+
+
+def solve_segments(dat, bounds, inventory, workers=None, **solve_kwargs):
+    """
+    Solve the given segments of the horizon with solve(), in a pool of processes, and stitch their solutions.
+
+    Parameters
+    ----------
+    dat : PanDat or ScenarioOverlay
+        PanDat object which is compatible with the input_schema and contains the input data.
+    bounds : list
+        A list of (first_period, last_period) pairs, one per segment, covering the horizon in order.
+    inventory : dict
+        A dictionary structured as {period_id: inventory}, with the inventory at the end of the last period of each
+        segment, and of period 0 ('Lasagnas To Start').
+    workers : int, optional
+        Number of worker processes, defaults to os.cpu_count().
+    **solve_kwargs
+        Keyword arguments passed along to solve() for every segment, e.g., engine='flow'.
+
+    Returns
+    -------
+    sln : PanDat
+        A PanDat object containing the output data, compatible with the output schema, with the 'production_flow',
+        'costs' and 'diagnostics' tables of all segments. Its 'solver_status' table has the 'Engine', the 'Status'
+        ('Optimal' when all segments are, otherwise the status of the first segment that is not, in which case the
+        tables are empty), the 'Solve Time (s)' of the parallel solves and the number of 'Segments'.
+    """
+    data = {first: segment_data(dat, first, last, inventory[first - 1], inventory[last]) for first, last in bounds}
+    start = time.perf_counter()
+    solutions = {first: (sln, error) for first, sln, error in solve_many(data, workers or os.cpu_count(),
+                                                                          **solve_kwargs)}
+    solve_time = time.perf_counter() - start
+    for first, _ in bounds:
+        if solutions[first][1] is not None:
+            raise solutions[first][1]
+
+    sln = output_schema.PanDat()
+    statuses = [dict(zip(solutions[first][0].solver_status['Statistic'], solutions[first][0].solver_status['Value']))
+                for first, _ in bounds]
+    status = next((s['Status'] for s in statuses if s['Status'] != 'Optimal'), 'Optimal')
+    for table_name in ('production_flow', 'costs', 'diagnostics'):
+        if status != 'Optimal' and table_name != 'diagnostics':
+            continue
+        tables = [getattr(solutions[first][0], table_name) for first, _ in bounds]
+        tables = [table.assign(**{'Period ID': table['Period ID'] + (first - 1)})
+                  for table, (first, _) in zip(tables, bounds) if len(table)]
+        if tables:
+            setattr(sln, table_name, pd.concat(tables, ignore_index=True))
+    sln.solver_status = pd.DataFrame({'Statistic': ['Engine', 'Status', 'Solve Time (s)', 'Segments'],
+                                      'Value': [statuses[0]['Engine'], status, solve_time, len(bounds)]})
+    return sln
+
+
+def solve_decomposed(dat, segments=None, workers=None, **solve_kwargs):
+    """
+    Solve the pastesian model as independent segments of the horizon, in parallel, and stitch their solutions.
+
+    The horizon is cut at the split points of find_split_points, grouped by group_segments, and the segments are solved
+    by solve_segments. The optimal cost is the same as the one of the whole horizon, and so is the plan whenever the
+    optimal plan is unique. When the model is infeasible, or has a single segment, it's solved by solve() as a whole.
+
+    Parameters
+    ----------
+    dat : PanDat or ScenarioOverlay
+        PanDat object which is compatible with the input_schema and contains the input data, with a single product and
+        without setup costs and minimum batch sizes.
+    segments : int, optional
+        The largest number of segments, defaults to workers.
+    workers : int, optional
+        Number of worker processes, defaults to os.cpu_count().
+    **solve_kwargs
+        Keyword arguments passed along to solve() for every segment, e.g., engine='flow'.
+
+    Returns
+    -------
+    sln : PanDat
+        A PanDat object containing the output data, compatible with the output schema, see solve_segments.
+
+    Raises
+    ------
+    ValueError
+        The same cases as solve(), and when dat has multiple products or setups.
+    """
+    d, pc, ic, I, parameters, pcap, icap = decomposable_parameters(dat, 'solve_decomposed')
+    workers = workers or os.cpu_count()
+    n = len(I)
+    splits = {} if find_infeasibilities(d, I, parameters, pcap, icap) else \
+        find_split_points(d, pc, ic, I, parameters, pcap, icap)
+    bounds = group_segments(splits, n, segments or workers)
+    if len(bounds) == 1:
+        return solve(dat, **solve_kwargs)
+    inventory = {0: parameters['Lasagnas To Start'], **splits, n: parameters['Lasagnas To Be Left']}
+    return solve_segments(dat, bounds, inventory, workers, **solve_kwargs)
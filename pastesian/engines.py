@@ -0,0 +1,196 @@
+"""
+Engines that solve the pastesian model from its optimization parameters, regardless of where those came from (a whole
+PanDat, a window of it, a segment, ...). solve() and the other solution modes call optimize() with the engine name.
+"""
+import pulp
+from pastesian.utils import period_capacities
+from pastesian.lot_sizing import solve_lot_sizing
+from pastesian.matrix import solve_matrix
+from pastesian.stats import NO_STATS
+
+ENGINES = ('pulp', 'highs', 'flow')
+
+# Options of the solvers behind the engines, with their defaults, see check_solver_options
+SOLVER_OPTIONS = {'threads': None, 'time_limit': None, 'mip_gap': None, 'quiet': False}
+
+
+def check_solver_options(options=None):
+    """
+    Validate the solver options given to solve() and fill in the defaults of the missing ones.
+
+    Parameters
+    ----------
+    options : dict, optional
+        Some of the SOLVER_OPTIONS: 'threads' (number of threads of CBC, or number of binding sites of a multi-product
+        data set solved at once by HiGHS), 'time_limit' (in seconds), 'mip_gap' (relative gap at which a MIP is
+        considered solved, CBC only, LPs are always solved to optimality) and 'quiet' (when True, the solver log isn't
+        written to stdout). None values mean the solver default. The 'flow' engine has no log, no threads and no gap,
+        and it ignores them all, except for the binding sites of multi-product data sets.
+
+    Returns
+    -------
+    options : dict
+        A dictionary with all SOLVER_OPTIONS keys, in that order.
+
+    Raises
+    ------
+    ValueError
+        When some option is not one of SOLVER_OPTIONS, or some number is not positive (the gap may be 0).
+    """
+    options = dict(options or {})
+    unknown = set(options).difference(SOLVER_OPTIONS)
+    if unknown:
+        raise ValueError(f"The following solver options don't exist: {unknown}. Use some of "
+                         f"{', '.join(map(repr, SOLVER_OPTIONS))}")
+    options = dict(SOLVER_OPTIONS, **options)
+    for name in ('threads', 'time_limit'):
+        if options[name] is not None and not options[name] > 0:
+            raise ValueError(f'{name} must be positive, not {options[name]!r}')
+    if options['mip_gap'] is not None and not options['mip_gap'] >= 0:
+        raise ValueError(f"mip_gap must be non-negative, not {options['mip_gap']!r}")
+    return options
+
+
+def pulp_solver(options=None, **kwargs):
+    """
+    Create the CBC solver of PuLP configured with the solver options, see check_solver_options. Other keyword arguments
+    (e.g., warmStart=True) are passed along to pulp.PULP_CBC_CMD.
+    """
+    options = check_solver_options(options)
+    return pulp.PULP_CBC_CMD(msg=not options['quiet'], timeLimit=options['time_limit'], threads=options['threads'],
+                             gapRel=options['mip_gap'], **kwargs)
+
+
+def build_model(d, pc, ic, I, parameters, pcap=None, icap=None):
+    """
+    Build the PuLP optimization model of pastesian from the optimization parameters.
+
+    Parameters
+    ----------
+    d : dict
+        A dictionary structured as {period_id: demand}
+    pc : dict
+        A dictionary structured as {period_id: production_cost}
+    ic : dict
+        A dictionary structured as {period_id: inventory_cost}
+    I : list
+        A list containing the 'Period ID' values
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+    pcap : dict, optional
+        A dictionary structured as {period_id: production_capacity}, only for periods with a production capacity, as
+        created by create_capacity_parameters. When None, the 'Production Capacity' parameter applies to all periods.
+    icap : dict, optional
+        The same as pcap, for the inventory capacities and the 'Inventory Capacity' parameter.
+
+    Returns
+    -------
+    mdl : pulp.LpProblem
+        The optimization model, ready to be solved.
+    x : dict
+        A dictionary structured as {period_id: production_variable}
+    s : dict
+        A dictionary structured as {period_id: storage_variable}
+    """
+    mdl = pulp.LpProblem('Pastesian', sense=pulp.LpMinimize)
+    x = pulp.LpVariable.dicts(indices=I, cat=pulp.LpContinuous, lowBound=0.0, name='x')  # Production quantities
+    s = pulp.LpVariable.dicts(indices=I, cat=pulp.LpContinuous, lowBound=0.0, name='s')  # Storage quantities
+
+    # region Flow Balance constraints
+    for i in I:
+        if i == 1:
+            # In the first period, we use 'Lasagnas To Start' parameter as storage quantity from "previous" period
+            starting_amount = parameters['Lasagnas To Start']
+            mdl.addConstraint(x[i] + starting_amount == s[i] + d[i], name=f'balance_at_{i}')
+        else:
+            # In the middle periods, we have the usual flow balance constraints
+            mdl.addConstraint(x[i] + s[i-1] == d[i] + s[i], name=f'balance_at_{i}')
+
+    # In the last period, we use 'Lasagnas To Be Left' (default=0) parameter as storage quantity to be left to
+    # the next horizon
+    left_amount = parameters['Lasagnas To Be Left']
+    mdl.addConstraint(s[max(I)] == left_amount, name=f'last_storage')
+    # endregion
+
+    # region Capacities, as upper bounds of the variables rather than constraint rows
+    if pcap is None:
+        pcap = period_capacities(I, parameters['Production Capacity'])
+    if icap is None:
+        icap = period_capacities(I, parameters['Inventory Capacity'])
+    for i, capacity in pcap.items():
+        x[i].upBound = capacity
+    for i, capacity in icap.items():
+        s[i].upBound = capacity
+    # endregion
+
+    # region Objective function
+    production_cost = pulp.lpSum(pc[i] * x[i] for i in I)
+    inventory_cost = pulp.lpSum(ic[i] * s[i] for i in I)
+    mdl.setObjective(production_cost + inventory_cost)
+    # endregion
+
+    return mdl, x, s
+
+
+def optimize(d, pc, ic, I, parameters, pcap=None, icap=None, engine='pulp', stats=NO_STATS, options=None):
+    """
+    Optimize the pastesian model with the given engine and retrieve the solution.
+
+    Parameters
+    ----------
+    d : dict
+        A dictionary structured as {period_id: demand}
+    pc : dict
+        A dictionary structured as {period_id: production_cost}
+    ic : dict
+        A dictionary structured as {period_id: inventory_cost}
+    I : list
+        A list containing the 'Period ID' values, i.e., all integers from 1 to len(I), not necessarily ordered.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+    pcap, icap : dict, optional
+        Per-period capacities, see build_model.
+    engine : str, optional
+        One of ENGINES, see solve() for details. Default is 'pulp'.
+    stats : pastesian.stats.RunStats, optional
+        When given, the 'build' and 'solve' phases are measured, and the model size and solver statistics recorded.
+    options : dict, optional
+        Solver options, see check_solver_options. Default is None, i.e., the solver defaults.
+
+    Returns
+    -------
+    x_sol : list
+        A list containing pairs of (period_id, production_quantity), or None when the model is not optimal.
+    s_sol : list
+        A list containing pairs of (period_id, inventory_quantity), or None when the model is not optimal.
+    status : str
+        The solver status, following pulp.LpStatus names.
+
+    Raises
+    ------
+    ValueError
+        When engine is not one of ENGINES.
+    """
+    if engine == 'flow':
+        with stats.phase('solve'):
+            x_sol, s_sol, status = solve_lot_sizing(d, pc, ic, I, parameters, pcap, icap)
+        stats.record('solve', 'Status', status)
+        return x_sol, s_sol, status
+    if engine == 'highs':
+        return solve_matrix(d, pc, ic, I, parameters, pcap, icap, stats, options)
+    if engine != 'pulp':
+        raise ValueError(f"engine must be one of {', '.join(map(repr, ENGINES))}, not {engine!r}")
+
+    with stats.phase('build'):
+        mdl, x, s = build_model(d, pc, ic, I, parameters, pcap, icap)
+    stats.record('build', 'Variables', mdl.numVariables())
+    stats.record('build', 'Constraints', mdl.numConstraints())
+    with stats.phase('solve'):
+        mdl.solve(pulp_solver(options))
+    status = pulp.LpStatus[mdl.status]
+    stats.record('solve', 'Status', status)
+    if status != 'Optimal':
+        return None, None, status
+    x_sol = [(key, var.value()) for key, var in x.items()]
+    s_sol = [(key, var.value()) for key, var in s.items()]
+    return x_sol, s_sol, status
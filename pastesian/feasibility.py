@@ -0,0 +1,168 @@
+"""
+Feasibility pre-check of the pastesian model, run by solve() before building any model.
+
+As in pastesian.lot_sizing, let Y(i) be the cumulative supply ('Lasagnas To Start' plus the production up to period i)
+and D(i) the cumulative demand. The model is feasible iff there is a non-decreasing path Y(1), ..., Y(n) with
+increments of at most the production capacity of each period, inside the band [D(i), D(i) + inventory capacity of i],
+and ending at D(n) + 'Lasagnas To Be Left'. The supplies that can be reached at period i form an interval, so a single
+pass of prefix sums decides feasibility in O(n), and pinpoints the periods where the band can't be reached:
+
+- 'Production Shortfall': even producing at capacity since the start, the cumulative demand (plus 'Lasagnas To Be
+  Left' in the last period) can't be met, by Amount lasagnas.
+- 'Inventory Overflow': even producing nothing, more than the inventory capacity has to be stored, by Amount lasagnas.
+- 'Lasagnas To Be Left': 'Lasagnas To Be Left' exceeds the inventory capacity of the last period, by Amount lasagnas.
+
+After a violation, the pass carries on as if it had been fixed, so that every culprit period is reported, and the
+amounts add up to the capacity that is missing (or the inventory that is in excess).
+"""
+import numpy as np
+import pandas as pd
+from pastesian.utils import period_capacities
+
+ISSUES = ('Production Shortfall', 'Inventory Overflow', 'Lasagnas To Be Left')
+
+
+def _capacity_array(capacities, n):
+    values = np.full(n, np.inf)
+    if capacities:
+        values[np.fromiter(capacities, dtype=np.int64, count=len(capacities)) - 1] = list(capacities.values())
+    return values
+
+
+def supply_bands(d, I, parameters, pcap=None, icap=None):
+    """
+    The bounds of the cumulative supply Y(i) that only depend on period i.
+
+    Parameters
+    ----------
+    d, I, parameters, pcap, icap
+        The optimization parameters, see pastesian.engines.build_model.
+
+    Returns
+    -------
+    cum_demand : numpy.ndarray
+        The cumulative demand D(i) of each period, indexed by period_id - 1.
+    lower, upper : numpy.ndarray
+        The band lower <= Y(i) <= upper of each period: the cumulative demand, plus 'Lasagnas To Be Left' in the last
+        period, and the cumulative demand plus the inventory capacity.
+    production_capacity : numpy.ndarray
+        The production capacity of each period, capped at the largest growth of Y, lower(n) - 'Lasagnas To Start', so
+        that its prefix sums are finite.
+    """
+    n = len(I)
+    cum_demand = np.cumsum(np.fromiter((d[i] for i in range(1, n + 1)), dtype=float, count=n))
+    lower = cum_demand.copy()
+    lower[-1] += parameters['Lasagnas To Be Left']
+    upper = cum_demand + _capacity_array(icap, n)
+    upper[-1] = min(upper[-1], lower[-1])
+    production_capacity = np.minimum(_capacity_array(pcap, n), max(lower[-1] - parameters['Lasagnas To Start'], 0.0))
+    return cum_demand, lower, upper, production_capacity
+
+
+def supply_interval(d, I, parameters, pcap=None, icap=None):
+    """
+    The interval [lo(i), hi(i)] of the cumulative supplies Y(i) of all the feasible plans, i.e., the inventories
+    lo(i) - D(i) to hi(i) - D(i) at the end of period i are exactly those from which the rest of the horizon is
+    feasible, and that can be reached from 'Lasagnas To Start'.
+
+    Parameters
+    ----------
+    d, I, parameters, pcap, icap
+        The optimization parameters, see pastesian.engines.build_model.
+
+    Returns
+    -------
+    cum_demand : numpy.ndarray
+        The cumulative demand D(i) of each period, indexed by period_id - 1.
+    lo, hi : numpy.ndarray
+        The interval of Y(i) of each period, with lo > hi somewhere when the model is infeasible.
+    production_capacity : numpy.ndarray
+        The capped production capacity of each period, see supply_bands.
+    """
+    start = parameters['Lasagnas To Start']
+    cum_demand, lower, upper, production_capacity = supply_bands(d, I, parameters, pcap, icap)
+    cum_capacity = np.cumsum(production_capacity)
+    lo = np.maximum(np.maximum.accumulate(np.maximum(lower, start)),
+                    cum_capacity + np.maximum.accumulate((lower - cum_capacity)[::-1])[::-1])
+    hi = np.minimum(cum_capacity + np.minimum(start, np.minimum.accumulate(upper - cum_capacity)),
+                    np.minimum.accumulate(upper[::-1])[::-1])
+    return cum_demand, lo, hi, production_capacity
+
+
+def find_infeasibilities(d, I, parameters, pcap=None, icap=None):
+    """
+    Check whether the pastesian model is feasible, and find the periods that make it infeasible.
+
+    Parameters
+    ----------
+    d : dict
+        A dictionary structured as {period_id: demand}
+    I : list
+        A list containing the 'Period ID' values, i.e., all integers from 1 to len(I), not necessarily ordered.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+    pcap, icap : dict, optional
+        Per-period capacities, see pastesian.engines.build_model.
+
+    Returns
+    -------
+    infeasibilities : list
+        A list of (period_id, issue, amount) triples, issue being one of ISSUES, ordered by period. It's empty when the
+        model is feasible.
+    """
+    n = len(I)
+    if pcap is None:
+        pcap = period_capacities(I, parameters['Production Capacity'])
+    if icap is None:
+        icap = period_capacities(I, parameters['Inventory Capacity'])
+    start = parameters['Lasagnas To Start']
+    left = parameters['Lasagnas To Be Left']
+    production_capacity = _capacity_array(pcap, n)
+    inventory_capacity = _capacity_array(icap, n)
+    cum_demand = np.cumsum(np.fromiter((d[i] for i in range(1, n + 1)), dtype=float, count=n))
+
+    # region Band of each period: lower <= Y(i) <= upper
+    lower = cum_demand.copy()
+    upper = cum_demand + inventory_capacity
+    lower[-1] += left
+    upper[-1] = min(upper[-1], lower[-1])
+    tol = 1e-9 * max(1.0, lower[-1] + start)
+    # endregion
+
+    # region Fast path: the reachable supplies are [max(start, lower(i)), min over k <= i of band and capacity bounds]
+    # (lower is non-decreasing), computed for all periods at once with running maxima and minima. Y never exceeds
+    # lower(n), so capping the production capacities there keeps the prefix sums finite without changing anything.
+    cum_capacity = np.cumsum(np.minimum(production_capacity, max(lower[-1], 0.0)))
+    reach_low = np.maximum(lower, start)
+    reach_high = cum_capacity + np.minimum(start, np.minimum.accumulate(upper - cum_capacity))
+    if (left <= inventory_capacity[-1] + tol) and (reach_low <= reach_high + tol).all():
+        return []
+    # endregion
+
+    # region Diagnosis, period by period
+    infeasibilities = []
+    if left > inventory_capacity[-1] + tol:
+        infeasibilities.append((n, 'Lasagnas To Be Left', float(left - inventory_capacity[-1])))
+        upper[-1] = lower[-1]
+    low = high = start
+    for i in range(n):
+        high += production_capacity[i]
+        if high < lower[i] - tol:
+            infeasibilities.append((i + 1, 'Production Shortfall', float(lower[i] - high)))
+            high = lower[i]
+        elif low > upper[i] + tol:
+            infeasibilities.append((i + 1, 'Inventory Overflow', float(low - upper[i])))
+            low = upper[i]
+        low = max(low, lower[i])
+        high = min(high, upper[i])
+    # endregion
+    infeasibilities.sort(key=lambda infeasibility: infeasibility[0])
+    return infeasibilities
+
+
+def diagnostics_table(infeasibilities):
+    """
+    Return the infeasibilities found by find_infeasibilities as a DataFrame with the columns of the 'diagnostics'
+    output table.
+    """
+    return pd.DataFrame(infeasibilities, columns=['Period ID', 'Issue', 'Amount'])
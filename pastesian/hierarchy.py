@@ -0,0 +1,251 @@
+"""
+Hierarchical mode: the periods are aggregated into buckets by their 'Time Period' (e.g., days into months), the reduced
+model is solved over the buckets, and every bucket is then refined at full resolution, see solve_hierarchical.
+
+Let Y(i) be the cumulative supply, as in pastesian.decomposition. A bucket of periods a, ..., b can be planned with the
+supplies Y(a - 1) = u at its start and Y(b) = v at its end iff v - u is at most the production capacity of the bucket,
+and u and v are within bounds computed from the bands of the periods of the bucket, so the reduced model, with one
+production and one inventory variable per bucket, has exactly the bucket-boundary inventories of the feasible plans.
+Its costs are an estimate: the production cost of a bucket is the average cost of meeting its demand from within the
+bucket, and the inventory at its end costs the holding of the cheapest production of the bucket until its end, and
+then until the demand of the next bucket is met.
+
+Fixing the boundary inventories to the ones of the reduced model, the buckets are independent segments, solved in
+parallel by pastesian.decomposition.solve_segments. The plan is feasible but not necessarily optimal, so its cost is
+reported along with a lower bound of the cost of the full solve, the larger of two relaxations (valid whenever no
+inventory cost is negative): the reduced model with the cheapest production cost of each bucket, and holding only
+charged at the bucket ends, which keeps the capacities, and the model without capacities, whose cost is a sum over the
+demand in O(n log n).
+"""
+import numpy as np
+import pandas as pd
+from pastesian.decomposition import decomposable_parameters, solve_segments
+from pastesian.feasibility import find_infeasibilities, supply_bands
+from pastesian.main import solve
+from pastesian.matrix import LINPROG_STATUS, build_matrices, linprog
+
+
+def bucket_periods(dat, freq='M'):
+    """
+    Group the periods into buckets of consecutive periods with the same 'Time Period' at the coarser frequency.
+
+    Parameters
+    ----------
+    dat : PanDat or ScenarioOverlay
+        PanDat object which is compatible with the input_schema and contains the input data, with a 'Time Period' for
+        every period.
+    freq : str, optional
+        A pandas period frequency, e.g., 'W' (weeks), 'M' (months, the default) or 'Q' (quarters).
+
+    Returns
+    -------
+    bounds : list
+        A list of (first_period, last_period) pairs, one per bucket, ordered by period.
+    """
+    time_periods = dat.time_periods.sort_values('Period ID')
+    labels = pd.Series(pd.to_datetime(time_periods['Time Period']).dt.to_period(freq).to_numpy())
+    firsts = time_periods['Period ID'].to_numpy()[(labels != labels.shift()).to_numpy()]
+    lasts = np.append(firsts[1:] - 1, len(time_periods))
+    return list(zip(firsts.tolist(), lasts.tolist()))
+
+
+def _bucket_costs(pc, ic, n, bounds, demand):
+    """
+    The production and inventory costs of the buckets used to plan (see the module docstring) and to bound.
+    """
+    periods = range(1, n + 1)
+    production_cost = np.fromiter((pc[i] for i in periods), dtype=float, count=n)
+    inventory_cost = np.fromiter((ic[i] for i in periods), dtype=float, count=n)
+    firsts = np.array([first for first, _ in bounds]) - 1
+    lasts = np.array([last for _, last in bounds]) - 1
+    bucket = np.repeat(np.arange(len(bounds)), lasts - firsts + 1)
+    held_before = np.concatenate([[0.0], np.cumsum(inventory_cost)])[:-1]  # holding cost of periods before i
+
+    # cheapest cost of meeting the demand of each period from within its bucket, and from the end of the bucket
+    produced = pd.Series(production_cost - held_before).groupby(bucket)
+    cheapest = produced.cummin().to_numpy() + held_before
+    at_end = produced.min().to_numpy() + held_before[lasts] + inventory_cost[lasts]
+    weights = np.clip(demand, 0.0, None)
+    totals = np.bincount(bucket, weights)
+    weights = np.where(totals[bucket] > 0, weights / np.where(totals > 0, totals, 1.0)[bucket],
+                       1.0 / np.bincount(bucket)[bucket])
+    average = np.bincount(bucket, weights * cheapest)
+    waiting = np.bincount(bucket, weights * (held_before - held_before[firsts][bucket]))
+
+    plan = average, at_end - average + np.append(waiting[1:], 0.0)
+    # every lasagna in the inventory at the end of a bucket was either produced in it, and costs at least at_end, or
+    # held through all of it
+    cheapest_production = np.minimum.reduceat(production_cost, firsts)
+    held_through = np.bincount(bucket, inventory_cost)
+    bound = cheapest_production, np.minimum(at_end - cheapest_production, held_through)
+    return plan, bound
+
+
+def _uncapacitated_bound(pc, ic, n, demand, parameters):
+    """
+    Lower bound of the cost of any plan, when no demand and no inventory cost is negative: without capacities, every
+    lasagna demanded in period i (or left after period n) costs at least the cheapest production up to i plus its
+    holding until i, except the 'Lasagnas To Start', which are given to the most expensive ones.
+    """
+    periods = range(1, n + 1)
+    production_cost = np.fromiter((pc[i] for i in periods), dtype=float, count=n)
+    held_before = np.concatenate([[0.0], np.cumsum([ic[i] for i in periods])])
+    cheapest = np.minimum.accumulate(production_cost - held_before[:-1]) + held_before[:-1]
+    unit_costs = np.append(cheapest, np.min(production_cost - held_before[:-1]) + held_before[-1])
+    amounts = np.append(demand, parameters['Lasagnas To Be Left'])
+    order = np.argsort(-unit_costs, kind='stable')
+    # lasagnas of each period covered by the starting inventory, the most expensive first
+    covered = np.diff(np.minimum(np.concatenate([[0.0], np.cumsum(amounts[order])]), parameters['Lasagnas To Start']))
+    return float(unit_costs[order] @ (amounts[order] - covered))
+
+
+def solve_buckets(d, pc, ic, I, parameters, pcap, icap, bounds, costs):
+    """
+    Solve the reduced model over the buckets with HiGHS.
+
+    Parameters
+    ----------
+    d, pc, ic, I, parameters, pcap, icap
+        The optimization parameters, see pastesian.engines.build_model.
+    bounds : list
+        A list of (first_period, last_period) pairs, one per bucket, as created by bucket_periods.
+    costs : tuple
+        The production and inventory cost of each bucket, as arrays.
+
+    Returns
+    -------
+    inventory : dict
+        A dictionary structured as {period_id: inventory} with the inventory at the end of each bucket, and of period 0,
+        or None when the model is not optimal.
+    cost : float
+        The optimal cost of the reduced model, or None.
+    status : str
+        The solver status, following pulp.LpStatus names.
+    """
+    n = len(I)
+    start = parameters['Lasagnas To Start']
+    cum_demand, lower, upper, production_capacity = supply_bands(d, I, parameters, pcap, icap)
+    cum_capacity = np.concatenate([[0.0], np.cumsum(production_capacity)])
+    firsts = np.array([first for first, _ in bounds]) - 1
+    lasts = np.array([last for _, last in bounds]) - 1
+    k = len(bounds)
+
+    # region Bounds of the supply at the end of each bucket, given by the periods of the bucket and of the next one
+    end_lower = np.maximum.reduceat(lower, firsts)
+    end_upper = np.minimum.reduceat(upper - cum_capacity[1:], firsts) + cum_capacity[lasts + 1]
+    start_lower = np.maximum.reduceat(lower - cum_capacity[1:], firsts) + cum_capacity[firsts]
+    start_upper = np.minimum.reduceat(upper, firsts)
+    end_lower[:-1] = np.maximum(end_lower[:-1], start_lower[1:])
+    end_upper[:-1] = np.minimum(end_upper[:-1], start_upper[1:])
+    # endregion
+
+    buckets = list(range(1, k + 1))
+    bucket_demand = np.diff(np.concatenate([[0.0], cum_demand[lasts]]))
+    capacity = cum_capacity[lasts + 1] - cum_capacity[firsts]
+    c, A_eq, b_eq, variable_bounds = build_matrices(
+        dict(zip(buckets, bucket_demand)), dict(zip(buckets, costs[0])), dict(zip(buckets, costs[1])), buckets,
+        parameters, dict(zip(buckets, capacity)), {})
+    variable_bounds[k:2 * k - 1, 0] = np.maximum(end_lower[:-1] - cum_demand[lasts[:-1]], 0.0)
+    variable_bounds[k:2 * k - 1, 1] = end_upper[:-1] - cum_demand[lasts[:-1]]
+    if start < start_lower[0] or start > start_upper[0]:
+        return None, None, 'Infeasible'
+    res = linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=variable_bounds, method='highs')
+    status = LINPROG_STATUS.get(res.status, 'Undefined')
+    if status != 'Optimal':
+        return None, None, status
+
+    # snap the inventories into their bounds, and to the nearest integer when they're that close, so that the
+    # refinement of every bucket is feasible
+    inventory = np.clip(res.x[k:], variable_bounds[k:, 0], variable_bounds[k:, 1])
+    inventory = np.where(np.abs(inventory - np.round(inventory)) <= 1e-6, np.round(inventory), inventory)
+    return dict(zip([0] + (lasts + 1).tolist(), [start] + inventory.tolist())), float(res.fun), status
+
+
+def solve_hierarchical(dat, freq='M', workers=None, **solve_kwargs):
+    """
+    Solve the pastesian model over buckets of periods, then refine every bucket at full resolution, in parallel.
+
+    Parameters
+    ----------
+    dat : PanDat or ScenarioOverlay
+        PanDat object which is compatible with the input_schema and contains the input data, with a single product and
+        without setup costs and minimum batch sizes, and a 'Time Period' for every period.
+    freq : str, optional
+        The frequency of the buckets, see bucket_periods. Default is 'M', i.e., months.
+    workers : int, optional
+        Number of worker processes, defaults to os.cpu_count().
+    **solve_kwargs
+        Keyword arguments passed along to solve() for every bucket, e.g., engine='flow'.
+
+    Returns
+    -------
+    sln : PanDat
+        A PanDat object containing the output data, compatible with the output schema, as returned by
+        pastesian.decomposition.solve_segments. Its 'solver_status' table also has the number of 'Buckets', the
+        'Upper Bound' (the cost of the plan), the 'Lower Bound' (None when some inventory cost is negative) and the
+        'Gap', (upper - lower) / upper, which bounds the relative gap to the cost of a full solve. When the model is
+        infeasible, or has a single bucket, it's solved by solve() as a whole.
+
+    Raises
+    ------
+    ValueError
+        The same cases as solve(), and when dat has multiple products or setups.
+    """
+    d, pc, ic, I, parameters, pcap, icap = decomposable_parameters(dat, 'solve_hierarchical')
+    bounds = bucket_periods(dat, freq)
+    if len(bounds) == 1 or find_infeasibilities(d, I, parameters, pcap, icap):
+        return solve(dat, **solve_kwargs)
+    n = len(I)
+    demand = np.fromiter((d[i] for i in range(1, n + 1)), dtype=float, count=n)
+    plan_costs, bound_costs = _bucket_costs(pc, ic, n, bounds, demand)
+    inventory, _, status = solve_buckets(d, pc, ic, I, parameters, pcap, icap, bounds, plan_costs)
+    if status != 'Optimal':
+        return solve(dat, **solve_kwargs)
+
+    sln = solve_segments(dat, bounds, inventory, workers, **solve_kwargs)
+    upper_bound = float(sln.costs['Total Cost'].sum()) if len(sln.costs) else None
+    lower_bound = None
+    if min(ic.values()) >= 0:
+        lower_bound = solve_buckets(d, pc, ic, I, parameters, pcap, icap, bounds, bound_costs)[1]
+        if lower_bound is not None and (demand >= 0).all():
+            lower_bound = max(lower_bound, _uncapacitated_bound(pc, ic, n, demand, parameters))
+    gap = None
+    if upper_bound is not None and lower_bound is not None:
+        gap = 0.0 if abs(upper_bound) < 1e-9 else max(upper_bound - lower_bound, 0.0) / abs(upper_bound)
+    sln.solver_status = pd.concat([sln.solver_status, pd.DataFrame(
+        {'Statistic': ['Buckets', 'Upper Bound', 'Lower Bound', 'Gap'],
+         'Value': [len(bounds), upper_bound, lower_bound, gap]})], ignore_index=True)
+    return sln
+
+
+def hierarchical_gap(dat, freq='M', engine='flow'):
+    """
+    Measure the optimality gap of the hierarchical solution by also solving the full horizon at once, which is only
+    sensible on instances small enough for the full solve.
+
+    Parameters
+    ----------
+    dat, freq
+        See solve_hierarchical.
+    engine : str, optional
+        The engine used for all solves, see solve(). Default is 'flow', the fastest one.
+
+    Returns
+    -------
+    hierarchical_cost : float
+        Total cost of the hierarchical solution, or None when it's not optimal.
+    full_cost : float
+        Total cost of the full-horizon solution, or None when it's not optimal.
+    gap : float
+        (hierarchical_cost - full_cost) / full_cost (0.0 when both costs are zero), or None when some cost is None.
+    """
+    costs = [solve_hierarchical(dat, freq, engine=engine).costs, solve(dat, engine=engine).costs]
+    hierarchical_cost, full_cost = (float(table['Total Cost'].sum()) if len(table) else None for table in costs)
+
+    if hierarchical_cost is None or full_cost is None:
+        gap = None
+    elif full_cost == 0:
+        gap = 0.0 if hierarchical_cost == 0 else float('inf')
+    else:
+        gap = (hierarchical_cost - full_cost) / full_cost
+    return hierarchical_cost, full_cost, gap
@@ -0,0 +1,217 @@
+"""
+Data integrity report of pastesian data sets, as one table of failures.
+
+ticdat finds the data type, duplicate, foreign key and data row failures of a PanDat in separate passes, most of them
+applying a Python function to every row (e.g., the 'Total Cost = Production Cost + Inventory Cost' predicate of the
+output schema), which makes validating large inputs and outputs slower than solving them. find_integrity_failures does
+the same checks, with the same rules, as column-wise pandas/numpy operations, table by table, and returns a DataFrame
+with one row per failure:
+
+>> from pastesian.integrity import find_integrity_failures
+>> failures = find_integrity_failures(dat)  # or find_integrity_failures(sln, output_schema)
+
+Data row predicates are evaluated through their vectorized counterpart in VECTORIZED_PREDICATES, when there is one,
+and row by row otherwise, as ticdat does.
+"""
+import numpy as np
+import pandas as pd
+from ticdat.utils import TypeDictionary
+
+from pastesian.schemas import TOTAL_COST_PREDICATE, total_cost_matches
+
+CHECKS = ('Data Type', 'Duplicate', 'Foreign Key', 'Data Row')
+FAILURE_COLUMNS = ['Table', 'Check', 'Rule', 'Row']
+
+# Data type of the primary key fields without one, which, as in ticdat, only rules out nulls (and booleans)
+_PRIMARY_KEY_TYPE = TypeDictionary(number_allowed=True, inclusive_min=True, inclusive_max=True, min=-np.inf,
+                                   max=np.inf, must_be_int=False, strings_allowed='*', nullable=False, datetime=False)
+
+# Vectorized counterparts of the data row predicates of the schemas, structured as
+# {(table, predicate_name): function}, the function receiving the whole table and returning a boolean Series that is
+# True for the valid rows; they are the schema predicates themselves when those also work elementwise on a table
+VECTORIZED_PREDICATES = {
+    ('costs', TOTAL_COST_PREDICATE): total_cost_matches,
+}
+
+
+def _strings(values):
+    """
+    Boolean array that is True where values holds a string.
+    """
+    if pd.api.types.is_string_dtype(values.dtype) and not pd.api.types.is_object_dtype(values.dtype):
+        return values.notna().to_numpy()
+    if not pd.api.types.is_object_dtype(values.dtype):
+        return np.zeros(len(values), dtype=bool)
+    try:
+        return values.str.len().notna().to_numpy()
+    except AttributeError:  # an object column without any string
+        return np.zeros(len(values), dtype=bool)
+
+
+def invalid_data(values, data_type):
+    """
+    Check a column against a ticdat data type, all rows at once.
+
+    Parameters
+    ----------
+    values : pandas.Series
+        The column to check.
+    data_type : ticdat.utils.TypeDictionary
+        The data type of the column, as in schema.data_types[table][field].
+
+    Returns
+    -------
+    invalid : numpy.ndarray
+        A boolean array, True for the rows whose value isn't valid, as decided by data_type.valid_data.
+    """
+    null = values.isna().to_numpy()
+    invalid = null & (not data_type.nullable)
+    strings = _strings(values)
+    if pd.api.types.is_bool_dtype(values.dtype) or pd.api.types.is_datetime64_any_dtype(values.dtype):
+        numbers, x = np.zeros(len(values), dtype=bool), np.zeros(len(values))
+    else:
+        x = pd.to_numeric(values.where(~strings), errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        numbers = ~null & ~strings & ~np.isnan(x)
+        if pd.api.types.infer_dtype(values, skipna=True) in ('boolean', 'mixed', 'mixed-integer'):
+            numbers &= ~np.fromiter((isinstance(v, (bool, np.bool_)) for v in values), dtype=bool, count=len(x))
+    if data_type.datetime:
+        # as in ticdat, numbers aren't valid dates, while strings are valid when they can be parsed as dates
+        try:
+            parsed = pd.to_datetime(values.where(~numbers), errors='coerce', format='mixed')
+        except (TypeError, ValueError):  # pandas < 2.0, which infers the format of each value anyway
+            parsed = pd.to_datetime(values.where(~numbers), errors='coerce')
+        return invalid | numbers | (~null & parsed.isna().to_numpy())
+    invalid |= ~null & ~strings & ~numbers  # neither a number nor a string, e.g., a boolean
+    if numbers.any():
+        if not data_type.number_allowed:
+            invalid |= numbers
+        else:
+            with np.errstate(invalid='ignore'):
+                bad = (x < data_type.min) | (x > data_type.max)
+                if not data_type.inclusive_min:
+                    bad |= x == data_type.min
+                if not data_type.inclusive_max:
+                    bad |= x == data_type.max
+                if data_type.must_be_int:
+                    bad |= (np.mod(x, 1) != 0) & ~((x == np.inf) & (data_type.max == np.inf) &
+                                                   bool(data_type.inclusive_max))
+            invalid |= numbers & bad
+    if strings.any() and data_type.strings_allowed != '*':
+        invalid |= strings & ~values.isin(list(data_type.strings_allowed)).to_numpy()
+    return invalid
+
+
+def _data_type_failures(schema, table, name):
+    data_types = dict(dict.fromkeys(schema.primary_key_fields.get(name, ()), _PRIMARY_KEY_TYPE),
+                      **schema.data_types.get(name, {}))
+    for field in schema.primary_key_fields.get(name, ()) + schema.data_fields.get(name, ()):
+        if field in data_types:
+            yield field, invalid_data(table[field], data_types[field])
+
+
+def _parameter_failures(schema, table):
+    name_field, value_field = schema.primary_key_fields['parameters'][0], schema.data_fields['parameters'][0]
+    names = table[name_field]
+    invalid = ~names.isin(list(schema.parameters)).to_numpy()
+    for parameter, info in schema.parameters.items():
+        rows = (names == parameter).to_numpy()
+        if info.type_dictionary is not None and rows.any():
+            invalid[rows] = invalid_data(table.loc[rows, value_field].astype(object), info.type_dictionary)
+    return invalid
+
+
+def _foreign_key_failures(dat, fk):
+    mappings = [fk.mapping] if hasattr(fk.mapping, 'native_field') else list(fk.mapping)
+    native, foreign = getattr(dat, fk.native_table), getattr(dat, fk.foreign_table)
+    if len(mappings) == 1:
+        keys, foreign_keys = native[mappings[0].native_field], foreign[mappings[0].foreign_field]
+        found = keys.isin(foreign_keys) | (keys.isna() & foreign_keys.isna().any())  # None matches NaN, as in ticdat
+    else:
+        native_keys = pd.MultiIndex.from_frame(native[[m.native_field for m in mappings]])
+        found = native_keys.isin(pd.MultiIndex.from_frame(foreign[[m.foreign_field for m in mappings]]))
+    return ~np.asarray(found, dtype=bool)
+
+
+def _row_predicate_failures(dat, table, name, predicate_name, info, cache):
+    vectorized = VECTORIZED_PREDICATES.get((name, predicate_name))
+    if vectorized is not None and info.predicate_kwargs_maker is None:
+        try:
+            return ~np.asarray(vectorized(table), dtype=bool)
+        except (TypeError, ValueError):  # e.g., strings in a numeric column, left to the row-wise predicate
+            pass
+    kwargs = {}
+    if info.predicate_kwargs_maker is not None:
+        if info.predicate_kwargs_maker not in cache:
+            try:
+                cache[info.predicate_kwargs_maker] = info.predicate_kwargs_maker(dat)
+            except Exception:
+                cache[info.predicate_kwargs_maker] = None
+        kwargs = cache[info.predicate_kwargs_maker]
+        if not isinstance(kwargs, dict):
+            return np.ones(len(table), dtype=bool)
+
+    def good(row):
+        try:
+            result = info.predicate(row, **kwargs)
+        except Exception:
+            return False
+        return result is True if info.predicate_failure_response == 'Error Message' else bool(result)
+    return np.fromiter((not good(row) for row in table.to_dict('records')), dtype=bool, count=len(table))
+
+
+def find_integrity_failures(dat, schema=None):
+    """
+    Find the data integrity failures of a PanDat object, with the rules of its schema.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with schema, e.g., the input data or the output of solve().
+    schema : PanDatFactory, optional
+        The schema whose data types, foreign keys, parameters and data row predicates are checked. Default is
+        pastesian.input_schema.
+
+    Returns
+    -------
+    failures : DataFrame
+        A DataFrame with one row per failure and the columns 'Table', 'Check' (one of CHECKS), 'Rule' and 'Row' (the
+        index label of the failing row in its table). 'Rule' is the field for 'Data Type' failures, the primary key
+        fields for 'Duplicate' failures, the foreign table and its fields for 'Foreign Key' failures and the predicate
+        name for 'Data Row' failures ('Good Name/Value Check' for the parameters, as in ticdat). Duplicates are
+        reported for every occurrence of a primary key but the first. The failures are ordered by table name, then as
+        in CHECKS. It's empty when dat is clean.
+    """
+    if schema is None:
+        from pastesian.schemas import input_schema as schema
+    foreign_keys = {}
+    for fk in schema.foreign_keys:
+        foreign_keys.setdefault(fk.native_table, []).append(fk)
+    failures = []
+
+    def add(name, check, rule, invalid):
+        if invalid.any():
+            failures.append(pd.DataFrame({'Table': name, 'Check': check, 'Rule': rule,
+                                          'Row': getattr(dat, name).index[invalid]}))
+
+    kwargs_cache = {}
+    for name in sorted(schema.all_tables):
+        table = getattr(dat, name)
+        if table.empty:
+            continue
+        for field, invalid in _data_type_failures(schema, table, name):
+            add(name, 'Data Type', field, invalid)
+        primary_key = list(schema.primary_key_fields.get(name, ()))
+        if primary_key:
+            add(name, 'Duplicate', ', '.join(primary_key), table.duplicated(subset=primary_key).to_numpy())
+        for fk in foreign_keys.get(name, []):
+            mappings = [fk.mapping] if hasattr(fk.mapping, 'native_field') else list(fk.mapping)
+            rule = f"{fk.foreign_table} ({', '.join(m.foreign_field for m in mappings)})"
+            add(name, 'Foreign Key', rule, _foreign_key_failures(dat, fk))
+        if name == 'parameters' and schema.parameters:
+            add(name, 'Data Row', 'Good Name/Value Check', _parameter_failures(schema, table))
+        for predicate_name, info in schema.get_row_predicates(name).items():
+            add(name, 'Data Row', predicate_name,
+                _row_predicate_failures(dat, table, name, predicate_name, info, kwargs_cache))
+    if not failures:
+        return pd.DataFrame(columns=FAILURE_COLUMNS)
+    return pd.concat(failures, ignore_index=True)
@@ -0,0 +1,129 @@
+"""
+Specialized solver for the pastesian model, used by solve() when engine='flow'.
+
+The pastesian model is a capacitated single-item lot-sizing problem with linear costs: one flow balance row per period
+and box bounds on production and storage. Writing s[i] = Y(i) - D(i), where Y(i) is the cumulative supply (starting
+inventory plus production) and D(i) the cumulative demand up to period i, the problem becomes choosing a non-decreasing
+path Y(1), ..., Y(n) with increments in [0, production capacity of i] that stays inside the band
+[D(i), D(i) + inventory capacity of i] and ends at D(n) + 'Lasagnas To Be Left'.
+
+The minimum cost as a function of Y(i) is convex and piecewise linear, so it is carried forward period by period as a
+multiset of linear pieces ("slope trick"): each piece is the remaining capacity of a production period, with slope equal
+to the cost of delivering one unit from that period to the current one. Meeting demand consumes the cheapest pieces and
+the storage capacity trims the most expensive ones, which gives an O(n log n) algorithm with no LP involved.
+"""
+import heapq
+from pastesian.utils import period_capacities
+
+
+def solve_lot_sizing(d, pc, ic, I, parameters, pcap=None, icap=None):
+    """
+    Solve the pastesian model directly over the chain of periods, without building an LP.
+
+    Parameters
+    ----------
+    d : dict
+        A dictionary structured as {period_id: demand}
+    pc : dict
+        A dictionary structured as {period_id: production_cost}
+    ic : dict
+        A dictionary structured as {period_id: inventory_cost}
+    I : list
+        A list containing the 'Period ID' values, i.e., all integers from 1 to len(I), not necessarily ordered.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+    pcap, icap : dict, optional
+        Per-period capacities, see pastesian.engines.build_model.
+
+    Returns
+    -------
+    x_sol : list
+        A list containing pairs of (period_id, production_quantity), or None when the model is infeasible.
+    s_sol : list
+        A list containing pairs of (period_id, inventory_quantity), or None when the model is infeasible.
+    status : str
+        Either 'Optimal' or 'Infeasible', following pulp.LpStatus names.
+    """
+    periods = sorted(I)
+    start = parameters['Lasagnas To Start']
+    left = parameters['Lasagnas To Be Left']
+    if pcap is None:
+        pcap = period_capacities(I, parameters['Production Capacity'])
+    if icap is None:
+        icap = period_capacities(I, parameters['Inventory Capacity'])
+
+    # Total production is fixed by the flow balance, so it is also a valid bound for uncapacitated production
+    total_production = sum(d[i] for i in periods) + left - start
+    # Fractional data (e.g., scaled demand) accumulates rounding errors, which must neither make pieces of zero length
+    # look needed nor make a feasible model look infeasible
+    tol = 1e-9 * max(1.0, total_production + start)
+    if total_production < -tol:
+        return None, None, 'Infeasible'
+
+    # region Forward pass
+    x = dict.fromkeys(periods, 0)
+    length = {}  # remaining (uncommitted) capacity of each production period, i.e., the length of its linear piece
+    cheapest = []  # min-heap of (slope key, -period_id), preferring later periods on ties
+    priciest = []  # max-heap of (-slope key, period_id), trimming earlier periods first on ties
+    total_length = 0
+    holding = 0.0  # cumulative inventory cost up to the current period, which turns costs into comparable slope keys
+    supply = start  # Y(i): cumulative supply committed so far
+    cum_demand = 0
+    for i in periods:
+        piece_length = min(pcap.get(i, total_production), total_production)
+        if piece_length > 0:
+            key = pc[i] - holding
+            length[i] = piece_length
+            total_length += piece_length
+            heapq.heappush(cheapest, (key, -i))
+            heapq.heappush(priciest, (-key, i))
+        holding += ic[i]
+        cum_demand += d[i]
+
+        lower = cum_demand
+        upper = cum_demand + icap[i] if i in icap else float('inf')
+        if i == periods[-1]:
+            lower = cum_demand + left
+            upper = min(upper, lower)
+        if supply > upper + tol or lower > upper + tol:
+            return None, None, 'Infeasible'
+
+        # Meet the demand with the cheapest pieces available
+        while supply < lower - tol:
+            while cheapest and not length[-cheapest[0][1]]:
+                heapq.heappop(cheapest)
+            if not cheapest:
+                return None, None, 'Infeasible'
+            j = -cheapest[0][1]
+            amount = min(length[j], lower - supply)
+            x[j] += amount
+            length[j] -= amount
+            total_length -= amount
+            supply += amount
+
+        # Drop the most expensive capacity that could only be used by overflowing the storage capacity
+        excess = supply + total_length - upper
+        while excess > tol:
+            while priciest and not length[priciest[0][1]]:
+                heapq.heappop(priciest)
+            if not priciest:  # only rounding errors were left in total_length
+                total_length = 0
+                break
+            j = priciest[0][1]
+            amount = min(length[j], excess)
+            length[j] -= amount
+            total_length -= amount
+            excess -= amount
+    # endregion
+
+    # region Retrieve the solution
+    x_sol = []
+    s_sol = []
+    inventory = start
+    for i in periods:
+        inventory += x[i] - d[i]
+        x_sol.append((i, float(x[i])))
+        s_sol.append((i, float(inventory)))
+    # endregion
+
+    return x_sol, s_sol, 'Optimal'
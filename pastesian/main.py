@@ -1,7 +1,15 @@
 from pastesian import input_schema, output_schema
-import pulp
+import time
+import numpy as np
 import pandas as pd
-from pastesian.utils import check_each_period_id_column
+from pastesian.utils import check_each_period_id_column, period_capacities
+from pastesian.engines import ENGINES, optimize, check_solver_options
+from pastesian.rolling import solve_rolling_horizon
+from pastesian.feasibility import find_infeasibilities, diagnostics_table
+from pastesian.mip import create_setup_parameters, has_setups, optimize_mip
+from pastesian.multi import is_multi_product, create_multi_product_parameters, optimize_multi_product, \
+    populate_multi_product_output
+from pastesian.stats import RunStats, NO_STATS, registered_callbacks
 
 
 def create_optimization_parameters(dat):
@@ -13,9 +21,9 @@ def create_optimization_parameters(dat):
 
     Parameters
     ----------
-    dat : PanDat
+    dat : PanDat or ScenarioOverlay
         PanDat object which is compatible with the input_schema and contains the input data. It will be used to
-        create the optimization parameters.
+        create the optimization parameters. A pastesian.overlay.ScenarioOverlay of it is accepted as well.
 
     Returns
     -------
@@ -37,17 +45,16 @@ def create_optimization_parameters(dat):
     pc = dict(zip(dat.costs['Period ID'], dat.costs['Production Cost']))  # dict: {period_id: production_cost}
     ic = dict(zip(dat.costs['Period ID'], dat.costs['Inventory Cost']))  # dict: {period_id: inventory_cost}
 
-    # Ensure 'costs' and 'demand' tables have the same 'Period ID' columns
-    d_set = set(d.keys())  # creates a set from demand['Period ID']
-    pc_set = set(pc.keys())  # creates a set from costs['Period ID']
-    d_minus_pc = d_set.difference(pc_set)
-    pc_minus_d = pc_set.difference(d_set)
-    if d_minus_pc:
+    # Ensure 'costs' and 'demand' tables have the same 'Period ID' columns (already guaranteed when dat passed
+    # check_each_period_id_column, so this is just a cheap safeguard for direct calls)
+    d_minus_pc = np.setdiff1d(dat.demand['Period ID'], dat.costs['Period ID'])
+    pc_minus_d = np.setdiff1d(dat.costs['Period ID'], dat.demand['Period ID'])
+    if d_minus_pc.size:
         raise ValueError(f'The following indexes exist in demand["Period ID"] but not in costs["Period ID"]: '
-                         f'{d_minus_pc}')
-    if pc_minus_d:
+                         f'{set(d_minus_pc.tolist())}')
+    if pc_minus_d.size:
         raise ValueError(f'The following indexes exist in costs["Period ID"] but not in demand["Period ID"]: '
-                         f'{pc_minus_d}')
+                         f'{set(pc_minus_d.tolist())}')
 
     # Variables keys
     I = list(dat.demand['Period ID'])  # list like [1, 2, 3, ...] with periods' numbers, not necessarily ordered. We
@@ -57,7 +64,55 @@ def create_optimization_parameters(dat):
     return d, pc, ic, I
 
 
-def populate_output_schema(x_sol, s_sol, dat):
+def create_capacity_parameters(dat, I, parameters):
+    """
+    Reads the capacities from PanDat object, i.e., the 'Production Capacity' and 'Inventory Capacity' parameters
+    overridden by the optional 'capacities' table, and creates the per-period capacity parameters.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with the input_schema and contains the input data.
+    I : list
+        A list containing the 'Period ID' values, as created by create_optimization_parameters.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+
+    Returns
+    -------
+    pcap : dict
+        A dictionary structured as {period_id: production_capacity}, only for periods with a production capacity.
+    icap : dict
+        A dictionary structured as {period_id: inventory_capacity}, only for periods with an inventory capacity.
+    """
+    capacities = dat.capacities
+    prod_rows = capacities[capacities['Production Capacity'].notna()]
+    inv_rows = capacities[capacities['Inventory Capacity'].notna()]
+    pcap = period_capacities(I, parameters['Production Capacity'],
+                             dict(zip(prod_rows['Period ID'], prod_rows['Production Capacity'])))
+    icap = period_capacities(I, parameters['Inventory Capacity'],
+                             dict(zip(inv_rows['Period ID'], inv_rows['Inventory Capacity'])))
+    return pcap, icap
+
+
+def _period_array(solution, n):
+    """
+    Gather a list of (period_id, value) pairs into an array of length n indexed by period_id - 1.
+    """
+    pairs = np.fromiter(solution, dtype=[('key', np.int64), ('value', float)], count=n)
+    values = np.empty(n)
+    values[pairs['key'] - 1] = pairs['value']
+    return values
+
+
+def _float64(values):
+    """
+    Wrap a float array as a nullable 'Float64' array without copying it.
+    """
+    return pd.arrays.FloatingArray(values, np.zeros(len(values), dtype=bool))
+
+
+def populate_output_schema(x_sol, s_sol, dat, sc=None):
     """
     Create the PanDat object containing the output of the optimization.
 
@@ -71,6 +126,9 @@ def populate_output_schema(x_sol, s_sol, dat):
         A list containing pairs of (key, value) for all keys of the "s" variable, with corresponding optimal values.
     dat : PanDat
         PanDat object which is compatible with the input_schema and contains the input data.
+    sc : dict, optional
+        A dictionary structured as {period_id: setup_cost}, as created by pastesian.mip.create_setup_parameters. When
+        given, the 'Production Cost' of each period with some production includes its setup cost.
 
     Returns
     -------
@@ -79,114 +137,176 @@ def populate_output_schema(x_sol, s_sol, dat):
     """
     sln = output_schema.PanDat()
     if x_sol:
-        x_df = pd.DataFrame(x_sol, columns=['Period ID', 'Production Quantity'])
-        s_df = pd.DataFrame(s_sol, columns=['Period ID', 'Inventory Quantity'])
-
-        # Ordering the above DataFrames by increasing 'Period ID' number, more convenient for retrieving
-        x_df.sort_values(axis=0, by='Period ID', inplace=True)
-        s_df.sort_values(axis=0, by='Period ID', inplace=True)
+        # Gather the solution and the costs into arrays indexed by 'Period ID' - 1, so that every table below is
+        # built once, already ordered by increasing 'Period ID', without any sort or merge
+        n = len(x_sol)
+        production = _period_array(x_sol, n)
+        inventory = _period_array(s_sol, n)
+        period_ids = dat.costs['Period ID'].to_numpy(dtype=np.int64) - 1
+        production_unit_cost = np.empty(n)
+        production_unit_cost[period_ids] = dat.costs['Production Cost'].to_numpy(dtype=float)
+        inventory_unit_cost = np.empty(n)
+        inventory_unit_cost[period_ids] = dat.costs['Inventory Cost'].to_numpy(dtype=float)
 
         # populate production_flow table
-        production_flow = x_df.merge(s_df, on='Period ID', how='right')
-        production_flow.sort_values(axis=0, by='Period ID', inplace=True)  # Ordering by increasing 'Period ID', more
-        # convenient for retrieving
-
-        production_flow = production_flow.astype({'Period ID': int, 'Production Quantity': 'Float64',
-                                                  'Inventory Quantity': 'Float64'})
-        sln.production_flow = production_flow[['Period ID', 'Production Quantity', 'Inventory Quantity']]
+        periods = np.arange(1, n + 1)
+        sln.production_flow = pd.DataFrame({'Period ID': periods, 'Production Quantity': _float64(production),
+                                            'Inventory Quantity': _float64(inventory)}, copy=False)
 
         # populate costs table
-        prod_cost = dat.costs.merge(production_flow, on='Period ID', how='left')
-        prod_cost['Production Cost'] = prod_cost['Production Quantity'] * prod_cost['Production Cost']
-        prod_cost['Inventory Cost'] = prod_cost['Inventory Quantity'] * prod_cost['Inventory Cost']
-        prod_cost['Total Cost'] = prod_cost['Production Cost'] + prod_cost['Inventory Cost']
-        prod_cost = prod_cost.round({'Production Cost': 2, 'Inventory Cost': 2, 'Total Cost': 2})
-        prod_cost = prod_cost.astype({'Period ID': int, 'Production Cost': 'Float64', 'Inventory Cost': 'Float64',
-                                      'Total Cost': 'Float64'})
-        prod_cost.sort_values(axis=0, by='Period ID', inplace=True)  # Ordering by increasing 'Period ID'
-        sln.costs = prod_cost[['Period ID', 'Production Cost', 'Inventory Cost', 'Total Cost']]
+        production_cost = production * production_unit_cost
+        if sc is not None:
+            setup_cost = np.array([sc[i] for i in range(1, n + 1)], dtype=float)
+            production_cost += np.where(production > 0, setup_cost, 0.0)
+        inventory_cost = inventory * inventory_unit_cost
+        total_cost = np.round(production_cost + inventory_cost, 2)
+        sln.costs = pd.DataFrame({'Period ID': periods,
+                                  'Production Cost': _float64(np.round(production_cost, 2, out=production_cost)),
+                                  'Inventory Cost': _float64(np.round(inventory_cost, 2, out=inventory_cost)),
+                                  'Total Cost': _float64(total_cost)}, copy=False)
     return sln
 
 
-def solve(dat):
+def solve(dat, engine='pulp', cache=None, window=None, overlap=0, stats=False, callback=None, solver_options=None):
     """
     Main function of pastesian, from the input data it optimizes the system and returns a PanDat object.
 
     Parameters
     ----------
-    dat : PanDat
-        PanDat object which is compatible with the input_schema and contains the input data.
+    dat : PanDat or ScenarioOverlay
+        PanDat object which is compatible with the input_schema and contains the input data, or a
+        pastesian.overlay.ScenarioOverlay of one, which is solved as is, without copying the tables it shares.
+    engine : str, optional
+        How the model is solved. 'pulp' (default) builds the LP with PuLP and solves it with CBC; 'highs' builds the LP
+        as sparse arrays with pastesian.matrix.solve_matrix and solves it in-process with HiGHS (requires scipy);
+        'flow' solves the lot-sizing structure directly with pastesian.lot_sizing.solve_lot_sizing, which skips the LP
+        altogether. All of them return the same tables whenever the optimal plan is unique. With multi-product data
+        sets (see pastesian.multi), every engine solves all products without capacities at once, and then each site
+        whose capacities are binding as an LP of its own with HiGHS (CBC when scipy isn't installed). When some setup
+        cost or minimum batch size is positive, the model is a MIP (see pastesian.mip), which only 'pulp' solves.
+    cache : pastesian.cache.SolutionCache, optional
+        When given, the solution is looked up in the cache first, and stored in it after solving. A hit returns the
+        cached solution without validating or optimizing again.
+    window : int, optional
+        When given, the horizon is solved in rolling windows of this many periods (see pastesian.rolling), which bounds
+        the size of each model at the cost of optimality. Default is None, i.e., the whole horizon at once.
+    overlap : int, optional
+        Number of periods at the end of each window that are optimized but not committed, only used with window.
+        Default is 0.
+    stats : bool, optional
+        When True, the output has a 'run_stats' table with the wall time, CPU time and peak memory of each phase
+        ('validation', 'parameters', 'presolve', 'build', 'solve', 'output' and 'total'), the number of variables and
+        constraints, the solver status and, for the 'highs' engine, the number of iterations. With window, the model of
+        each window is built and solved within the 'solve' phase. Default is False.
+    callback : callable, optional
+        A function that receives the pastesian.stats.RunStats object once solve() is done, e.g., to forward it to a
+        metrics system, as do the callbacks registered with pastesian.stats.add_callback.
+    solver_options : dict, optional
+        Options of the solver behind the engine: 'threads', 'time_limit' (in seconds), 'mip_gap' and 'quiet' (when
+        True, CBC doesn't write its log to stdout), see pastesian.engines.check_solver_options. With window, they apply
+        to each window. With setups, 'mip_gap' and 'time_limit' bound the search of CBC, which starts from the plan
+        of pastesian.mip.heuristic_plan. Default is None, i.e., the solver defaults.
+
+    Before building any model, the data set is checked in O(n) with pastesian.feasibility.find_infeasibilities (the
+    'presolve' phase). When no plan can meet the demand within the capacities, the 'Status' is 'Infeasible' right
+    away, and the 'diagnostics' table lists each culprit period with its issue and the missing (or excess) amount.
 
     Returns
     -------
     sln : PanDat
-        A PanDat object containing the output data, compatible with the output schema.
+        A PanDat object containing the output data, compatible with the output schema. Its 'solver_status' table has
+        the 'Engine', the solver 'Status' (the tables are empty unless it's 'Optimal', or 'Feasible' for a MIP stopped
+        by the time limit) and the 'Solve Time (s)' spent building and solving the model(s). With setups, the
+        'Production Cost' of each period with some production includes its setup cost. With multi-product data sets,
+        the 'product_flow' and 'product_costs' tables have the plan of each (product, site, period), and
+        'production_flow' and 'costs' the totals of each period.
+        The 'diagnostics' table is empty unless the pre-check found the model infeasible.
 
     Raises
     ------
     ValueError
-        Two possible cases: 1) when an invalid 'Period ID' column is found, that is, when one table from dat object (
-        input data) contains a 'Period ID' column with non-integer values or missing integer values, accordingly to
+        Several possible cases: 1) when an invalid 'Period ID' column is found, that is, when one table from dat object
+        (input data) contains a 'Period ID' column with non-integer values or missing integer values, accordingly to
         the check_each_period_id_column function; 2) when 'demand' and 'costs' tables from dat object have different
-        'Period ID' columns, regardless of order, accordingly to create_optimization_parameters function.
+        'Period ID' columns, regardless of order, accordingly to create_optimization_parameters function; 3) when
+        engine is not one of 'pulp', 'highs' or 'flow'; 4) when window is not positive or overlap is not in
+        [0, window); 5) when solver_options are invalid; 6) when the multi-product tables are inconsistent (see
+        pastesian.multi.create_multi_product_parameters), or combined with window; 7) when some setup cost or
+        minimum batch size is positive, with window or an engine other than 'pulp'.
     """
-    check_each_period_id_column(dat)  # verify that each 'Period ID' column is valid
-    d, pc, ic, I = create_optimization_parameters(dat)
-
-    # region Build optimization model
-    mdl = pulp.LpProblem('Pastesian', sense=pulp.LpMinimize)
-    x = pulp.LpVariable.dicts(indices=I, cat=pulp.LpContinuous, lowBound=0.0, name='x')  # Production quantities
-    s = pulp.LpVariable.dicts(indices=I, cat=pulp.LpContinuous, lowBound=0.0, name='s')  # Storage quantities
-
-    parameters = input_schema.create_full_parameters_dict(dat)
-
-    # region Flow Balance constraints
-    for i in I:
-        if i == 1:
-            # In the first period, we use 'Lasagnas To Start' parameter as storage quantity from "previous" period
-            starting_amount = parameters['Lasagnas To Start']
-            mdl.addConstraint(x[i] + starting_amount == s[i] + d[i], name=f'balance_at_{i}')
-        else:
-            # In the middle periods, we have the usual flow balance constraints
-            mdl.addConstraint(x[i] + s[i-1] == d[i] + s[i], name=f'balance_at_{i}')
-
-    # In the last period, we use 'Lasagnas To Be Left' (default=0) parameter as storage quantity to be left to
-    # the next horizon
-    left_amount = parameters['Lasagnas To Be Left']
-    mdl.addConstraint(s[max(I)] == left_amount, name=f'last_storage')
-    # endregion
-
-    # region Capacity constraints
-    prod_capacity = parameters['Production Capacity']
-    if prod_capacity != -1:
-        for i in I:
-            mdl.addConstraint(x[i] <= prod_capacity, name=f'prod_capacity_{i}')
-
-    inv_capacity = parameters['Inventory Capacity']
-    if inv_capacity != -1:
-        for i in I:
-            mdl.addConstraint(s[i] <= inv_capacity, name=f'inv_capacity_{i}')
-    # endregion
-
-    # region Objective function
-    production_cost = pulp.lpSum(pc[i] * x[i] for i in I)
-    inventory_cost = pulp.lpSum(ic[i] * s[i] for i in I)
-    mdl.setObjective(production_cost + inventory_cost)
-    # endregion
-    # endregion
-
-    # region Optimize and retrieve the solution
-    mdl.solve()
-    status = pulp.LpStatus[mdl.status]
-    if status == 'Optimal':
-        x_sol = [(key, var.value()) for key, var in x.items()]
-        s_sol = [(key, var.value()) for key, var in s.items()]
-    else:
-        x_sol = None
-        s_sol = None
-        print(f'Model is not optimal. Status: {status}')
-    # endregion
-
-    sln = populate_output_schema(x_sol, s_sol, dat)
-
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(map(repr, ENGINES))}, not {engine!r}")
+    options = check_solver_options(solver_options)
+    callbacks = registered_callbacks() + ([callback] if callback is not None else [])
+    run_stats = RunStats() if stats or callbacks else NO_STATS
+    # stopped even when solving raises, so tracemalloc never keeps tracing after the call
+    with run_stats:
+        sln = None
+        if cache is not None:
+            # 'quiet' doesn't change the solution, so it's left out of the key
+            cache_key = cache.key(dat, engine=engine, window=window, overlap=overlap,
+                                  solver_options={k: v for k, v in options.items() if k != 'quiet' and v is not None})
+            with run_stats.phase('cache'):
+                sln = cache.get(cache_key)
+            run_stats.record('cache', 'Status', 'Hit' if sln is not None else 'Miss')
+
+        if sln is None:
+            with run_stats.phase('validation'):
+                check_each_period_id_column(dat)  # verify that each 'Period ID' column is valid
+            multi_product = is_multi_product(dat)
+            if multi_product and window is not None:
+                raise ValueError('window is not supported with multi-product data sets')
+            with run_stats.phase('parameters'):
+                parameters = input_schema.create_full_parameters_dict(dat)
+                if multi_product:
+                    params = create_multi_product_parameters(dat, parameters)
+                else:
+                    d, pc, ic, I = create_optimization_parameters(dat)
+                    pcap, icap = create_capacity_parameters(dat, I, parameters)
+                    sc, mb = create_setup_parameters(dat, I, parameters)
+            setups = not multi_product and has_setups(sc, mb)
+            if setups and (window is not None or engine != 'pulp'):
+                raise ValueError("setup costs and minimum batch sizes are only supported by the 'pulp' engine, without "
+                                 "window")
+
+            # region Optimize and retrieve the solution
+            start = time.perf_counter()
+            infeasibilities = []
+            if not multi_product:
+                with run_stats.phase('presolve'):
+                    infeasibilities = find_infeasibilities(d, I, parameters, pcap, icap)
+            if infeasibilities:
+                # No plan can meet the demand and capacities, so the model isn't even built
+                x_sol, s_sol, status = [], [], 'Infeasible'
+                run_stats.record('presolve', 'Status', status)
+            elif multi_product:
+                production, inventory, status = optimize_multi_product(params, engine, run_stats, options)
+            elif setups:
+                x_sol, s_sol, status = optimize_mip(d, pc, ic, I, parameters, pcap, icap, sc, mb, run_stats, options)
+            elif window is None:
+                x_sol, s_sol, status = optimize(d, pc, ic, I, parameters, pcap, icap, engine, run_stats, options)
+            else:
+                with run_stats.phase('solve'):
+                    x_sol, s_sol, status = solve_rolling_horizon(d, pc, ic, I, parameters, pcap, icap, window, overlap,
+                                                                 engine, options)
+                run_stats.record('solve', 'Status', status)
+            solve_time = time.perf_counter() - start
+            # endregion
+
+            with run_stats.phase('output'):
+                if multi_product:
+                    sln = populate_multi_product_output(production, inventory, params)
+                else:
+                    sln = populate_output_schema(x_sol, s_sol, dat, sc if setups else None)
+                    sln.diagnostics = diagnostics_table(infeasibilities)
+                sln.solver_status = pd.DataFrame({'Statistic': ['Engine', 'Status', 'Solve Time (s)'],
+                                                  'Value': [engine, status, solve_time]})
+            if cache is not None:
+                cache.put(cache_key, sln)
+
+    if run_stats is not NO_STATS:
+        if stats:
+            sln.run_stats = run_stats.table()
+        for function in callbacks:
+            function(run_stats)
     return sln
@@ -0,0 +1,147 @@
+"""
+Matrix-form builder of the pastesian model, used by solve() when engine='highs'.
+
+Instead of creating one PuLP expression per constraint, the optimization parameters are turned straight into NumPy
+arrays and a SciPy sparse constraint matrix, which are handed to HiGHS in-process through scipy.optimize.linprog, so
+no temporary model file is written.
+
+Variables are ordered as [x[1], ..., x[n], s[1], ..., s[n]]. The capacities and the 'Lasagnas To Be Left' parameter
+enter as variable bounds, so the only constraint rows are the n flow balance rows.
+"""
+import numpy as np
+from pastesian.utils import period_capacities
+from pastesian.stats import NO_STATS
+
+try:
+    from scipy import sparse
+    from scipy.optimize import linprog
+except ImportError:  # scipy is an optional dependency, only needed by the 'highs' engine
+    sparse = None
+    linprog = None
+
+# scipy.optimize.linprog status codes, translated to pulp.LpStatus names
+LINPROG_STATUS = {0: 'Optimal', 1: 'Not Solved', 2: 'Infeasible', 3: 'Unbounded', 4: 'Undefined'}
+
+
+def build_matrices(d, pc, ic, I, parameters, pcap=None, icap=None):
+    """
+    Build the pastesian model in matrix form: min c @ v subject to A_eq @ v == b_eq and lb <= v <= ub.
+
+    Parameters
+    ----------
+    d : dict
+        A dictionary structured as {period_id: demand}
+    pc : dict
+        A dictionary structured as {period_id: production_cost}
+    ic : dict
+        A dictionary structured as {period_id: inventory_cost}
+    I : list
+        A list containing the 'Period ID' values, i.e., all integers from 1 to len(I), not necessarily ordered.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+    pcap, icap : dict, optional
+        Per-period capacities, see pastesian.engines.build_model.
+
+    Returns
+    -------
+    c : numpy.ndarray
+        Objective coefficients, of length 2n.
+    A_eq : scipy.sparse.csr_matrix
+        Flow balance matrix, of shape (n, 2n).
+    b_eq : numpy.ndarray
+        Right-hand side of the flow balance rows, of length n.
+    bounds : numpy.ndarray
+        Array of shape (2n, 2) with the lower and upper bound of each variable (numpy.inf when unbounded).
+    """
+    if sparse is None:
+        raise ImportError("The 'highs' engine requires scipy, which can be installed with `pip install scipy`")
+    n = len(I)
+    periods = np.arange(1, n + 1)
+    demand = np.fromiter((d[i] for i in periods), dtype=float, count=n)
+    prod_cost = np.fromiter((pc[i] for i in periods), dtype=float, count=n)
+    inv_cost = np.fromiter((ic[i] for i in periods), dtype=float, count=n)
+
+    # region Objective function
+    c = np.concatenate([prod_cost, inv_cost])
+    # endregion
+
+    # region Flow Balance constraints: x[i] + s[i-1] - s[i] == d[i], with s[0] being 'Lasagnas To Start'
+    rows = np.concatenate([periods - 1, periods - 1, periods[1:] - 1])
+    cols = np.concatenate([periods - 1, n + periods - 1, n + periods[:-1] - 1])
+    vals = np.concatenate([np.ones(n), -np.ones(n), np.ones(n - 1)])
+    A_eq = sparse.csr_matrix((vals, (rows, cols)), shape=(n, 2 * n))
+    b_eq = demand.copy()
+    b_eq[0] -= parameters['Lasagnas To Start']
+    # endregion
+
+    # region Bounds: capacities, and 'Lasagnas To Be Left' as the storage quantity of the last period
+    if pcap is None:
+        pcap = period_capacities(I, parameters['Production Capacity'])
+    if icap is None:
+        icap = period_capacities(I, parameters['Inventory Capacity'])
+    bounds = np.zeros((2 * n, 2))
+    bounds[:, 1] = np.inf
+    if pcap:
+        bounds[np.fromiter(pcap, dtype=int) - 1, 1] = list(pcap.values())
+    if icap:
+        bounds[n + np.fromiter(icap, dtype=int) - 1, 1] = list(icap.values())
+    # when the last inventory capacity is below 'Lasagnas To Be Left', lower > upper keeps the model infeasible
+    left_amount = parameters['Lasagnas To Be Left']
+    bounds[2 * n - 1] = left_amount, min(bounds[2 * n - 1, 1], left_amount)
+    # endregion
+
+    return c, A_eq, b_eq, bounds
+
+
+def solve_matrix(d, pc, ic, I, parameters, pcap=None, icap=None, stats=NO_STATS, options=None):
+    """
+    Build the pastesian model in matrix form and solve it in-process with HiGHS.
+
+    Parameters
+    ----------
+    d : dict
+        A dictionary structured as {period_id: demand}
+    pc : dict
+        A dictionary structured as {period_id: production_cost}
+    ic : dict
+        A dictionary structured as {period_id: inventory_cost}
+    I : list
+        A list containing the 'Period ID' values, i.e., all integers from 1 to len(I), not necessarily ordered.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+    pcap, icap : dict, optional
+        Per-period capacities, see pastesian.engines.build_model.
+    stats : pastesian.stats.RunStats, optional
+        When given, the 'build' and 'solve' phases are measured, and the model size and HiGHS iterations recorded.
+    options : dict, optional
+        Solver options, see pastesian.engines.check_solver_options. Only 'time_limit' is used: linprog doesn't expose
+        the threads of HiGHS, and it writes no log anyway. Default is None, i.e., the HiGHS defaults.
+
+    Returns
+    -------
+    x_sol : list
+        A list containing pairs of (period_id, production_quantity), or None when the model is not optimal.
+    s_sol : list
+        A list containing pairs of (period_id, inventory_quantity), or None when the model is not optimal.
+    status : str
+        The solver status, following pulp.LpStatus names.
+    """
+    with stats.phase('build'):
+        c, A_eq, b_eq, bounds = build_matrices(d, pc, ic, I, parameters, pcap, icap)
+    stats.record('build', 'Variables', A_eq.shape[1])
+    stats.record('build', 'Constraints', A_eq.shape[0])
+    with stats.phase('solve'):
+        time_limit = (options or {}).get('time_limit')
+        res = linprog(c, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs',
+                      options={} if time_limit is None else {'time_limit': time_limit})
+    status = LINPROG_STATUS.get(res.status, 'Undefined')
+    stats.record('solve', 'Status', status)
+    stats.record('solve', 'Iterations', int(res.nit))
+    if status != 'Optimal':
+        return None, None, status
+
+    n = len(I)
+    periods = range(1, n + 1)
+    x_sol = list(zip(periods, res.x[:n].tolist()))
+    s_sol = list(zip(periods, res.x[n:].tolist()))
+    return x_sol, s_sol, status
@@ -0,0 +1,315 @@
+"""
+Integer batch-size mode of pastesian, used by solve() when some setup cost or minimum batch size is positive.
+
+Lasagnas are produced in whole trays, and each production run has a setup cost and a minimum batch size, read from the
+'Setup Cost' and 'Minimum Batch Size' parameters, overridden per period by the optional 'setups' table. On top of the
+LP of pastesian.engines.build_model, the model gets integer production quantities and a binary setup variable y[i] per
+period, with
+
+    Minimum Batch Size(i) * y[i] <= x[i] <= M(i) * y[i]
+
+M(i) being the least of the production capacity and the demand left from period i on. Without setups, the LP is
+integral already, since all of its data are integers.
+
+CBC alone may take minutes to find a good incumbent for such a model over a 1-year weekly horizon, so optimize_mip first
+builds a plan with fast heuristics (Silver-Meal, Wagner-Whitin and the plan of the LP without setups, rounded up to the
+minimum batch sizes) and passes the cheapest one to CBC as a MIP start. The 'mip_gap' and 'time_limit' solver options
+bound the search, see pastesian.engines.check_solver_options.
+"""
+import numpy as np
+import pulp
+from pastesian.engines import build_model, pulp_solver
+from pastesian.lot_sizing import solve_lot_sizing
+from pastesian.utils import period_capacities
+from pastesian.stats import NO_STATS
+
+
+def create_setup_parameters(dat, I, parameters):
+    """
+    Reads the 'Setup Cost' and 'Minimum Batch Size' parameters, overridden by the optional 'setups' table, and creates
+    the per-period setup parameters.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with the input_schema and contains the input data.
+    I : list
+        A list containing the 'Period ID' values, as created by create_optimization_parameters.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+
+    Returns
+    -------
+    sc : dict
+        A dictionary structured as {period_id: setup_cost}, for all periods.
+    mb : dict
+        A dictionary structured as {period_id: minimum_batch_size}, for all periods.
+    """
+    setups = dat.setups
+    cost_rows = setups[setups['Setup Cost'].notna()]
+    batch_rows = setups[setups['Minimum Batch Size'].notna()]
+    sc = dict.fromkeys(I, parameters['Setup Cost'])
+    sc.update(zip(cost_rows['Period ID'], cost_rows['Setup Cost']))
+    mb = dict.fromkeys(I, parameters['Minimum Batch Size'])
+    mb.update(zip(batch_rows['Period ID'], batch_rows['Minimum Batch Size']))
+    return sc, mb
+
+
+def has_setups(sc, mb):
+    """
+    Whether the model needs setup decisions, i.e., some setup cost or minimum batch size is positive.
+    """
+    return any(cost > 0 for cost in sc.values()) or any(size > 0 for size in mb.values())
+
+
+def build_mip_model(d, pc, ic, I, parameters, pcap, icap, sc, mb):
+    """
+    Build the PuLP optimization model of pastesian with integer lot sizes and setups.
+
+    Parameters
+    ----------
+    d, pc, ic, I, parameters, pcap, icap
+        The optimization parameters, see pastesian.engines.build_model.
+    sc : dict
+        A dictionary structured as {period_id: setup_cost}, as created by create_setup_parameters.
+    mb : dict
+        A dictionary structured as {period_id: minimum_batch_size}, as created by create_setup_parameters.
+
+    Returns
+    -------
+    mdl : pulp.LpProblem
+        The optimization model, ready to be solved.
+    x : dict
+        A dictionary structured as {period_id: production_variable}, with integer variables.
+    s : dict
+        A dictionary structured as {period_id: storage_variable}
+    y : dict
+        A dictionary structured as {period_id: setup_variable}, with binary variables.
+    """
+    mdl, x, s = build_model(d, pc, ic, I, parameters, pcap, icap)
+    y = pulp.LpVariable.dicts(indices=I, cat=pulp.LpBinary, name='y')  # Setups
+
+    # region Setup constraints
+    periods = sorted(I)
+    demand_left = parameters['Lasagnas To Be Left']  # demand from period i on, plus the lasagnas to be left
+    for i in reversed(periods):
+        demand_left += d[i]
+        x[i].cat = pulp.LpInteger
+        upper = demand_left if x[i].upBound is None else min(x[i].upBound, demand_left)
+        mdl.addConstraint(x[i] <= upper * y[i], name=f'setup_at_{i}')
+        if mb[i] > 0:
+            mdl.addConstraint(x[i] >= mb[i] * y[i], name=f'minimum_batch_at_{i}')
+    # endregion
+
+    mdl.setObjective(mdl.objective + pulp.lpSum(sc[i] * y[i] for i in I))
+    return mdl, x, s, y
+
+
+def _silver_meal(demand, holding, setup, production_capacity, inventory_capacity, start):
+    """
+    Silver-Meal heuristic, extended to capacities: walking forward, each period whose demand isn't covered by the
+    inventory starts a production run, which also covers the demand of the next periods for as long as the setup and
+    holding cost per period covered decreases, and the capacities allow it. Returns None when a run can't even cover
+    the demand of its own period.
+    """
+    n = len(demand)
+    production = np.zeros(n)
+    inventory = start
+    for i in range(n):
+        if inventory < demand[i]:
+            lot, cost = demand[i] - inventory, setup[i]  # the run covers periods i..j-1, at that setup and holding cost
+            carry = 0.0  # cost of holding one lasagna from period i to period j
+            slack = np.inf  # least inventory capacity left over the periods i..j-1
+            for j in range(i + 1, n):
+                carry += holding[j - 1]
+                slack = min(slack, inventory_capacity[j - 1]) - demand[j]
+                extended_cost = cost + demand[j] * carry
+                if extended_cost / (j - i + 1) > cost / (j - i) or lot + demand[j] > production_capacity[i] or \
+                        slack < 0:
+                    break
+                lot, cost = lot + demand[j], extended_cost
+            if lot > production_capacity[i]:
+                return None
+            production[i] = lot
+            inventory += lot
+        inventory -= demand[i]
+    return production
+
+
+def _wagner_whitin(demand, production_cost, holding, setup, start):
+    """
+    Wagner-Whitin dynamic program, which is exact without capacities and minimum batch sizes: the cheapest plan where
+    each run covers the net demand of consecutive periods, in O(n^2) with one vectorized step per period.
+    """
+    n = len(demand)
+    net = demand - np.diff(np.minimum(np.cumsum(demand), start), prepend=0.0)  # after the starting inventory
+    held = np.concatenate(([0.0], np.cumsum(holding)[:-1]))  # cost of holding one lasagna from period 0 to period k
+    cum_net = np.concatenate(([0.0], np.cumsum(net)))
+    cum_held = np.concatenate(([0.0], np.cumsum(net * held)))
+    best = np.zeros(n + 1)  # best[j]: cost of the periods 0..j-1
+    first = np.zeros(n, dtype=np.int64)  # first[j]: the period of the run that covers period j in that plan
+    for j in range(n):
+        lots = cum_net[j + 1] - cum_net[:j + 1]  # lot of a run at period i covering periods i..j
+        costs = best[:j + 1] + np.where(lots > 0, setup[:j + 1], 0.0) + \
+            (production_cost[:j + 1] - held[:j + 1]) * lots + cum_held[j + 1] - cum_held[:j + 1]
+        first[j] = np.argmin(costs)
+        best[j + 1] = costs[first[j]]
+    production = np.zeros(n)
+    j = n
+    while j > 0:
+        i = first[j - 1]
+        production[i] = cum_net[j] - cum_net[i]
+        j = i
+    return production
+
+
+def _apply_minimum_batches(production, minimum_batch):
+    """
+    Round up the runs of a plan to the minimum batch sizes, making the next runs smaller (or skipping them) to absorb
+    the excess. The excess left at the end is removed from the last run, or the last run is merged into the one before
+    when that would make it too small. Returns None when that's not possible.
+    """
+    production = production.copy()
+    excess = 0.0
+    for i in np.flatnonzero(production):
+        lot = max(production[i] - excess, 0.0)
+        if 0 < lot < minimum_batch[i]:
+            lot = minimum_batch[i]
+        excess += lot - production[i]
+        production[i] = lot
+    runs = np.flatnonzero(production)
+    if excess > 1e-9:
+        if len(runs) and production[runs[-1]] - excess >= minimum_batch[runs[-1]]:
+            production[runs[-1]] -= excess
+        elif len(runs) > 1:
+            production[runs[-2]] += production[runs[-1]] - excess
+            production[runs[-1]] = 0
+        else:
+            return None
+    return production
+
+
+def heuristic_plan(d, pc, ic, I, parameters, pcap, icap, sc, mb):
+    """
+    Find a good integer plan quickly, to warm start the MIP.
+
+    The candidates are the plans of the Silver-Meal heuristic (which accounts for the capacities), of the Wagner-Whitin
+    dynamic program (optimal without capacities and minimum batch sizes) and the optimal plan without setups (from
+    pastesian.lot_sizing, which is integral), all of them rounded up to the minimum batch sizes. The cheapest feasible
+    one is returned.
+
+    Parameters
+    ----------
+    d, pc, ic, I, parameters, pcap, icap
+        The optimization parameters, see pastesian.engines.build_model.
+    sc, mb : dict
+        The setup parameters, see create_setup_parameters.
+
+    Returns
+    -------
+    plan : tuple
+        A (production, inventory, cost) tuple, the arrays indexed by period_id - 1, or None when no candidate is
+        feasible.
+    """
+    n = len(I)
+    start, left = parameters['Lasagnas To Start'], parameters['Lasagnas To Be Left']
+    periods = range(1, n + 1)
+    demand = np.array([d[i] for i in periods], dtype=float)
+    demand[-1] += left  # the lasagnas to be left are demanded at the end of the last period
+    production_cost = np.array([pc[i] for i in periods], dtype=float)
+    inventory_cost = np.array([ic[i] for i in periods], dtype=float)
+    setup_cost = np.array([sc[i] for i in periods], dtype=float)
+    minimum_batch = np.array([mb[i] for i in periods], dtype=float)
+    production_capacity = np.array([pcap.get(i, np.inf) for i in periods], dtype=float)
+    inventory_capacity = np.array([icap.get(i, np.inf) for i in periods], dtype=float)
+
+    candidates = [_silver_meal(demand, inventory_cost, setup_cost, production_capacity, inventory_capacity, start),
+                  _wagner_whitin(demand, production_cost, inventory_cost, setup_cost, start)]
+    x_sol, _, status = solve_lot_sizing(d, pc, ic, I, parameters, pcap, icap)
+    if status == 'Optimal':
+        production = np.zeros(n)
+        for i, value in x_sol:
+            production[i - 1] = round(value)
+        candidates.append(production)
+
+    best = None
+    for production in candidates:
+        if production is not None:
+            production = _apply_minimum_batches(production, minimum_batch)
+        if production is None:
+            continue
+        inventory = start + np.cumsum(production - demand)
+        inventory[-1] += left
+        if (production <= production_capacity).all() and (inventory >= -1e-9).all() and \
+                (inventory <= inventory_capacity + 1e-9).all() and abs(inventory[-1] - left) < 1e-9:
+            cost = float(production_cost @ production + inventory_cost @ inventory + setup_cost @ (production > 0))
+            if best is None or cost < best[2]:
+                best = (production, inventory, cost)
+    return best
+
+
+def optimize_mip(d, pc, ic, I, parameters, pcap, icap, sc, mb, stats=NO_STATS, options=None):
+    """
+    Optimize the pastesian model with integer lot sizes and setups with CBC, warm started by heuristic_plan.
+
+    Without capacities and minimum batch sizes, the Wagner-Whitin plan of heuristic_plan is optimal already, and it's
+    returned right away, without building the MIP.
+
+    Parameters
+    ----------
+    d, pc, ic, I, parameters, pcap, icap
+        The optimization parameters, see pastesian.engines.optimize.
+    sc, mb : dict
+        The setup parameters, see create_setup_parameters.
+    stats : pastesian.stats.RunStats, optional
+        When given, the 'build' (which includes the heuristics) and 'solve' phases are measured, and the model size,
+        the cost of the warm start and the solver status recorded.
+    options : dict, optional
+        Solver options, see pastesian.engines.check_solver_options. Default is None, i.e., the solver defaults.
+
+    Returns
+    -------
+    x_sol : list
+        A list containing pairs of (period_id, production_quantity), or None when no integer plan was found.
+    s_sol : list
+        A list containing pairs of (period_id, inventory_quantity), or None when no integer plan was found.
+    status : str
+        The solver status, following pulp.LpStatus names, except for 'Feasible': the plan of a search stopped by the
+        time limit, which may not be optimal.
+    """
+    if pcap is None:
+        pcap = period_capacities(I, parameters['Production Capacity'])
+    if icap is None:
+        icap = period_capacities(I, parameters['Inventory Capacity'])
+    if not pcap and not icap and not any(size > 0 for size in mb.values()):
+        with stats.phase('solve'):
+            plan = heuristic_plan(d, pc, ic, I, parameters, pcap, icap, sc, mb)
+        status = 'Optimal' if plan is not None else 'Infeasible'
+        stats.record('solve', 'Status', status)
+        if plan is None:
+            return None, None, status
+        return list(zip(range(1, len(I) + 1), plan[0])), list(zip(range(1, len(I) + 1), plan[1])), status
+
+    with stats.phase('build'):
+        mdl, x, s, y = build_mip_model(d, pc, ic, I, parameters, pcap, icap, sc, mb)
+        plan = heuristic_plan(d, pc, ic, I, parameters, pcap, icap, sc, mb)
+        if plan is not None:
+            production, inventory, _ = plan
+            for i in I:
+                x[i].setInitialValue(production[i - 1])
+                s[i].setInitialValue(inventory[i - 1])
+                y[i].setInitialValue(int(production[i - 1] > 0))
+    stats.record('build', 'Variables', mdl.numVariables())
+    stats.record('build', 'Constraints', mdl.numConstraints())
+    stats.record('build', 'Warm Start Cost', None if plan is None else plan[2])
+    with stats.phase('solve'):
+        mdl.solve(pulp_solver(options, warmStart=plan is not None))
+    status = pulp.LpStatus[mdl.status]
+    if status == 'Optimal' and mdl.sol_status == pulp.LpSolutionIntegerFeasible:
+        status = 'Feasible'
+    stats.record('solve', 'Status', status)
+    if status not in ('Optimal', 'Feasible'):
+        return None, None, status
+    x_sol = [(key, round(var.value())) for key, var in x.items()]
+    s_sol = [(key, var.value()) for key, var in s.items()]
+    return x_sol, s_sol, status
@@ -0,0 +1,228 @@
+"""
+Persistent pastesian model, for interactive what-if sessions that re-solve after every edit.
+
+PastesianModel builds the PuLP model once and then updates it in place: demand and the start/end inventory parameters
+only change the right-hand side of existing constraints, costs only change objective coefficients and capacities
+(parameters or the 'capacities' table) only change variable bounds. Each re-solve passes the previous solution to CBC
+as a warm start, after the same feasibility pre-check as solve(). Only the single-product LP is supported, i.e., no
+multi-product data sets and no setup costs or minimum batch sizes.
+"""
+import time
+import pulp
+import pandas as pd
+from pastesian import input_schema
+from pastesian.main import create_optimization_parameters, create_capacity_parameters, populate_output_schema
+from pastesian.engines import build_model, check_solver_options, pulp_solver
+from pastesian.feasibility import find_infeasibilities, diagnostics_table
+from pastesian.mip import create_setup_parameters, has_setups
+from pastesian.multi import is_multi_product
+from pastesian.utils import check_each_period_id_column
+
+
+class PastesianModel:
+    """
+    A pastesian model that is built once and can be updated and re-solved many times.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with the input_schema and contains the input data. It's copied, so later
+        updates never change it.
+    solver_options : dict, optional
+        Options of CBC used by every solve, see pastesian.engines.check_solver_options. Default is None.
+
+    Attributes
+    ----------
+    dat : PanDat
+        A copy of the input data, kept up to date with every update made through this object.
+    mdl : pulp.LpProblem
+        The optimization model.
+    x : dict
+        A dictionary structured as {period_id: production_variable}
+    s : dict
+        A dictionary structured as {period_id: storage_variable}
+
+    Raises
+    ------
+    ValueError
+        The same cases as solve(), when the 'Period ID' columns or the solver_options are invalid, and when dat has
+        multiple products or some positive setup cost or minimum batch size.
+    """
+
+    def __init__(self, dat, solver_options=None):
+        self.solver_options = check_solver_options(solver_options)
+        check_each_period_id_column(dat)
+        if is_multi_product(dat):
+            raise ValueError('PastesianModel is not supported with multi-product data sets')
+        self.dat = input_schema.copy_pan_dat(dat)
+        self.d, self.pc, self.ic, self.I = create_optimization_parameters(self.dat)
+        self.parameters = input_schema.create_full_parameters_dict(self.dat)
+        self._check_setups(self.parameters)
+        self.pcap, self.icap = create_capacity_parameters(self.dat, self.I, self.parameters)
+        self.mdl, self.x, self.s = build_model(self.d, self.pc, self.ic, self.I, self.parameters, self.pcap,
+                                               self.icap)
+        self._solved = False
+
+    def _check_setups(self, parameters):
+        if has_setups(*create_setup_parameters(self.dat, self.I, parameters)):
+            raise ValueError('PastesianModel is not supported with setup costs or minimum batch sizes, use solve()')
+
+    def _check_periods(self, values, table_name):
+        unknown = set(values).difference(self.d)
+        if unknown:
+            raise ValueError(f'The following indexes do not exist in {table_name}["Period ID"]: {unknown}')
+
+    def _update_balance_rhs(self, i):
+        rhs = self.d[i] - self.parameters['Lasagnas To Start'] if i == 1 else self.d[i]
+        self.mdl.constraints[f'balance_at_{i}'].changeRHS(rhs)
+
+    def _update_capacity_bounds(self):
+        self.pcap, self.icap = create_capacity_parameters(self.dat, self.I, self.parameters)
+        for i in self.I:
+            self.x[i].upBound = self.pcap.get(i)
+            self.s[i].upBound = self.icap.get(i)
+
+    def update_demand(self, demand):
+        """
+        Update the demand of some (or all) periods.
+
+        Parameters
+        ----------
+        demand : dict
+            A dictionary structured as {period_id: demand}. Periods not in it keep their current demand.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            When some period_id is not in demand['Period ID'].
+        """
+        self._check_periods(demand, 'demand')
+        for i, value in demand.items():
+            self.d[i] = value
+            self._update_balance_rhs(i)
+        self.dat.demand = self.dat.demand.assign(Demand=self.dat.demand['Period ID'].map(self.d))
+
+    def update_costs(self, production_cost=None, inventory_cost=None):
+        """
+        Update the production and/or inventory costs of some (or all) periods.
+
+        Parameters
+        ----------
+        production_cost : dict, optional
+            A dictionary structured as {period_id: production_cost}. Periods not in it keep their current cost.
+        inventory_cost : dict, optional
+            A dictionary structured as {period_id: inventory_cost}. Periods not in it keep their current cost.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            When some period_id is not in costs['Period ID'].
+        """
+        production_cost = production_cost or {}
+        inventory_cost = inventory_cost or {}
+        self._check_periods(production_cost, 'costs')
+        self._check_periods(inventory_cost, 'costs')
+        for i, value in production_cost.items():
+            self.pc[i] = value
+            self.mdl.objective[self.x[i]] = value
+        for i, value in inventory_cost.items():
+            self.ic[i] = value
+            self.mdl.objective[self.s[i]] = value
+        self.dat.costs = self.dat.costs.assign(**{'Production Cost': self.dat.costs['Period ID'].map(self.pc),
+                                                  'Inventory Cost': self.dat.costs['Period ID'].map(self.ic)})
+
+    def update_parameters(self, parameters):
+        """
+        Update some of the parameters: 'Production Capacity', 'Inventory Capacity', 'Lasagnas To Be Left' and/or
+        'Lasagnas To Start'.
+
+        Parameters
+        ----------
+        parameters : dict
+            A dictionary structured as {parameter_name: value}. Parameters not in it keep their current value.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            When some parameter_name is not one of the input_schema parameters, or some setup cost or minimum batch
+            size would be positive.
+        """
+        unknown = set(parameters).difference(self.parameters)
+        if unknown:
+            raise ValueError(f'The following parameters do not exist in the input_schema: {unknown}')
+        self._check_setups(dict(self.parameters, **parameters))
+        self.parameters.update(parameters)
+        self.dat.parameters = pd.DataFrame(list(self.parameters.items()), columns=['Name', 'Value'])
+        if 'Lasagnas To Start' in parameters:
+            self._update_balance_rhs(1)
+        if 'Lasagnas To Be Left' in parameters:
+            self.mdl.constraints['last_storage'].changeRHS(self.parameters['Lasagnas To Be Left'])
+        if 'Production Capacity' in parameters or 'Inventory Capacity' in parameters:
+            self._update_capacity_bounds()
+
+    def update_capacities(self, capacities):
+        """
+        Replace the 'capacities' table, i.e., the per-period overrides of the 'Production Capacity' and 'Inventory
+        Capacity' parameters.
+
+        Parameters
+        ----------
+        capacities : DataFrame
+            The new 'capacities' table, compatible with the input_schema.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            When some period_id is not in costs['Period ID'].
+        """
+        self._check_periods(capacities['Period ID'], 'costs')
+        self.dat.capacities = capacities
+        self._update_capacity_bounds()
+
+    def solve(self):
+        """
+        Solve the model as it currently is, warm started from the previous solution if there is one. As in solve(), the
+        model isn't solved when pastesian.feasibility.find_infeasibilities finds it infeasible.
+
+        Returns
+        -------
+        sln : PanDat
+            A PanDat object containing the output data, compatible with the output schema, with the 'solver_status'
+            and 'diagnostics' tables as for solve().
+        """
+        start = time.perf_counter()
+        infeasibilities = find_infeasibilities(self.d, self.I, self.parameters, self.pcap, self.icap)
+        if infeasibilities:
+            status = 'Infeasible'
+        else:
+            self.mdl.solve(pulp_solver(self.solver_options, warmStart=self._solved))
+            status = pulp.LpStatus[self.mdl.status]
+        solve_time = time.perf_counter() - start
+        if status == 'Optimal':
+            self._solved = True
+            x_sol = [(key, var.value()) for key, var in self.x.items()]
+            s_sol = [(key, var.value()) for key, var in self.s.items()]
+        else:
+            x_sol = None
+            s_sol = None
+        sln = populate_output_schema(x_sol, s_sol, self.dat)
+        sln.diagnostics = diagnostics_table(infeasibilities)
+        sln.solver_status = pd.DataFrame({'Statistic': ['Engine', 'Status', 'Solve Time (s)'],
+                                          'Value': ['pulp', status, solve_time]})
+        return sln
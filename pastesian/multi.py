@@ -0,0 +1,525 @@
+"""
+Multi-product, multi-site production planning, used by solve() when the 'product_costs' input table has rows.
+
+Every (product, site) pair of 'product_costs' is a chain of consecutive periods with the flow balance of the
+single-product model: production plus the inventory of the previous period (or the 'Starting Inventory' of the pair)
+equals demand plus the inventory of the period, and the last inventory is the 'Ending Inventory' of the pair. The
+products of a site share its production and freezer capacities in every period. There are no transfers between
+sites, so each site is an independent model.
+
+Indexing is sparse: there is one production and one inventory variable per row of 'product_costs', and nothing for
+the (product, site, period) combinations that don't exist. The rows are sorted once by (site, product, period) integer
+codes, so that each site and each chain is a contiguous slice of the arrays, and the models are built with vectorized
+NumPy operations rather than dictionaries keyed by tuples.
+
+Every engine first solves all chains at once without capacities (see solve_uncapacitated), which is optimal for the
+sites whose capacities that plan respects. Only the other sites, whose capacities are binding, are solved as LPs: one
+per site, since sites only share capacities among their own products, built in matrix form by build_site_matrices and
+solved with HiGHS, several sites at once on the 'threads' solver option. When scipy isn't installed, the 'pulp' and
+'flow' engines fall back to a single PuLP model of the binding sites, solved with CBC, whose build is much slower.
+
+Performance, with the default engine on a single core: 2,000 products x 12 sites x 104 weeks (2.5M rows) are solved in
+about 4.5 s end to end when no capacity is binding. When every site is binding (capacity='tight' in
+pastesian.bench.generate_multi_product_instance), each site is an LP with 416k variables that HiGHS solves in about
+35 s, i.e., about 7 minutes for the 12 sites (11 s with 200 products), which the 'threads' option divides by up to the
+number of binding sites. Such data sets are thus not solved in seconds, unless there are as many cores as sites.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pulp
+from pastesian import output_schema
+from pastesian.engines import pulp_solver
+from pastesian.matrix import LINPROG_STATUS, sparse, linprog
+from pastesian.stats import NO_STATS
+
+
+def is_multi_product(dat):
+    """
+    Return whether dat holds a multi-product data set, i.e., whether its 'product_costs' table has rows.
+    """
+    return len(dat.product_costs) > 0
+
+
+def _codes(labels, values, table_name, field_names):
+    """
+    Integer codes of values among labels, raising ValueError for the values that are not labels.
+    """
+    codes = labels.get_indexer(values)
+    if (codes < 0).any():
+        missing = pd.unique(np.asarray(values)[codes < 0])
+        raise ValueError(f'The following {field_names} exist in {table_name} but not in product_costs: '
+                         f'{set(missing[:10].tolist())}')
+    return codes
+
+
+def _chain_cumsum(values, chain, first_rows):
+    """
+    Cumulative sum of values within each chain, where chain gives the chain of each row and first_rows the first row
+    of each chain.
+    """
+    total = np.cumsum(values)
+    return total - (total - values)[first_rows][chain]
+
+
+def create_multi_product_parameters(dat, parameters):
+    """
+    Reads the multi-product tables from PanDat object and creates the optimization parameters, as arrays with one item
+    per row of 'product_costs', sorted by site, product and period.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with the input_schema and contains the input data.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict. Its 'Production
+        Capacity' and 'Inventory Capacity' are the capacities of the sites without them in the 'sites' table.
+
+    Returns
+    -------
+    params : dict
+        A dictionary with the following keys: 'products' and 'sites' (pandas.Index of the labels, whose positions are
+        the codes used below), 'product', 'site' and 'period' (codes of each row), 'demand', 'production_cost',
+        'inventory_cost' (of each row), 'chain' (chain of each row), 'first_rows' and 'last_rows' (first and last row
+        of each chain), 'start' and 'end' (starting and ending inventory of each chain), 'site_rows' (the rows of site
+        k are site_rows[k]:site_rows[k + 1]) and 'production_capacity' and 'inventory_capacity' (of each site,
+        numpy.inf when there is none).
+
+    Raises
+    ------
+    ValueError
+        When 'product_demand' or 'product_inventory' refer to (product, site, period) combinations that don't exist in
+        'product_costs', or when the periods of some (product, site) pair are not consecutive.
+    """
+    costs = dat.product_costs
+    products = pd.Index(pd.unique(costs['Product ID']))
+    sites = pd.Index(pd.unique(costs['Site ID']))
+    n_products = len(products)
+    n_periods = int(costs['Period ID'].max()) + 1
+
+    # region Sort the rows by a single integer key, (site * n_products + product) * n_periods + period
+    def row_keys(table, table_name):
+        product = _codes(products, table['Product ID'], table_name, "'Product ID' values")
+        site = _codes(sites, table['Site ID'], table_name, "'Site ID' values")
+        return (site.astype(np.int64) * n_products + product) * n_periods + table['Period ID'].to_numpy(np.int64)
+
+    keys = row_keys(costs, 'product_costs')
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    period = keys % n_periods
+    pair = keys // n_periods
+    product = pair % n_products
+    site = pair // n_products
+    # endregion
+
+    # region Chains: consecutive rows of the same (product, site) pair, which must have consecutive periods
+    n = len(keys)
+    new_pair = np.ones(n, dtype=bool)
+    new_pair[1:] = pair[1:] != pair[:-1]
+    gaps = ~new_pair & (period != np.roll(period, 1) + 1)
+    if gaps.any():
+        bad = pd.unique(pair[gaps])
+        pairs = {(products[p % n_products], sites[p // n_products]) for p in bad[:10].tolist()}
+        raise ValueError(f"The periods of the following ('Product ID', 'Site ID') pairs in product_costs are not "
+                         f"consecutive: {pairs}")
+    first_rows = np.flatnonzero(new_pair)
+    last_rows = np.append(first_rows[1:] - 1, n - 1)
+    chain = np.cumsum(new_pair) - 1
+    # endregion
+
+    # region Demand, costs and inventories of each row or chain
+    demand = np.zeros(n)
+    if len(dat.product_demand):
+        demand_keys = row_keys(dat.product_demand, 'product_demand')
+        rows = np.searchsorted(keys, demand_keys)
+        unknown = (rows == n) | (keys[np.minimum(rows, n - 1)] != demand_keys)
+        if unknown.any():
+            raise ValueError(f"The following rows of product_demand have no ('Product ID', 'Site ID', 'Period ID') "
+                             f"in product_costs: {dat.product_demand.index[unknown][:10].tolist()}")
+        demand[rows] = dat.product_demand['Demand'].to_numpy(dtype=float)
+    production_cost = costs['Production Cost'].to_numpy(dtype=float)[order]
+    inventory_cost = costs['Inventory Cost'].to_numpy(dtype=float)[order]
+
+    start = np.zeros(len(first_rows))
+    end = np.zeros(len(first_rows))
+    inventory = dat.product_inventory
+    if len(inventory):
+        inventory_pairs = (_codes(sites, inventory['Site ID'], 'product_inventory', "'Site ID' values") * n_products +
+                           _codes(products, inventory['Product ID'], 'product_inventory', "'Product ID' values"))
+        chains = np.searchsorted(pair[first_rows], inventory_pairs)
+        unknown = (chains == len(first_rows)) | (pair[first_rows][np.minimum(chains, len(first_rows) - 1)] !=
+                                                 inventory_pairs)
+        if unknown.any():
+            raise ValueError(f"The following rows of product_inventory have no ('Product ID', 'Site ID') in "
+                             f"product_costs: {inventory.index[unknown][:10].tolist()}")
+        start[chains] = inventory['Starting Inventory'].fillna(0).to_numpy(dtype=float)
+        end[chains] = inventory['Ending Inventory'].fillna(0).to_numpy(dtype=float)
+    # endregion
+
+    # region Site capacities, from the parameters overridden by the 'sites' table, with -1 meaning no capacity
+    production_capacity = np.full(len(sites), float(parameters['Production Capacity']))
+    inventory_capacity = np.full(len(sites), float(parameters['Inventory Capacity']))
+    if len(dat.sites):
+        site_codes = sites.get_indexer(dat.sites['Site ID'])
+        known = site_codes >= 0  # sites without products have nothing to plan
+        for capacity, field_name in ((production_capacity, 'Production Capacity'),
+                                     (inventory_capacity, 'Inventory Capacity')):
+            values = dat.sites[field_name].to_numpy(dtype=float)
+            given = known & ~np.isnan(values)
+            capacity[site_codes[given]] = values[given]
+    production_capacity[production_capacity == -1] = np.inf
+    inventory_capacity[inventory_capacity == -1] = np.inf
+    # endregion
+
+    return {'products': products, 'sites': sites, 'product': product, 'site': site, 'period': period,
+            'demand': demand, 'production_cost': production_cost, 'inventory_cost': inventory_cost, 'chain': chain,
+            'first_rows': first_rows, 'last_rows': last_rows, 'start': start, 'end': end,
+            'site_rows': np.searchsorted(site, np.arange(len(sites) + 1)),
+            'production_capacity': production_capacity, 'inventory_capacity': inventory_capacity}
+
+
+def build_site_matrices(params, k):
+    """
+    Build the model of site k in matrix form: min c @ v subject to A_ub @ v <= b_ub, A_eq @ v == b_eq and bounds.
+
+    Variables are ordered as [x[a], ..., x[b - 1], s[a], ..., s[b - 1]] for the rows a:b of the site. There is one flow
+    balance row per variable pair, and one capacity row per period of the site, for each capacity it has.
+
+    Parameters
+    ----------
+    params : dict
+        The optimization parameters, as created by create_multi_product_parameters.
+    k : int
+        The site code.
+
+    Returns
+    -------
+    c, A_ub, b_ub, A_eq, b_eq, bounds
+        The arguments of scipy.optimize.linprog. A_ub and b_ub are None when the site has no capacities.
+    """
+    if sparse is None:
+        raise ImportError("The 'highs' engine requires scipy, which can be installed with `pip install scipy`")
+    a, b = params['site_rows'][k:k + 2]
+    n = b - a
+    rows = np.arange(n)
+    lo, hi = np.searchsorted(params['first_rows'], [a, b])  # the chains of the site are lo:hi
+    first = np.zeros(n, dtype=bool)
+    first[params['first_rows'][lo:hi] - a] = True
+
+    c = np.concatenate([params['production_cost'][a:b], params['inventory_cost'][a:b]])
+
+    # region Flow Balance constraints: x[r] + s[r - 1] - s[r] == d[r], with s[r - 1] being the 'Starting Inventory'
+    # of the chain in its first row
+    middle = rows[~first]
+    A_eq = sparse.csr_matrix((np.concatenate([np.ones(n), -np.ones(n), np.ones(len(middle))]),
+                              (np.concatenate([rows, rows, middle]), np.concatenate([rows, n + rows, n + middle - 1]))),
+                             shape=(n, 2 * n))
+    b_eq = params['demand'][a:b].copy()
+    b_eq[first] -= params['start'][lo:hi]
+    # endregion
+
+    # region Bounds: 'Ending Inventory' as the inventory of the last row of each chain
+    bounds = np.zeros((2 * n, 2))
+    bounds[:, 1] = np.inf
+    last = n + params['last_rows'][lo:hi] - a
+    bounds[last, 0] = params['end'][lo:hi]
+    bounds[last, 1] = params['end'][lo:hi]
+    # endregion
+
+    # region Shared capacities: one row per period of the site, over the production or inventory of all its products
+    periods, period_rows = np.unique(params['period'][a:b], return_inverse=True)
+    blocks = []
+    b_ub = []
+    for offset, capacity in ((0, params['production_capacity'][k]), (n, params['inventory_capacity'][k])):
+        if np.isfinite(capacity):
+            blocks.append(sparse.csr_matrix((np.ones(n), (period_rows, offset + rows)), shape=(len(periods), 2 * n)))
+            b_ub.append(np.full(len(periods), capacity))
+    A_ub = sparse.vstack(blocks, format='csr') if blocks else None
+    b_ub = np.concatenate(b_ub) if b_ub else None
+    # endregion
+
+    return c, A_ub, b_ub, A_eq, b_eq, bounds
+
+
+def build_multi_product_model(params, sites=None):
+    """
+    Build the PuLP optimization model of some sites from the multi-product optimization parameters.
+
+    Parameters
+    ----------
+    params : dict
+        The optimization parameters, as created by create_multi_product_parameters.
+    sites : list, optional
+        The codes of the sites to model, e.g., the binding ones. Default is None, i.e., all of them.
+
+    Returns
+    -------
+    mdl : pulp.LpProblem
+        The optimization model, ready to be solved.
+    x : dict
+        A dictionary structured as {row: production_variable}, for the rows of the sites
+    s : dict
+        A dictionary structured as {row: storage_variable}, for the rows of the sites
+    """
+    if sites is None:
+        sites = range(len(params['sites']))
+    site_rows = params['site_rows']
+    rows = np.concatenate([np.arange(site_rows[k], site_rows[k + 1]) for k in sites]).tolist()
+    mdl = pulp.LpProblem('Pastesian', sense=pulp.LpMinimize)
+    x = pulp.LpVariable.dicts(indices=rows, cat=pulp.LpContinuous, lowBound=0.0, name='x')  # Production quantities
+    s = pulp.LpVariable.dicts(indices=rows, cat=pulp.LpContinuous, lowBound=0.0, name='s')  # Storage quantities
+
+    # region Flow Balance constraints
+    first = np.zeros(len(params['chain']), dtype=bool)
+    first[params['first_rows']] = True
+    chain_start = params['start'][params['chain']]
+    demand = params['demand']
+    for r in rows:
+        if first[r]:
+            mdl.addConstraint(x[r] + chain_start[r] == s[r] + demand[r], name=f'balance_at_{r}')
+        else:
+            mdl.addConstraint(x[r] + s[r - 1] == s[r] + demand[r], name=f'balance_at_{r}')
+    for c, r in enumerate(params['last_rows'].tolist()):
+        if r in s:
+            s[r].lowBound = s[r].upBound = float(params['end'][c])
+    # endregion
+
+    # region Shared capacities of each site and period
+    groups = pd.Series(rows).groupby([params['site'][rows], params['period'][rows]]).agg(list)
+    for (k, t), group in groups.items():
+        for var, capacity, name in ((x, params['production_capacity'][k], 'production'),
+                                    (s, params['inventory_capacity'][k], 'inventory')):
+            if np.isfinite(capacity):
+                mdl.addConstraint(pulp.lpSum(var[r] for r in group) <= capacity, name=f'{name}_capacity_{k}_{t}')
+    # endregion
+
+    # region Objective function
+    mdl.setObjective(pulp.LpAffineExpression(list(zip(x.values(), params['production_cost'][rows].tolist())) +
+                                             list(zip(s.values(), params['inventory_cost'][rows].tolist()))))
+    # endregion
+
+    return mdl, x, s
+
+
+def solve_uncapacitated(params):
+    """
+    Solve the multi-product model without its capacities, used by optimize_multi_product.
+
+    Without capacities, every chain is an independent uncapacitated lot-sizing problem, where the 'Starting Inventory'
+    serves the earliest demand and every other unit of demand (including the 'Ending Inventory', as demand of the last
+    period) is produced in the period k <= t of its chain that minimizes production_cost[k] plus the inventory costs
+    from k to t - 1. That's a running minimum of production_cost[k] - H[k] within each chain, H being the cumulative
+    inventory cost before k, so all chains are solved at once with vectorized operations.
+
+    Parameters
+    ----------
+    params : dict
+        The optimization parameters, as created by create_multi_product_parameters.
+
+    Returns
+    -------
+    production : numpy.ndarray
+        The production quantity of each row, or None when the model is not optimal.
+    inventory : numpy.ndarray
+        The inventory quantity of each row, or None when the model is not optimal.
+    status : str
+        The solver status, following pulp.LpStatus names, i.e., 'Optimal' or 'Infeasible' (when some 'Starting
+        Inventory' exceeds the demand of its chain plus its 'Ending Inventory').
+    """
+    chain, first_rows, last_rows = params['chain'], params['first_rows'], params['last_rows']
+    n = len(chain)
+    demand = params['demand'].copy()
+    demand[last_rows] += params['end']
+    cum_demand = _chain_cumsum(demand, chain, first_rows)
+    start = params['start'][chain]
+    if (params['start'] > cum_demand[last_rows] + 1e-9 * np.maximum(1, cum_demand[last_rows])).any():
+        return None, None, 'Infeasible'
+
+    # Demand left after the 'Starting Inventory' is used up
+    residual = demand - (np.minimum(cum_demand, start) - np.minimum(cum_demand - demand, start))
+
+    # Best production period of each row: the latest one achieving the running minimum of its chain
+    holding = _chain_cumsum(params['inventory_cost'], chain, first_rows) - params['inventory_cost']
+    key = params['production_cost'] - holding
+    running_min = pd.Series(key).groupby(chain).cummin().to_numpy()
+    source = np.maximum.accumulate(np.where(key == running_min, np.arange(n), -1))
+
+    production = np.bincount(source, weights=residual, minlength=n)
+    inventory = start + _chain_cumsum(production - params['demand'], chain, first_rows)
+    np.maximum(inventory, 0, out=inventory)  # rounding errors only
+    return production, inventory, 'Optimal'
+
+
+def binding_sites(params, production, inventory):
+    """
+    Return the codes of the sites whose capacities are violated by a plan, e.g., the one of solve_uncapacitated.
+
+    When a plan that is optimal without capacities doesn't violate the capacities of a site, it's also optimal with
+    them, so only the other sites need to be solved as LPs.
+    """
+    n_periods = int(params['period'].max()) + 1
+    n_sites = len(params['sites'])
+    slots = params['site'] * n_periods + params['period']
+    binding = np.zeros(n_sites, dtype=bool)
+    for plan, capacity in ((production, params['production_capacity']), (inventory, params['inventory_capacity'])):
+        used = np.bincount(slots, weights=plan, minlength=n_sites * n_periods).reshape(n_sites, n_periods)
+        binding |= (used > capacity[:, None] * (1 + 1e-9) + 1e-9).any(axis=1)
+    return np.flatnonzero(binding)
+
+
+def _solve_sites_highs(params, binding, production, inventory, stats, options):
+    """
+    Solve the binding sites as LPs in matrix form with HiGHS, up to options['threads'] of them at once (HiGHS releases
+    the GIL), and write their plans into production and inventory. Return the status of the first site that's not
+    optimal, if any, or 'Optimal'.
+    """
+    with stats.phase('build'):
+        models = [build_site_matrices(params, k) for k in binding]
+    stats.record('build', 'Variables', sum(A_eq.shape[1] for _, _, _, A_eq, _, _ in models))
+    stats.record('build', 'Constraints', sum(A_eq.shape[0] + (0 if A_ub is None else A_ub.shape[0])
+                                             for _, A_ub, _, A_eq, _, _ in models))
+
+    # The devex pricing of the dual simplex is about 1.5x faster than the default on these LPs
+    highs_options = {'simplex_dual_edge_weight_strategy': 'devex'}
+    if options.get('time_limit') is not None:
+        highs_options['time_limit'] = options['time_limit']
+
+    def solve_site(model):
+        c, A_ub, b_ub, A_eq, b_eq, bounds = model
+        return linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs',
+                       options=highs_options)
+
+    with stats.phase('solve'):
+        workers = min(len(binding), options.get('threads') or os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(solve_site, models))
+    for k, res in zip(binding, results):
+        status = LINPROG_STATUS.get(res.status, 'Undefined')
+        if status != 'Optimal':
+            return status
+        a, b = params['site_rows'][k:k + 2]
+        production[a:b] = res.x[:b - a]
+        inventory[a:b] = res.x[b - a:]
+    return 'Optimal'
+
+
+def _solve_sites_pulp(params, binding, production, inventory, stats, options):
+    """
+    Solve the binding sites as a single PuLP model with CBC, and write their plans into production and inventory.
+    Return the solver status.
+    """
+    with stats.phase('build'):
+        mdl, x, s = build_multi_product_model(params, binding)
+    stats.record('build', 'Variables', mdl.numVariables())
+    stats.record('build', 'Constraints', mdl.numConstraints())
+    with stats.phase('solve'):
+        mdl.solve(pulp_solver(options))
+    status = pulp.LpStatus[mdl.status]
+    if status == 'Optimal':
+        rows = np.fromiter(x.keys(), dtype=np.int64, count=len(x))
+        production[rows] = np.fromiter((var.value() for var in x.values()), dtype=float, count=len(x))
+        inventory[rows] = np.fromiter((var.value() for var in s.values()), dtype=float, count=len(s))
+    return status
+
+
+def optimize_multi_product(params, engine='pulp', stats=NO_STATS, options=None):
+    """
+    Optimize the multi-product model with the given engine and retrieve the solution.
+
+    All engines first solve the model without capacities, with solve_uncapacitated. The plan of a site that doesn't
+    violate its capacities is optimal, and each of the other sites (see binding_sites) is then solved as an LP, since
+    sites only share their capacities among their own products. The LPs are built in matrix form and solved with HiGHS,
+    except with the 'pulp' and 'flow' engines when scipy isn't installed, which solve them as a PuLP model with CBC.
+
+    Parameters
+    ----------
+    params : dict
+        The optimization parameters, as created by create_multi_product_parameters.
+    engine : str, optional
+        One of pastesian.engines.ENGINES. 'highs' requires scipy. Default is 'pulp'.
+    stats : pastesian.stats.RunStats, optional
+        When given, the 'build' and 'solve' phases are measured, and the model size, the number of binding sites and
+        the solver status recorded.
+    options : dict, optional
+        Solver options, see pastesian.engines.check_solver_options. With HiGHS, 'threads' is the number of binding
+        sites solved at once (default is the number of CPUs) and 'time_limit' applies to each of them. Default is None.
+
+    Returns
+    -------
+    production : numpy.ndarray
+        The production quantity of each row of params, or None when the model is not optimal.
+    inventory : numpy.ndarray
+        The inventory quantity of each row of params, or None when the model is not optimal.
+    status : str
+        The solver status, following pulp.LpStatus names. With HiGHS, the status of the first binding site that's not
+        optimal, if any.
+    """
+    options = options or {}
+    with stats.phase('solve'):
+        production, inventory, status = solve_uncapacitated(params)
+        binding = binding_sites(params, production, inventory) if status == 'Optimal' else []
+    stats.record('solve', 'Binding Sites', len(binding))
+    if len(binding) and (engine == 'highs' or linprog is not None):
+        status = _solve_sites_highs(params, binding, production, inventory, stats, options)
+    elif len(binding):
+        status = _solve_sites_pulp(params, binding, production, inventory, stats, options)
+    else:
+        stats.record('build', 'Variables', 0)
+        stats.record('build', 'Constraints', 0)
+    stats.record('solve', 'Status', status)
+    if status != 'Optimal':
+        return None, None, status
+    return production, inventory, status
+
+
+def populate_multi_product_output(production, inventory, params):
+    """
+    Create the PanDat object containing the output of the multi-product optimization.
+
+    The 'product_flow' and 'product_costs' tables have a row per row of the 'product_costs' input table, ordered by
+    site, product and period (sites and products in the order they first appear in the input), while the
+    'production_flow' and 'costs' tables have the totals of each period over all products and sites.
+
+    Parameters
+    ----------
+    production : numpy.ndarray
+        The production quantity of each row of params, or None when the model is not optimal.
+    inventory : numpy.ndarray
+        The inventory quantity of each row of params, or None when the model is not optimal.
+    params : dict
+        The optimization parameters, as created by create_multi_product_parameters.
+
+    Returns
+    -------
+    sln : PanDat
+        PanDat object containing the output data from the optimization model, compatible with the output schema.
+    """
+    sln = output_schema.PanDat()
+    if production is None:
+        return sln
+    production_cost = production * params['production_cost']
+    inventory_cost = inventory * params['inventory_cost']
+    keys = {'Product ID': params['products'].take(params['product']),
+            'Site ID': params['sites'].take(params['site']),
+            'Period ID': params['period']}
+    sln.product_flow = pd.DataFrame(dict(keys, **{'Production Quantity': production,
+                                                  'Inventory Quantity': inventory}))
+    sln.product_costs = pd.DataFrame(dict(keys, **{'Production Cost': np.round(production_cost, 2),
+                                                   'Inventory Cost': np.round(inventory_cost, 2),
+                                                   'Total Cost': np.round(production_cost + inventory_cost, 2)}))
+
+    # region Totals of each period
+    periods = np.unique(params['period'])
+
+    def total(values):
+        return np.bincount(params['period'], weights=values)[periods]
+
+    sln.production_flow = pd.DataFrame({'Period ID': periods, 'Production Quantity': total(production),
+                                        'Inventory Quantity': total(inventory)})
+    production_cost, inventory_cost = total(production_cost), total(inventory_cost)
+    sln.costs = pd.DataFrame({'Period ID': periods, 'Production Cost': np.round(production_cost, 2),
+                              'Inventory Cost': np.round(inventory_cost, 2),
+                              'Total Cost': np.round(production_cost + inventory_cost, 2)})
+    # endregion
+    return sln
@@ -0,0 +1,98 @@
+"""
+Copy-on-write scenario overlays of the input data.
+
+A what-if scenario usually changes a column or two of a base data set, e.g., the 'Demand' of the 'demand' table, while
+input_schema.copy_pan_dat copies every table, so holding many scenarios in memory means as many copies of
+'time_periods', 'costs', 'parameters', etc. A ScenarioOverlay only stores the columns (or tables) that differ from its
+base, and shares everything else with it:
+
+>> from pastesian.overlay import ScenarioOverlay
+>> scenario = ScenarioOverlay(dat, columns={('demand', 'Demand'): 1.1 * dat.demand['Demand']})
+>> sln = solve(scenario)
+
+Its tables are read as the attributes of a PanDat, so solve(), create_optimization_parameters() and the functions of
+ticdat (e.g., input_schema.create_full_parameters_dict or input_schema.csv.write_directory) accept it as it is. The
+tables of an overlay are shared with its base, so they must be treated as read-only: a scenario is changed by deriving
+a new overlay with with_changes.
+"""
+import pandas as pd
+
+
+class ScenarioOverlay:
+    """
+    Lightweight scenario of a base PanDat, which only holds the modified columns and tables.
+
+    Parameters
+    ----------
+    base : PanDat or ScenarioOverlay
+        The data set the scenario is based on. An overlay of an overlay is flattened, i.e., it holds the changes of
+        both on top of the innermost base.
+    columns : dict, optional
+        A dictionary structured as {(table_name, field_name): values}, values being a Series or array with one value
+        per row of the base table, in the same order. The field may be new to the table.
+    tables : dict, optional
+        A dictionary structured as {table_name: DataFrame}, for the tables replaced as a whole, e.g., when rows are
+        added or removed. Their columns may still be changed by columns.
+    """
+
+    def __init__(self, base, columns=None, tables=None):
+        if isinstance(base, ScenarioOverlay):
+            columns = {**base._columns, **(columns or {})}
+            tables = {**base._tables, **(tables or {})}
+            base = base._base
+        self._base = base
+        self._columns = dict(columns or {})
+        self._tables = dict(tables or {})
+        self._materialized = {}
+        for table_name, _ in self._columns:
+            getattr(base, table_name)  # raises AttributeError for unknown tables right away
+        for table_name in self._tables:
+            getattr(base, table_name)
+
+    @property
+    def base(self):
+        """
+        The PanDat this overlay is based on.
+        """
+        return self._base
+
+    @property
+    def changed_tables(self):
+        """
+        The names of the tables that differ from the base, sorted.
+        """
+        return sorted({table_name for table_name, _ in self._columns}.union(self._tables))
+
+    def with_changes(self, columns=None, tables=None):
+        """
+        Derive a new overlay with more changes, see ScenarioOverlay for the arguments. This overlay is left untouched.
+        """
+        return ScenarioOverlay(self, columns, tables)
+
+    def _table(self, table_name):
+        table = self._tables.get(table_name)
+        if table is None:
+            table = getattr(self._base, table_name)
+        changed = {field: values for (name, field), values in self._columns.items() if name == table_name}
+        if not changed:
+            return table
+        data = {field: table[field] for field in table.columns}
+        for field, values in changed.items():
+            if isinstance(values, pd.Series) and values.index.equals(table.index):
+                data[field] = values.rename(field)
+            else:
+                values = values.to_numpy() if isinstance(values, pd.Series) else values
+                if len(values) != len(table):
+                    raise ValueError(f'{table_name}[{field!r}] needs {len(table)} values, not {len(values)}')
+                data[field] = pd.Series(values, index=table.index, name=field, copy=False)
+        return pd.DataFrame(data, index=table.index, copy=False)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name not in self._materialized:
+            self._materialized[name] = self._table(name)
+        return self._materialized[name]
+
+    def __repr__(self):
+        return f'ScenarioOverlay(changed_tables={self.changed_tables})'
@@ -0,0 +1,171 @@
+"""
+Rolling-horizon solution mode, used by solve() when a 'window' is given.
+
+The horizon is solved in windows of 'window' periods that overlap by 'overlap' periods. Only the first
+window - overlap periods of each window are committed; the inventory at the end of the last committed period becomes
+the 'Lasagnas To Start' of the next window. Every window but the last one may end with any inventory from which the
+rest of the horizon is still feasible (see pastesian.feasibility.supply_interval), e.g., lasagnas built up ahead of a
+demand peak beyond the window, so a feasible data set never becomes infeasible window by window. Each window is
+optimized from scratch, so time and memory scale with the window size rather than with the whole horizon.
+"""
+from pastesian.engines import optimize
+from pastesian.feasibility import supply_interval
+from pastesian.utils import period_capacities
+
+
+def _total_cost(x_sol, s_sol, pc, ic):
+    return sum(pc[i] * value for i, value in x_sol) + sum(ic[i] * value for i, value in s_sol)
+
+
+def rolling_horizon(d, pc, ic, I, parameters, pcap, icap, window, overlap=0, engine='pulp', options=None):
+    """
+    Solve the pastesian model window by window, yielding the committed periods of each window as soon as it's solved.
+
+    Parameters
+    ----------
+    d : dict
+        A dictionary structured as {period_id: demand}
+    pc : dict
+        A dictionary structured as {period_id: production_cost}
+    ic : dict
+        A dictionary structured as {period_id: inventory_cost}
+    I : list
+        A list containing the 'Period ID' values, i.e., all integers from 1 to len(I), not necessarily ordered.
+    parameters : dict
+        The full parameters dictionary, as created by input_schema.create_full_parameters_dict.
+    pcap, icap : dict
+        Per-period capacities, as created by create_capacity_parameters (None means the scalar parameters apply).
+    window : int
+        Number of periods optimized together.
+    overlap : int, optional
+        Number of periods at the end of each window that are optimized but not committed, so that the committed
+        periods take the near future into account. Must be smaller than window. Default is 0.
+    engine : str, optional
+        The engine used to optimize each window, see solve(). Default is 'pulp'.
+    options : dict, optional
+        Solver options used for each window, see pastesian.engines.check_solver_options. Default is None.
+
+    Yields
+    ------
+    x_sol : list
+        A list containing pairs of (period_id, production_quantity) for the committed periods, or None when the
+        window is not optimal, in which case it's the last item yielded.
+    s_sol : list
+        A list containing pairs of (period_id, inventory_quantity) for the committed periods, or None as above.
+    status : str
+        The solver status of the window, following pulp.LpStatus names.
+
+    Raises
+    ------
+    ValueError
+        When window is not positive or overlap is not in [0, window).
+    """
+    if window < 1 or not 0 <= overlap < window:
+        raise ValueError(f'window must be positive and overlap must be in [0, window), not window={window} and '
+                         f'overlap={overlap}')
+    n = len(I)
+    if pcap is None:
+        pcap = period_capacities(I, parameters['Production Capacity'])
+    if icap is None:
+        icap = period_capacities(I, parameters['Inventory Capacity'])
+    # inventories at the end of each period from which the rest of the horizon is feasible
+    cum_demand, lo, hi, _ = supply_interval(d, I, parameters, pcap, icap)
+    low_inventory = [0.0, *(max(value, 0.0) for value in lo - cum_demand)]
+    high_inventory = [0.0, *(max(value, 0.0) for value in hi - cum_demand)]
+    start_amount = parameters['Lasagnas To Start']
+    first = 1
+    while first <= n:
+        last = min(first + window - 1, n)
+        committed = n if last == n else last - overlap
+        shift = first - 1
+        window_I = list(range(1, last - shift + 1))
+        window_d = {i: d[i + shift] for i in window_I}
+        window_pc = {i: pc[i + shift] for i in window_I}
+        window_ic = {i: ic[i + shift] for i in window_I}
+        window_pcap = {i - shift: c for i, c in pcap.items() if first <= i <= last}
+        window_icap = {i - shift: c for i, c in icap.items() if first <= i <= last}
+        window_parameters = dict(parameters, **{'Lasagnas To Start': start_amount})
+        if last < n:
+            # The ending inventory s is kept within [low, high] by an extra period p, with demand high, free
+            # production of at most high - low and no inventory left: x[p] + s == high, so that the engines, which
+            # all fix the last inventory to 'Lasagnas To Be Left', can be used as they are.
+            p = len(window_I) + 1
+            window_d[p], window_pc[p], window_ic[p] = high_inventory[last], 0.0, 0.0
+            window_pcap[p] = max(high_inventory[last] - low_inventory[last], 0.0)
+            window_I.append(p)
+            window_parameters['Lasagnas To Be Left'] = 0
+        x_sol, s_sol, status = optimize(window_d, window_pc, window_ic, window_I, window_parameters, window_pcap,
+                                        window_icap, engine, options=options)
+        if status != 'Optimal':
+            yield None, None, status
+            return
+
+        x_sol = sorted((i + shift, value) for i, value in x_sol if i + shift <= committed)
+        s_sol = sorted((i + shift, value) for i, value in s_sol if i + shift <= committed)
+        start_amount = s_sol[-1][1]
+        yield x_sol, s_sol, status
+        first = committed + 1
+
+
+def solve_rolling_horizon(d, pc, ic, I, parameters, pcap, icap, window, overlap=0, engine='pulp', options=None):
+    """
+    Solve the pastesian model with rolling_horizon and gather all committed periods.
+
+    Parameters
+    ----------
+    d, pc, ic, I, parameters, pcap, icap, window, overlap, engine, options
+        See rolling_horizon.
+
+    Returns
+    -------
+    x_sol : list
+        A list containing pairs of (period_id, production_quantity), or None when some window is not optimal.
+    s_sol : list
+        A list containing pairs of (period_id, inventory_quantity), or None when some window is not optimal.
+    status : str
+        'Optimal' when all windows are, otherwise the status of the first window that is not.
+    """
+    x_sol = []
+    s_sol = []
+    for x_chunk, s_chunk, status in rolling_horizon(d, pc, ic, I, parameters, pcap, icap, window, overlap, engine,
+                                                    options):
+        if status != 'Optimal':
+            return None, None, status
+        x_sol.extend(x_chunk)
+        s_sol.extend(s_chunk)
+    return x_sol, s_sol, 'Optimal'
+
+
+def rolling_horizon_gap(d, pc, ic, I, parameters, pcap, icap, window, overlap=0, engine='flow'):
+    """
+    Estimate the optimality gap of the rolling-horizon solution by also solving the full horizon at once, which is
+    only sensible on instances small enough for the full solve.
+
+    Parameters
+    ----------
+    d, pc, ic, I, parameters, pcap, icap, window, overlap
+        See rolling_horizon.
+    engine : str, optional
+        The engine used for both solves, see solve(). Default is 'flow', the fastest one.
+
+    Returns
+    -------
+    rolling_cost : float
+        Total cost of the rolling-horizon solution, or None when it's not optimal.
+    full_cost : float
+        Total cost of the full-horizon solution, or None when it's not optimal.
+    gap : float
+        (rolling_cost - full_cost) / full_cost (0.0 when both costs are zero), or None when some cost is None.
+    """
+    x_sol, s_sol, status = solve_rolling_horizon(d, pc, ic, I, parameters, pcap, icap, window, overlap, engine)
+    rolling_cost = _total_cost(x_sol, s_sol, pc, ic) if status == 'Optimal' else None
+    x_sol, s_sol, status = optimize(d, pc, ic, I, parameters, pcap, icap, engine)
+    full_cost = _total_cost(x_sol, s_sol, pc, ic) if status == 'Optimal' else None
+
+    if rolling_cost is None or full_cost is None:
+        gap = None
+    elif full_cost == 0:
+        gap = 0.0 if rolling_cost == 0 else float('inf')
+    else:
+        gap = (rolling_cost - full_cost) / full_cost
+    return rolling_cost, full_cost, gap
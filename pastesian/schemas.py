@@ -6,7 +6,15 @@ input_schema = PanDatFactory(
     parameters=[['Name'], ['Value']],
     time_periods=[['Period ID'], ['Time Period']],
     demand=[['Period ID'], ['Demand']],
-    costs=[['Period ID'], ['Production Cost', 'Inventory Cost']]
+    costs=[['Period ID'], ['Production Cost', 'Inventory Cost']],
+    capacities=[['Period ID'], ['Production Capacity', 'Inventory Capacity']],
+    setups=[['Period ID'], ['Setup Cost', 'Minimum Batch Size']],
+    sites=[['Site ID'], ['Production Capacity', 'Inventory Capacity']],
+    product_demand=[['Product ID', 'Site ID', 'Period ID'], ['Demand']],
+    product_costs=[['Product ID', 'Site ID', 'Period ID'], ['Production Cost', 'Inventory Cost']],
+    product_inventory=[['Product ID', 'Site ID'], ['Starting Inventory', 'Ending Inventory']],
+    scenarios=[['Scenario ID'], ['Probability']],
+    scenario_demand=[['Scenario ID', 'Period ID'], ['Demand']]
 )
 
 # endregion
@@ -18,7 +26,7 @@ input_schema.add_parameter('Production Capacity', default_value=-1, number_allow
 # Inventory Capacity: upper bound for monthly storage
 input_schema.add_parameter('Inventory Capacity', default_value=-1, number_allowed=True, strings_allowed=(),
                            must_be_int=True, min=-1.0, inclusive_min=True)
-# TODO: consider allowing production and inventory capacities to vary through periods, which would enter as input data
+# Production and inventory capacities may also vary through periods, through the optional 'capacities' table below
 
 # When one of these capacity parameters is -1, it's like we didn't have the respective capacity restriction
 input_schema.add_parameter('Lasagnas To Be Left', default_value=0, number_allowed=True, strings_allowed=(),
@@ -26,12 +34,29 @@ input_schema.add_parameter('Lasagnas To Be Left', default_value=0, number_allowe
 # last period
 input_schema.add_parameter('Lasagnas To Start', default_value=50, number_allowed=True, strings_allowed=(),
                            must_be_int=True, min=0.0, inclusive_min=True)  # Amount of lasagnas we start with
+# Backlog Cost: cost of each lasagna of demand not met on time, per period of delay, only used by the stochastic mode
+input_schema.add_parameter('Backlog Cost', default_value=100, number_allowed=True, strings_allowed=(),
+                           must_be_int=False, min=0.0, inclusive_min=True)
+# Setup Cost: fixed cost of each production run, i.e., of each period with some production
+input_schema.add_parameter('Setup Cost', default_value=0, number_allowed=True, strings_allowed=(),
+                           must_be_int=False, min=0.0, inclusive_min=True)
+# Minimum Batch Size: least number of lasagnas of each production run
+input_schema.add_parameter('Minimum Batch Size', default_value=0, number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=0.0, inclusive_min=True)
+# When some setup cost or minimum batch size is positive (here or in the optional 'setups' table below), the model has
+# integer lot sizes and setup decisions, and it's solved as a MIP, see pastesian.mip
 # endregion
 
 # region OUTPUT SCHEMA
 output_schema = PanDatFactory(
     production_flow=[['Period ID'], ['Production Quantity', 'Inventory Quantity']],
-    costs=[['Period ID'], ['Production Cost', 'Inventory Cost', 'Total Cost']]
+    costs=[['Period ID'], ['Production Cost', 'Inventory Cost', 'Total Cost']],
+    run_stats=[['Phase', 'Statistic'], ['Value']],
+    solver_status=[['Statistic'], ['Value']],
+    product_flow=[['Product ID', 'Site ID', 'Period ID'], ['Production Quantity', 'Inventory Quantity']],
+    product_costs=[['Product ID', 'Site ID', 'Period ID'], ['Production Cost', 'Inventory Cost', 'Total Cost']],
+    scenario_costs=[['Scenario ID'], ['Production Cost', 'Inventory Cost', 'Backlog Cost', 'Total Cost']],
+    diagnostics=[['Period ID', 'Issue'], ['Amount']]
 )
 # endregion
 
@@ -66,6 +91,94 @@ input_schema.add_foreign_key(native_table='costs', foreign_table='time_periods',
 
 # endregion
 
+# region capacities table
+# Optional table, with rows only for the periods whose capacities differ from the 'Production Capacity' and
+# 'Inventory Capacity' parameters (e.g., maintenance shutdowns). An empty cell falls back to the parameter, and -1
+# means no capacity restriction in that period.
+input_schema.set_data_type(table='capacities', field='Period ID', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=1.0, inclusive_min=True)
+input_schema.set_data_type(table='capacities', field='Production Capacity', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=-1.0, inclusive_min=True, nullable=True)
+input_schema.set_data_type(table='capacities', field='Inventory Capacity', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=-1.0, inclusive_min=True, nullable=True)
+input_schema.add_foreign_key(native_table='capacities', foreign_table='time_periods',
+                             mappings=('Period ID', 'Period ID'))
+input_schema.set_default_value(table='capacities', field='Production Capacity', default_value=None)
+input_schema.set_default_value(table='capacities', field='Inventory Capacity', default_value=None)
+# endregion
+
+# region setups table
+# Optional table, with rows only for the periods whose setup cost or minimum batch size differ from the 'Setup Cost'
+# and 'Minimum Batch Size' parameters. An empty cell falls back to the parameter.
+input_schema.set_data_type(table='setups', field='Period ID', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=1.0, inclusive_min=True)
+input_schema.set_data_type(table='setups', field='Setup Cost', number_allowed=True, strings_allowed=(),
+                           must_be_int=False, min=0.0, inclusive_min=True, nullable=True)
+input_schema.set_data_type(table='setups', field='Minimum Batch Size', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=0.0, inclusive_min=True, nullable=True)
+input_schema.add_foreign_key(native_table='setups', foreign_table='time_periods',
+                             mappings=('Period ID', 'Period ID'))
+input_schema.set_default_value(table='setups', field='Setup Cost', default_value=None)
+input_schema.set_default_value(table='setups', field='Minimum Batch Size', default_value=None)
+# endregion
+
+# region Multi-product tables
+# Optional tables, see pastesian.multi. When 'product_costs' has rows, solve() plans every (product, site) pair that
+# appears in it over its own contiguous range of periods, instead of the single product of 'demand' and 'costs'.
+# The plants of each site share their production and freezer (inventory) capacities among all products: sites without
+# a row in 'sites' (or with an empty cell) fall back to the 'Production Capacity' and 'Inventory Capacity' parameters,
+# and -1 means no capacity restriction. Pairs without a row in 'product_inventory' start and end with no inventory.
+input_schema.set_data_type(table='sites', field='Site ID', number_allowed=True, strings_allowed='*')
+input_schema.set_data_type(table='sites', field='Production Capacity', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=-1.0, inclusive_min=True, nullable=True)
+input_schema.set_data_type(table='sites', field='Inventory Capacity', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=-1.0, inclusive_min=True, nullable=True)
+input_schema.set_default_value(table='sites', field='Production Capacity', default_value=None)
+input_schema.set_default_value(table='sites', field='Inventory Capacity', default_value=None)
+
+for table in ('product_demand', 'product_costs', 'product_inventory'):
+    input_schema.set_data_type(table=table, field='Product ID', number_allowed=True, strings_allowed='*')
+    input_schema.set_data_type(table=table, field='Site ID', number_allowed=True, strings_allowed='*')
+for table in ('product_demand', 'product_costs'):
+    input_schema.set_data_type(table=table, field='Period ID', number_allowed=True, strings_allowed=(),
+                               must_be_int=True, min=1.0, inclusive_min=True)
+    input_schema.add_foreign_key(native_table=table, foreign_table='time_periods',
+                                 mappings=('Period ID', 'Period ID'))
+input_schema.set_data_type(table='product_demand', field='Demand', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=0.0, inclusive_min=True)
+input_schema.set_default_value(table='product_demand', field='Demand', default_value=0)
+input_schema.add_foreign_key(native_table='product_demand', foreign_table='product_costs',
+                             mappings=[('Product ID', 'Product ID'), ('Site ID', 'Site ID'),
+                                       ('Period ID', 'Period ID')])
+input_schema.set_data_type(table='product_costs', field='Production Cost', number_allowed=True, strings_allowed=(),
+                           must_be_int=False, min=0.0, inclusive_min=True)
+input_schema.set_data_type(table='product_costs', field='Inventory Cost', number_allowed=True, strings_allowed=(),
+                           must_be_int=False, min=0.0, inclusive_min=True)
+input_schema.set_data_type(table='product_inventory', field='Starting Inventory', number_allowed=True,
+                           strings_allowed=(), must_be_int=True, min=0.0, inclusive_min=True)
+input_schema.set_data_type(table='product_inventory', field='Ending Inventory', number_allowed=True,
+                           strings_allowed=(), must_be_int=True, min=0.0, inclusive_min=True)
+input_schema.set_default_value(table='product_inventory', field='Starting Inventory', default_value=0)
+input_schema.set_default_value(table='product_inventory', field='Ending Inventory', default_value=0)
+# endregion
+
+# region Demand scenarios
+# Optional tables, only used by pastesian.stochastic.solve_stochastic. Periods of a scenario without a row in
+# 'scenario_demand' have no demand, and scenarios without a row in 'scenarios' have an equal share of the probability
+# left by the others.
+input_schema.set_data_type(table='scenarios', field='Scenario ID', number_allowed=True, strings_allowed='*')
+input_schema.set_data_type(table='scenarios', field='Probability', number_allowed=True, strings_allowed=(),
+                           must_be_int=False, min=0.0, inclusive_min=True, max=1.0, inclusive_max=True)
+input_schema.set_data_type(table='scenario_demand', field='Scenario ID', number_allowed=True, strings_allowed='*')
+input_schema.set_data_type(table='scenario_demand', field='Period ID', number_allowed=True, strings_allowed=(),
+                           must_be_int=True, min=1.0, inclusive_min=True)
+input_schema.set_data_type(table='scenario_demand', field='Demand', number_allowed=True, strings_allowed=(),
+                           must_be_int=False, min=0.0, inclusive_min=True)
+input_schema.set_default_value(table='scenario_demand', field='Demand', default_value=0)
+input_schema.add_foreign_key(native_table='scenario_demand', foreign_table='time_periods',
+                             mappings=('Period ID', 'Period ID'))
+# endregion
+
 # endregion
 
 # region DATA TYPES AND PREDICATES - OUTPUT SCHEMA
@@ -89,11 +202,79 @@ output_schema.set_data_type(table='costs', field='Inventory Cost', number_allowe
                             strings_allowed=(), must_be_int=False, min=0.0, inclusive_min=True)
 output_schema.set_data_type(table='costs', field='Total Cost', number_allowed=True,
                             strings_allowed=(), must_be_int=False, min=0.0, inclusive_min=True)
-output_schema.add_data_row_predicate(table='costs', predicate_name='Total Cost = Production Cost + Inventory Cost',
-                                     predicate=lambda row: abs(row['Total Cost'] - row['Production Cost'] -
-                                                               row['Inventory Cost']) <= 1e-2)
+TOTAL_COST_PREDICATE = 'Total Cost = Production Cost + Inventory Cost'
+TOTAL_COST_TOLERANCE = 1e-2  # rounding tolerance on the 'Total Cost' of a period
+
+
+def total_cost_matches(rows):
+    """
+    Whether the 'Total Cost' of rows of the costs table is its 'Production Cost' plus its 'Inventory Cost', up to
+    TOTAL_COST_TOLERANCE. rows is either a single row, returning a bool, or the whole table, returning a boolean Series
+    (as used by pastesian.integrity).
+    """
+    return abs(rows['Total Cost'] - rows['Production Cost'] - rows['Inventory Cost']) <= TOTAL_COST_TOLERANCE
+
+
+output_schema.add_data_row_predicate(table='costs', predicate_name=TOTAL_COST_PREDICATE, predicate=total_cost_matches)
 
 # endregion
 
+# region run_stats table
+# Optional table, only populated by solve(dat, stats=True), see pastesian.stats
+output_schema.set_data_type(table='run_stats', field='Phase', number_allowed=False, strings_allowed='*')
+output_schema.set_data_type(table='run_stats', field='Statistic', number_allowed=False, strings_allowed='*')
+output_schema.set_data_type(table='run_stats', field='Value', number_allowed=True, strings_allowed='*',
+                            nullable=True)
+# endregion
+
+# region solver_status table
+# Populated by solve(): the 'Engine', its 'Status' and the 'Solve Time (s)' spent building and solving the model
+output_schema.set_data_type(table='solver_status', field='Statistic', number_allowed=False, strings_allowed='*')
+output_schema.set_data_type(table='solver_status', field='Value', number_allowed=True, strings_allowed='*',
+                            nullable=True)
+# endregion
+
+# region Multi-product tables
+# Only populated when the input has multi-product tables, in which case 'production_flow' and 'costs' hold the totals
+# of each period over all products and sites
+for table in ('product_flow', 'product_costs'):
+    output_schema.set_data_type(table=table, field='Product ID', number_allowed=True, strings_allowed='*')
+    output_schema.set_data_type(table=table, field='Site ID', number_allowed=True, strings_allowed='*')
+    output_schema.set_data_type(table=table, field='Period ID', number_allowed=True, strings_allowed=(),
+                                must_be_int=True, min=1.0, inclusive_min=True)
+for field in ('Production Quantity', 'Inventory Quantity'):
+    output_schema.set_data_type(table='product_flow', field=field, number_allowed=True, strings_allowed=(),
+                                must_be_int=False, min=0.0, inclusive_min=True)
+for field in ('Production Cost', 'Inventory Cost', 'Total Cost'):
+    output_schema.set_data_type(table='product_costs', field=field, number_allowed=True, strings_allowed=(),
+                                must_be_int=False, min=0.0, inclusive_min=True)
+# endregion
+
+# region scenario_costs table
+# Only populated by pastesian.stochastic.solve_stochastic, with the cost of the plan in each demand scenario
+output_schema.set_data_type(table='scenario_costs', field='Scenario ID', number_allowed=True, strings_allowed='*')
+for field in ('Production Cost', 'Inventory Cost', 'Backlog Cost', 'Total Cost'):
+    output_schema.set_data_type(table='scenario_costs', field=field, number_allowed=True, strings_allowed=(),
+                                must_be_int=False, min=0.0, inclusive_min=True)
+# endregion
+
+# region diagnostics table
+# Only populated when solve() finds the model infeasible before optimizing, see pastesian.feasibility
+output_schema.set_data_type(table='diagnostics', field='Period ID', number_allowed=True, strings_allowed=(),
+                            must_be_int=True, min=1.0, inclusive_min=True)
+output_schema.set_data_type(table='diagnostics', field='Issue', number_allowed=False,
+                            strings_allowed=('Production Shortfall', 'Inventory Overflow', 'Lasagnas To Be Left'))
+output_schema.set_data_type(table='diagnostics', field='Amount', number_allowed=True, strings_allowed=(),
+                            must_be_int=False, min=0.0, inclusive_min=False)
+# endregion
+
+# endregion
 
+# region OPTIONAL TABLES
+# Input tables that single-product data sets may leave out, which the ticdat readers would list as missing (see
+# pastesian.utils.quiet_optional_tables), and output tables that are empty unless some mode fills them, which the
+# command line doesn't write when empty (see pastesian.utils.without_empty_optional_tables)
+OPTIONAL_INPUT_TABLES = ('capacities', 'setups', 'sites', 'product_demand', 'product_costs', 'product_inventory',
+                         'scenarios', 'scenario_demand')
+OPTIONAL_OUTPUT_TABLES = ('run_stats', 'product_flow', 'product_costs', 'scenario_costs', 'diagnostics')
 # endregion
@@ -0,0 +1,287 @@
+"""
+Long-running HTTP/JSON solve service, started from the command line with:
+
+>> python -m pastesian serve --host 127.0.0.1 --port 8000 --workers 4 --timeout 60 --max-queue 16
+
+The server keeps a pool of worker processes that imported pastesian (pandas, pulp, ticdat, ...) and built the schemas
+when the server started, so requests don't pay for it. Endpoints:
+
+- POST /solve: the body is a data set in the input_schema JSON format (as written by input_schema.json.write_file), and
+  the response is the solution in the output_schema JSON format. The 'engine', 'window' and 'overlap' arguments of
+  solve() may be given in the query string, e.g., /solve?engine=flow.
+- GET /health: {"status": "ok", "workers": ...}.
+- GET /metrics: request counters and latencies, as JSON.
+
+At most 'workers' requests are solved at once and at most 'max_queue' more wait for a worker; beyond that, requests are
+rejected right away with 503. A request that takes longer than 'timeout' seconds gets 504, but its worker can't be
+interrupted, so it keeps its slot until the solve is over. Bad data sets get 400. When a worker process dies (e.g.,
+killed for running out of memory), the requests it breaks get 500 and the pool is started again.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+SOLVE_ARGUMENTS = {'engine': str, 'window': int, 'overlap': int}
+
+
+def _warm_up():
+    """
+    Worker initializer: import everything a solve needs, so that the first request doesn't pay for it.
+    """
+    import pastesian.main  # noqa: F401, it imports pandas, pulp and ticdat, and builds the schemas
+
+
+def _ping():
+    return os.getpid()
+
+
+def _solve_json(payload, solve_kwargs):
+    """
+    Worker function: solve a data set in the input_schema JSON format.
+
+    Returns
+    -------
+    status : int
+        The HTTP status of the response, 200 or 400.
+    body : str
+        The solution in the output_schema JSON format, or a JSON error message.
+    """
+    from pastesian import input_schema, output_schema, solve
+    from pastesian.utils import quiet_optional_tables
+    try:
+        with quiet_optional_tables():
+            dat = input_schema.json.create_pan_dat(payload)
+        sln = solve(dat, **solve_kwargs)
+    except Exception as e:  # ticdat parsing errors, 'Period ID' checks, ...
+        return 400, json.dumps({'error': f'{type(e).__name__}: {e}'})
+    return 200, output_schema.json.write_file(sln, '')
+
+
+class SolveServer:
+    """
+    The solve service, see the module docstring.
+
+    Parameters
+    ----------
+    host : str, optional
+        Host to bind to, default='127.0.0.1'.
+    port : int, optional
+        Port to bind to, default=8000. With 0, a free port is chosen, see the url attribute.
+    workers : int, optional
+        Number of worker processes, i.e., of requests solved at once, defaults to os.cpu_count().
+    max_queue : int, optional
+        Number of requests that may wait for a worker, default=16.
+    timeout : float, optional
+        Seconds a request may take, from its arrival, default=60.
+
+    Attributes
+    ----------
+    url : str
+        The base URL of the server, e.g., 'http://127.0.0.1:8000'.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8000, workers=None, max_queue=16, timeout=60.0):
+        self.workers = workers or os.cpu_count()
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.workers + max_queue)
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._metrics = dict.fromkeys(['requests', 'succeeded', 'failed', 'rejected', 'timed_out', 'in_flight'], 0)
+        self._latencies = []
+        self._started = time.time()
+        self._pool = None
+        self._thread = None
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self.url = f'http://{host}:{self._httpd.server_address[1]}'
+
+    # region Life cycle
+    def _start_pool(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_up)
+        # one task per worker, so that all of them are started (and warmed up) now rather than on demand
+        for future in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def _restart_pool(self, broken):
+        """
+        Start the worker pool again, unless another request already replaced the broken one.
+        """
+        with self._pool_lock:
+            if self._pool is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._start_pool()
+
+    def _submit(self, payload, solve_kwargs):
+        """
+        Submit a request to the worker pool, started again first if it's broken. Returns the pool and the future.
+        """
+        pool = self._pool
+        try:
+            return pool, pool.submit(_solve_json, payload, solve_kwargs)
+        except BrokenProcessPool:  # some worker died since the last request
+            self._restart_pool(pool)
+            pool = self._pool
+            return pool, pool.submit(_solve_json, payload, solve_kwargs)
+
+    def serve_forever(self):
+        """
+        Start the worker pool and serve requests until stop() is called from another thread (or KeyboardInterrupt).
+        """
+        self._start_pool()
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def start(self):
+        """
+        Start the worker pool and serve requests in a background thread. Returns once the server is ready.
+        """
+        self._start_pool()
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests and shut the worker pool down.
+        """
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+    # endregion
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._metrics[name] += amount
+
+    def metrics(self):
+        """
+        Return the request counters and latencies (in seconds, of the succeeded and failed requests) as a dictionary.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies)
+            metrics = dict(self._metrics)
+        metrics.update(workers=self.workers, max_queue=self.max_queue, uptime=time.time() - self._started,
+                       latency_mean=sum(latencies) / len(latencies) if latencies else None,
+                       latency_p95=latencies[int(0.95 * (len(latencies) - 1))] if latencies else None)
+        return metrics
+
+    def solve(self, payload, solve_kwargs):
+        """
+        Solve a request in the worker pool, honoring the concurrency limit and the timeout.
+
+        Returns
+        -------
+        status : int
+            The HTTP status of the response.
+        body : str
+            The JSON body of the response.
+        """
+        self._count('requests')
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            return 503, json.dumps({'error': 'The server is busy, try again later'})
+        start = time.perf_counter()
+        self._count('in_flight')
+
+        def release(_=None):
+            self._count('in_flight', -1)
+            self._slots.release()
+        try:
+            pool, future = self._submit(payload, solve_kwargs)
+        except Exception as e:  # the pool couldn't be started again
+            release()
+            status, body = 500, json.dumps({'error': f'{type(e).__name__}: {e}'})
+        else:
+            future.add_done_callback(release)  # only when the worker is done, even after a timeout
+            try:
+                status, body = future.result(timeout=self.timeout)
+            except TimeoutError:
+                self._count('timed_out')
+                return 504, json.dumps({'error': f'The solve took longer than {self.timeout} seconds'})
+            except BrokenProcessPool as e:  # the worker died, e.g., killed for running out of memory
+                self._restart_pool(pool)
+                status, body = 500, json.dumps({'error': f'{type(e).__name__}: {e}'})
+            except Exception as e:  # e.g., a result that can't be unpickled
+                status, body = 500, json.dumps({'error': f'{type(e).__name__}: {e}'})
+        self._count('succeeded' if status == 200 else 'failed')
+        with self._lock:
+            self._latencies.append(time.perf_counter() - start)
+            del self._latencies[:-1000]  # keep the latest ones only
+        return status, body
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self, status, body):
+                data = body.encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                if path == '/health':
+                    self._respond(200, json.dumps({'status': 'ok', 'workers': server.workers}))
+                elif path == '/metrics':
+                    self._respond(200, json.dumps(server.metrics()))
+                else:
+                    self._respond(404, json.dumps({'error': f'Unknown path {path}'}))
+
+            def do_POST(self):
+                url = urlsplit(self.path)
+                if url.path != '/solve':
+                    self._respond(404, json.dumps({'error': f'Unknown path {url.path}'}))
+                    return
+                try:
+                    solve_kwargs = {name: SOLVE_ARGUMENTS[name](values[-1])
+                                    for name, values in parse_qs(url.query).items()}
+                except (KeyError, ValueError) as e:
+                    self._respond(400, json.dumps({'error': f'Invalid query string argument: {e}'}))
+                    return
+                payload = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+                self._respond(*server.solve(payload, solve_kwargs))
+
+            def log_message(self, format, *args):
+                pass  # the metrics endpoint replaces the access log
+
+        return Handler
+
+
+def main(argv=None):
+    """
+    Command-line entry point of `python -m pastesian serve`, see the module docstring.
+    """
+    parser = argparse.ArgumentParser(prog='python -m pastesian serve', description='Serve pastesian over HTTP/JSON.')
+    parser.add_argument('--host', default='127.0.0.1', help='host to bind to, default=127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000, help='port to bind to, default=8000')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes, defaults to the CPU count')
+    parser.add_argument('--max-queue', type=int, default=16, help='requests that may wait for a worker, default=16')
+    parser.add_argument('--timeout', type=float, default=60.0, help='seconds a request may take, default=60')
+    args = parser.parse_args(argv)
+
+    server = SolveServer(args.host, args.port, args.workers, args.max_queue, args.timeout)
+    print(f'Serving pastesian on {server.url} with {server.workers} workers')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
@@ -0,0 +1,174 @@
+"""
+Opt-in instrumentation of solve(): wall and CPU time of each phase, peak memory, model size and solver statistics.
+
+solve(dat, stats=True) adds them to the 'run_stats' output table, and every callback passed to solve() or registered
+with add_callback receives the RunStats object of each call, e.g., to forward it to a metrics system. When neither is
+used nothing is measured, so solve() pays nothing for it.
+"""
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+import pandas as pd
+
+PHASES = ('validation', 'parameters', 'presolve', 'build', 'solve', 'output')
+_callbacks = []
+
+
+def add_callback(callback):
+    """
+    Register a callback that receives the RunStats object of every solve() call, until removed.
+
+    Parameters
+    ----------
+    callback : callable
+        A function of a single argument, the RunStats object.
+
+    Returns
+    -------
+    None
+    """
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    """
+    Remove a callback registered with add_callback.
+
+    Raises
+    ------
+    ValueError
+        When callback is not registered.
+    """
+    _callbacks.remove(callback)
+
+
+def registered_callbacks():
+    """
+    Return the list of callbacks registered with add_callback.
+    """
+    return list(_callbacks)
+
+
+class RunStats:
+    """
+    Statistics of one solve() call, as (phase, statistic, value) records.
+
+    Times are measured with time.perf_counter (wall) and time.process_time (CPU), and the peak memory with tracemalloc,
+    which is started for the call if it's not tracing already (and slows allocations down while it runs). A phase that
+    is entered more than once adds up its times and keeps the largest peak. Used as a context manager, it calls start()
+    and stop(), so that tracemalloc is stopped even when the call raises.
+
+    Parameters
+    ----------
+    trace_memory : bool, optional
+        Whether to measure the peak memory, default=True. Without it, no 'Peak Memory (MB)' is recorded and the times
+        are not inflated by tracemalloc.
+
+    Attributes
+    ----------
+    records : dict
+        A dictionary structured as {(phase, statistic): value}, in insertion order.
+    """
+    statistics = ('Wall Time (s)', 'CPU Time (s)', 'Peak Memory (MB)')
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.records = {}
+        self._start = None
+        self._stop_tracing = False
+
+    def start(self):
+        """
+        Start measuring the whole call, reported as the 'total' phase.
+        """
+        self._stop_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if self._stop_tracing:
+            tracemalloc.start()
+        self._start = time.perf_counter(), time.process_time()
+
+    def stop(self):
+        """
+        Stop measuring the whole call, started with start().
+        """
+        wall, cpu = self._start
+        peaks = [value for (phase, statistic), value in self.records.items() if statistic == 'Peak Memory (MB)']
+        peak = max(peaks) if peaks else None
+        self._add('total', time.perf_counter() - wall, time.process_time() - cpu, peak)
+        if self._stop_tracing:
+            tracemalloc.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager that measures the wall time, CPU time and peak memory of the code it wraps.
+
+        Parameters
+        ----------
+        name : str
+            The phase name, usually one of PHASES.
+        """
+        trace = self.trace_memory and tracemalloc.is_tracing()
+        if trace and hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+, otherwise it's the peak since the call started
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20 if trace else None
+            self._add(name, time.perf_counter() - wall, time.process_time() - cpu, peak)
+
+    def _add(self, name, wall, cpu, peak):
+        wall_key, cpu_key, peak_key = ((name, statistic) for statistic in self.statistics)
+        self.records[wall_key] = self.records.get(wall_key, 0.0) + wall
+        self.records[cpu_key] = self.records.get(cpu_key, 0.0) + cpu
+        if peak is not None:
+            self.records[peak_key] = max(self.records.get(peak_key, 0.0), peak)
+
+    def record(self, phase, statistic, value):
+        """
+        Record any other statistic of a phase, e.g., record('solve', 'Iterations', 12).
+        """
+        self.records[phase, statistic] = value
+
+    def seconds(self, statistic='Wall Time (s)'):
+        """
+        Return a dictionary structured as {phase: seconds}, for the wall (default) or CPU time statistic.
+        """
+        return {phase: value for (phase, s), value in self.records.items() if s == statistic}
+
+    def table(self):
+        """
+        Return the records as a DataFrame with the 'Phase', 'Statistic' and 'Value' columns of the run_stats table.
+        """
+        return pd.DataFrame([[phase, statistic, value] for (phase, statistic), value in self.records.items()],
+                            columns=['Phase', 'Statistic', 'Value'])
+
+
+class _NoStats:
+    """
+    Stand-in for RunStats when nothing is measured, so that the instrumented code doesn't need to check.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    @staticmethod
+    def phase(name):
+        return nullcontext()
+
+    @staticmethod
+    def record(phase, statistic, value):
+        pass
+
+
+NO_STATS = _NoStats()
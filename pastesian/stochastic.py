@@ -0,0 +1,253 @@
+"""
+Two-stage stochastic mode: a single production plan against many demand scenarios, see solve_stochastic.
+
+The production quantities x are decided here and now, before the demand is known, and every scenario w has its own
+recourse: the inventory s and the backlog b (demand met late, at the 'Backlog Cost' per lasagna and period) with
+s[i] - b[i] == s[i-1] - b[i-1] + x[i] - d[i, w]. 'Lasagnas To Be Left' is demand of the last period, i.e., it's backlog
+when missed. The expected cost of the plan is its production cost plus the expected inventory and backlog costs.
+
+Rather than building the extensive form (one copy of the recourse variables and rows per scenario), the problem is
+solved by an L-shaped decomposition in the cumulative production X[i] = x[1] + ... + x[i]. Given X, the net inventory
+of every scenario is start + X[i] - D[i, w] (D being the cumulative demand), so the optimal recourse is known in closed
+form and the expected recourse cost is a sum of convex piecewise linear functions Q[i](X[i]), one per period. Scenario
+subproblems are thus evaluated with vectorized NumPy operations, chunk by chunk in a pool of threads (NumPy releases
+the GIL), and every iteration adds one optimality cut per period to a small master LP in (X, theta), solved with HiGHS.
+The master has 2n variables whatever the number of scenarios, and memory grows with scenarios x periods only through
+the cumulative demand matrix.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from pastesian import input_schema, output_schema
+from pastesian.main import create_capacity_parameters
+from pastesian.matrix import LINPROG_STATUS, sparse, linprog
+from pastesian.utils import check_each_period_id_column
+
+
+def create_scenario_parameters(dat):
+    """
+    Reads the demand scenarios from PanDat object.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with the input_schema and contains the input data, with rows in the
+        'scenario_demand' table.
+
+    Returns
+    -------
+    scenarios : pandas.Index
+        The 'Scenario ID' values.
+    probability : numpy.ndarray
+        The probability of each scenario.
+    demand : numpy.ndarray
+        Array of shape (len(scenarios), n) with the demand of each scenario and period, n being the number of rows of
+        the 'costs' table.
+
+    Raises
+    ------
+    ValueError
+        When 'scenario_demand' has no rows or periods beyond the 'costs' table, when 'scenarios' has scenarios that are
+        not in 'scenario_demand', or when the probabilities don't add up to 1.
+    """
+    n = len(dat.costs)
+    table = dat.scenario_demand
+    if not len(table):
+        raise ValueError('The scenario_demand table must have rows in the stochastic mode')
+    scenarios = pd.Index(pd.unique(table['Scenario ID']))
+    periods = table['Period ID'].to_numpy(dtype=np.int64)
+    if periods.max() > n:
+        raise ValueError(f'The following indexes exist in scenario_demand["Period ID"] but not in costs["Period ID"]: '
+                         f'{set(np.unique(periods[periods > n])[:10].tolist())}')
+    demand = np.zeros((len(scenarios), n))
+    demand[scenarios.get_indexer(table['Scenario ID']), periods - 1] = table['Demand'].to_numpy(dtype=float)
+
+    probability = np.full(len(scenarios), np.nan)
+    if len(dat.scenarios):
+        codes = scenarios.get_indexer(dat.scenarios['Scenario ID'])
+        if (codes < 0).any():
+            raise ValueError(f'The following scenarios exist in scenarios but not in scenario_demand: '
+                             f'{set(dat.scenarios["Scenario ID"][codes < 0][:10].tolist())}')
+        probability[codes] = dat.scenarios['Probability'].to_numpy(dtype=float)
+    given = ~np.isnan(probability)
+    left = 1 - probability[given].sum()
+    if left < -1e-9 or (given.all() and left > 1e-9):
+        raise ValueError(f'The scenario probabilities must add up to 1, not {1 - left}')
+    if not given.all():
+        probability[~given] = max(left, 0) / (~given).sum()
+    return scenarios, probability, demand
+
+
+def _recourse(net, probability, inventory_cost, backlog_cost):
+    """
+    Expected recourse cost of each period and its subgradient with respect to the cumulative production, for a chunk
+    of scenarios whose net inventories are the rows of net.
+    """
+    stock = np.maximum(net, 0)
+    backlog = np.maximum(-net, 0)
+    cost = probability @ (stock * inventory_cost + backlog * backlog_cost)
+    gradient = probability @ np.where(net > 0, inventory_cost, -backlog_cost)
+    return cost, gradient
+
+
+def solve_stochastic(dat, workers=None, rel_gap=1e-6, max_iterations=1000, chunk_size=256):
+    """
+    Solve the two-stage stochastic pastesian model over the demand scenarios of dat, see the module docstring.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with the input_schema and contains the input data. The 'costs' table (and
+        'capacities' and the parameters) are used as in solve(), and the demand comes from the 'scenario_demand' and
+        'scenarios' tables; the 'demand' table may be left empty.
+    workers : int, optional
+        Number of threads evaluating the scenario subproblems, defaults to os.cpu_count().
+    rel_gap : float, optional
+        The decomposition stops once the gap between the expected cost of the best plan found and the lower bound of the
+        master problem is below rel_gap times the former, default=1e-6.
+    max_iterations : int, optional
+        Maximum number of master problems solved, default=1000.
+    chunk_size : int, optional
+        Number of scenarios evaluated together by a thread, default=256.
+
+    Returns
+    -------
+    sln : PanDat
+        A PanDat object compatible with the output schema. 'production_flow' has the production plan and the expected
+        inventory of each period, 'costs' the production cost and the expected inventory cost, and 'scenario_costs' the
+        cost of the plan in each scenario, including its backlog. The 'solver_status' table has the 'Status' (the other
+        tables are empty unless it's 'Optimal', or 'Not Solved' when max_iterations is reached first, in which case
+        they have the best plan found), the 'Solve Time (s)', the 'Iterations', and the 'Lower Bound' and
+        'Expected Cost' of the decomposition.
+
+    Raises
+    ------
+    ValueError
+        The same cases as solve() for the 'Period ID' columns, and those of create_scenario_parameters.
+    """
+    if sparse is None:
+        raise ImportError('The stochastic mode requires scipy, which can be installed with `pip install scipy`')
+    check_each_period_id_column(dat)
+    start_time = time.perf_counter()
+
+    # region Parameters, ordered by 'Period ID'
+    n = len(dat.costs)
+    I = list(range(1, n + 1))
+    parameters = input_schema.create_full_parameters_dict(dat)
+    pcap, icap = create_capacity_parameters(dat, I, parameters)
+    costs = dat.costs.sort_values('Period ID')
+    production_cost = costs['Production Cost'].to_numpy(dtype=float)
+    inventory_cost = costs['Inventory Cost'].to_numpy(dtype=float)
+    backlog_cost = float(parameters['Backlog Cost'])
+    start = parameters['Lasagnas To Start']
+    left = parameters['Lasagnas To Be Left']
+    scenarios, probability, demand = create_scenario_parameters(dat)
+    demand[:, -1] += left
+    cum_demand = np.cumsum(demand, axis=1)
+    # endregion
+
+    # region Master problem in [X[1], ..., X[n], theta[1], ..., theta[n]]: production cost plus the sum of theta, with
+    # 0 <= X[i] - X[i-1] <= production capacity of i, and X[i] bounded by the inventory capacity of i in the scenario
+    # of least cumulative demand, since the inventory can't be backlogged away
+    c = np.concatenate([production_cost - np.append(production_cost[1:], 0), np.ones(n)])
+    rows = np.arange(n)
+    increments = sparse.csr_matrix((np.concatenate([np.ones(n), -np.ones(n - 1)]),
+                                    (np.concatenate([rows, rows[1:]]), np.concatenate([rows, rows[:-1]]))),
+                                   shape=(n, 2 * n))
+    production_capacity = np.array([pcap.get(i, np.inf) for i in I])
+    A_base = sparse.vstack([increments, -increments], format='csr')
+    b_base = np.concatenate([production_capacity, np.zeros(n)])
+    finite = np.isfinite(production_capacity)
+    A_base = A_base[np.concatenate([finite, np.ones(n, dtype=bool)])]
+    b_base = b_base[np.concatenate([finite, np.ones(n, dtype=bool)])]
+    bounds = np.zeros((2 * n, 2))
+    bounds[:n, 1] = [icap.get(i, np.inf) for i in I]
+    bounds[:n, 1] += cum_demand.min(axis=0) - start
+    bounds[n - 1, 1] -= left  # 'Lasagnas To Be Left' is stored too
+    bounds[n:, 1] = np.inf  # theta[i] >= 0, since the recourse costs are non-negative
+    # endregion
+
+    # region L-shaped iterations
+    constant = inventory_cost[-1] * left  # cost of storing 'Lasagnas To Be Left', which is left out of the recourse
+    chunks = [slice(k, k + chunk_size) for k in range(0, len(scenarios), chunk_size)]
+
+    def evaluate(X):
+        def chunk_recourse(chunk):
+            return _recourse(start + X - cum_demand[chunk], probability[chunk], inventory_cost, backlog_cost)
+        results = list(pool.map(chunk_recourse, chunks))
+        return sum(r[0] for r in results), sum(r[1] for r in results)
+
+    cut_rows, cut_rhs = [], []
+    best_X, best_cost, lower_bound = None, np.inf, -np.inf
+    status = 'Not Solved'
+    iterations = 0
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        while iterations < max_iterations:
+            iterations += 1
+            A_ub = sparse.vstack([A_base] + cut_rows, format='csr') if cut_rows else A_base
+            b_ub = np.concatenate([b_base] + cut_rhs) if cut_rhs else b_base
+            res = linprog(c, A_ub=A_ub, b_ub=b_ub, bounds=bounds, method='highs')
+            if res.status != 0:
+                status = LINPROG_STATUS.get(res.status, 'Undefined')
+                break
+            X = res.x[:n]
+            lower_bound = max(lower_bound, res.fun + constant)
+            recourse, gradient = evaluate(X)
+            cost = c[:n] @ X + recourse.sum() + constant
+            if cost < best_cost:
+                best_X, best_cost = X, cost
+            if best_cost - lower_bound <= rel_gap * max(1.0, abs(best_cost)):
+                status = 'Optimal'
+                break
+            # one cut per period: theta[i] >= recourse[i] + gradient[i] * (X[i] - X_hat[i])
+            cut_rows.append(sparse.csr_matrix((np.concatenate([gradient, -np.ones(n)]),
+                                               (np.concatenate([rows, rows]), np.concatenate([rows, n + rows]))),
+                                              shape=(n, 2 * n)))
+            cut_rhs.append(gradient * X - recourse)
+    # endregion
+
+    solve_time = time.perf_counter() - start_time
+    sln = output_schema.PanDat()
+    if best_X is not None:
+        populate_stochastic_output(sln, best_X, scenarios, probability, cum_demand, start, left, production_cost,
+                                   inventory_cost, backlog_cost)
+    sln.solver_status = pd.DataFrame({'Statistic': ['Engine', 'Status', 'Solve Time (s)', 'Iterations', 'Lower Bound',
+                                                    'Expected Cost'],
+                                      'Value': ['l-shaped', status, solve_time, iterations, float(lower_bound),
+                                                float(best_cost) if best_X is not None else None]})
+    return sln
+
+
+def populate_stochastic_output(sln, X, scenarios, probability, cum_demand, start, left, production_cost,
+                               inventory_cost, backlog_cost):
+    """
+    Fill the output tables of solve_stochastic with the plan given by the cumulative production X.
+    """
+    n = len(X)
+    X = np.maximum.accumulate(np.maximum(X, 0))  # rounding errors only
+    production = np.diff(X, prepend=0)
+    net = start + X - cum_demand
+    stock = np.maximum(net, 0)
+    stock[:, -1] += left  # 'Lasagnas To Be Left' is stored, even though it was handled as demand
+    backlog = np.maximum(-net, 0)
+
+    periods = np.arange(1, n + 1)
+    expected_stock = probability @ stock
+    sln.production_flow = pd.DataFrame({'Period ID': periods, 'Production Quantity': production,
+                                        'Inventory Quantity': expected_stock})
+    production_costs = production * production_cost
+    inventory_costs = expected_stock * inventory_cost
+    sln.costs = pd.DataFrame({'Period ID': periods, 'Production Cost': np.round(production_costs, 2),
+                              'Inventory Cost': np.round(inventory_costs, 2),
+                              'Total Cost': np.round(production_costs + inventory_costs, 2)})
+    scenario_inventory = stock @ inventory_cost
+    scenario_backlog = backlog.sum(axis=1) * backlog_cost
+    total_production = production_costs.sum()
+    sln.scenario_costs = pd.DataFrame({'Scenario ID': scenarios,
+                                       'Production Cost': np.round(total_production, 2),
+                                       'Inventory Cost': np.round(scenario_inventory, 2),
+                                       'Backlog Cost': np.round(scenario_backlog, 2),
+                                       'Total Cost': np.round(total_production + scenario_inventory +
+                                                              scenario_backlog, 2)})
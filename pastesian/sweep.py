@@ -0,0 +1,127 @@
+"""
+Parametric demand sweep: the optimal plan and cost of the pastesian model for many demand multipliers at once.
+
+Scaling every demand by a multiplier t only moves the right-hand side of the flow balance rows along a line, so the
+optimal cost f(t) is convex and piecewise linear in t, and between two breakpoints the optimal plans are the linear
+interpolation of the plans at the breakpoints. sweep_demand exploits this: it solves the smallest and largest
+multipliers, then a multiplier in between; when its cost lies on the chord of the other two, convexity guarantees that
+f is linear over the whole interval and every multiplier inside it is interpolated instead of solved. Otherwise both
+halves are handled the same way. The multipliers with a feasible model also form an interval, so an interval with
+infeasible ends is skipped altogether once a feasible multiplier outside it is known. The data is validated and turned
+into optimization parameters only once.
+"""
+import numpy as np
+import pandas as pd
+from pastesian import input_schema
+from pastesian.engines import ENGINES, optimize
+from pastesian.main import create_optimization_parameters, create_capacity_parameters
+from pastesian.mip import create_setup_parameters, has_setups
+from pastesian.multi import is_multi_product
+from pastesian.utils import check_each_period_id_column
+
+SWEEP_COLUMNS = ['Multiplier', 'Period ID', 'Production Quantity', 'Inventory Quantity', 'Total Cost', 'Status']
+
+
+def sweep_demand(dat, multipliers, engine='flow', rel_tol=1e-7):
+    """
+    Solve the pastesian model with demand scaled by each multiplier, as action_update_demand does with a single one.
+
+    Unlike action_update_demand, the scaled demand is not rounded, so that the cost stays piecewise linear in the
+    multiplier. Multipliers whose model is not optimal (e.g., demand beyond the production capacity) have their solver
+    'Status' in the result, and missing quantities and costs, as solve() reports them in its 'solver_status' table.
+
+    Parameters
+    ----------
+    dat : PanDat
+        PanDat object which is compatible with the input_schema and contains the input data.
+    multipliers : iterable
+        The demand multipliers, non-negative numbers. Duplicates are solved once.
+    engine : str, optional
+        The engine used for the solves that can't be interpolated, see solve(). Default is 'flow', the fastest one.
+    rel_tol : float, optional
+        Relative tolerance used to decide whether a cost lies on a chord, default=1e-7.
+
+    Returns
+    -------
+    sweep : pandas.DataFrame
+        A long-format table with the SWEEP_COLUMNS, one row per multiplier and period, ordered by 'Multiplier' and then
+        'Period ID'. 'Total Cost' is the cost of the period, as in the 'costs' output table but not rounded, so the cost
+        curve is sweep.groupby('Multiplier')['Total Cost'].sum(min_count=1), which is NaN where the 'Status' (following
+        pulp.LpStatus names) is not 'Optimal'.
+
+    Raises
+    ------
+    ValueError
+        The same cases as solve(), when some multiplier is negative, and when dat has multiple products or setups, whose
+        costs are not piecewise linear in the multiplier.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"engine must be one of {', '.join(map(repr, ENGINES))}, not {engine!r}")
+    multipliers = np.unique(np.asarray(list(multipliers), dtype=float))
+    if (multipliers < 0).any():
+        raise ValueError(f'multipliers must be non-negative, not {multipliers[multipliers < 0].tolist()}')
+    check_each_period_id_column(dat)
+    if is_multi_product(dat):
+        raise ValueError('sweep_demand is not supported with multi-product data sets')
+    d, pc, ic, I = create_optimization_parameters(dat)
+    parameters = input_schema.create_full_parameters_dict(dat)
+    pcap, icap = create_capacity_parameters(dat, I, parameters)
+    if has_setups(*create_setup_parameters(dat, I, parameters)):
+        raise ValueError('sweep_demand is not supported with setup costs or minimum batch sizes')
+    n = len(I)
+    periods = np.arange(1, n + 1)
+    unit_costs = np.concatenate([np.fromiter((pc[i] for i in periods), dtype=float, count=n),
+                                 np.fromiter((ic[i] for i in periods), dtype=float, count=n)])
+
+    plans = [None] * len(multipliers)  # optimal [x[1], ..., x[n], s[1], ..., s[n]] of each multiplier, or None
+    statuses = [None] * len(multipliers)
+
+    def solve_at(k):
+        t = multipliers[k]
+        x_sol, s_sol, statuses[k] = optimize({i: t * d[i] for i in I}, pc, ic, I, parameters, pcap, icap, engine)
+        if statuses[k] == 'Optimal':
+            plan = np.empty(2 * n)
+            for i, value in x_sol:
+                plan[i - 1] = value
+            for i, value in s_sol:
+                plan[n + i - 1] = value
+            plans[k] = plan
+
+    # region Bisection over the sorted multipliers, with an explicit stack of (lo, hi) intervals already solved at both
+    # ends and not solved strictly inside
+    if len(multipliers):
+        solve_at(0)
+        solve_at(len(multipliers) - 1)
+    stack = [(0, len(multipliers) - 1)]
+    while stack:
+        lo, hi = stack.pop()
+        if hi - lo <= 1:
+            continue
+        if plans[lo] is None and plans[hi] is None and any(plan is not None for plan in plans):
+            statuses[lo + 1:hi] = [statuses[hi]] * (hi - lo - 1)
+            continue
+        mid = (lo + hi) // 2
+        solve_at(mid)
+        if plans[lo] is not None and plans[mid] is not None and plans[hi] is not None:
+            t_lo, t_mid, t_hi = multipliers[[lo, mid, hi]]
+            cost_lo, cost_mid, cost_hi = (unit_costs @ plans[k] for k in (lo, mid, hi))
+            chord = cost_lo + (cost_hi - cost_lo) * (t_mid - t_lo) / (t_hi - t_lo)
+            if abs(cost_mid - chord) <= rel_tol * max(1.0, abs(chord)):
+                for k in range(lo + 1, hi):
+                    if k != mid:
+                        weight = (multipliers[k] - t_lo) / (t_hi - t_lo)
+                        plans[k] = (1 - weight) * plans[lo] + weight * plans[hi]
+                        statuses[k] = 'Optimal'
+                continue
+        stack.append((lo, mid))
+        stack.append((mid, hi))
+    # endregion
+
+    plans = np.vstack([np.full(2 * n, np.nan) if plan is None else plan for plan in plans]) if len(plans) else \
+        np.empty((0, 2 * n))
+    return pd.DataFrame({'Multiplier': np.repeat(multipliers, n),
+                         'Period ID': np.tile(periods, len(multipliers)),
+                         'Production Quantity': plans[:, :n].ravel(),
+                         'Inventory Quantity': plans[:, n:].ravel(),
+                         'Total Cost': (plans[:, :n] * unit_costs[:n] + plans[:, n:] * unit_costs[n:]).ravel(),
+                         'Status': np.repeat(np.array(statuses, dtype=object), n)})
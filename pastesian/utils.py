@@ -1,10 +1,122 @@
-from pastesian import input_schema
+import io
+from contextlib import contextmanager, redirect_stdout
+import numpy as np
+import pandas as pd
+from ticdat import PanDatFactory
+from pastesian import input_schema, output_schema
+from pastesian.schemas import OPTIONAL_INPUT_TABLES, OPTIONAL_OUTPUT_TABLES
+
+MAX_REPORTED_VALUES = 10  # maximum number of offending values/rows listed per issue in the error messages
+PARTIAL_PERIOD_TABLES = ('capacities', 'setups')  # tables that may have rows for only some of the periods
+MULTI_PRODUCT_TABLES = ('product_demand', 'product_costs')  # tables with one row per (product, site, period)
+SCENARIO_TABLES = ('scenario_demand',)  # tables with one row per (scenario, period)
+
+
+def _listed(values):
+    """
+    Format offending values or row labels for an error message, truncated to MAX_REPORTED_VALUES items.
+    """
+    values = list(values)
+    text = ', '.join(str(v) for v in values[:MAX_REPORTED_VALUES])
+    if len(values) > MAX_REPORTED_VALUES:
+        text += f', ... ({len(values)} in total)'
+    return text
+
+
+def find_period_id_failures(dat):
+    """
+    Find every problem with the 'Period ID' columns of dat object, in a single pass over each column.
+
+    Each 'Period ID' column must contain integer numbers from 1 to the number of rows in the corresponding table,
+    without any gap (but not necessarily ordered), and the 'demand' and 'costs' tables must have the same 'Period ID'
+    values. Tables in PARTIAL_PERIOD_TABLES only need integer, non-duplicated 'Period ID' values, and tables in
+    MULTI_PRODUCT_TABLES only need integer 'Period ID' values, not duplicated within a (product, site) pair, as do
+    tables in SCENARIO_TABLES within a scenario.
+
+    Parameters
+    ----------
+    dat : PanDat
+        A PanDat object containing the input data, accordingly to the input_schema.
+
+    Returns
+    -------
+    failures : list
+        A list of human-readable messages, one per problem found, naming the table, field and offending rows or values.
+        It's empty when all 'Period ID' columns are valid.
+    """
+    field_name = 'Period ID'
+    failures = []
+    valid_columns = {}
+    for table_name in sorted(input_schema.all_tables):
+        table = getattr(dat, table_name)
+        if field_name not in table.columns:
+            continue
+        column = table[field_name]
+        if column.empty:
+            valid_columns[table_name] = 0
+            continue
+
+        # Check for integer values
+        if pd.api.types.infer_dtype(column, skipna=False) != 'integer':
+            bad_rows = column.index[~column.map(lambda v: isinstance(v, (int, np.integer))).to_numpy(dtype=bool)]
+            failures.append(f"{table_name}['{field_name}'] field only accepts integer values! Rows: "
+                            f"{_listed(bad_rows)}")
+            continue
+
+        values = column.to_numpy(dtype=np.int64)
+        if table_name in MULTI_PRODUCT_TABLES:
+            duplicated = table.duplicated(['Product ID', 'Site ID', field_name], keep=False).to_numpy()
+            if duplicated.any():
+                failures.append(f"{table_name} table must not have duplicated ('Product ID', 'Site ID', "
+                                f"'{field_name}') values. Rows: {_listed(table.index[duplicated])}")
+            continue
+        if table_name in SCENARIO_TABLES:
+            duplicated = table.duplicated(['Scenario ID', field_name], keep=False).to_numpy()
+            if duplicated.any():
+                failures.append(f"{table_name} table must not have duplicated ('Scenario ID', '{field_name}') values. "
+                                f"Rows: {_listed(table.index[duplicated])}")
+            continue
+        if table_name in PARTIAL_PERIOD_TABLES:
+            duplicated = column.duplicated(keep=False).to_numpy()
+            if duplicated.any():
+                failures.append(f"{table_name}['{field_name}'] field must not have duplicated values. Rows: "
+                                f"{_listed(column.index[duplicated])}")
+            continue
+
+        # Check for integers from 1 to len(table), i.e., no value out of range, duplicated or missing
+        n = len(values)
+        out_of_range = (values < 1) | (values > n)
+        counts = np.bincount(values[~out_of_range], minlength=n + 1)[1:]
+        if out_of_range.any() or (counts != 1).any():
+            message = (f"{table_name}['{field_name}'] field must have all integers from 1 to {n}, "
+                       f"not necessarily ordered.")
+            if out_of_range.any():
+                message += f' Out of range rows: {_listed(column.index[out_of_range])}.'
+            if (counts > 1).any():
+                message += f' Duplicated values: {_listed(np.flatnonzero(counts > 1) + 1)}.'
+            if (counts == 0).any():
+                message += f' Missing values: {_listed(np.flatnonzero(counts == 0) + 1)}.'
+            failures.append(message)
+            continue
+        valid_columns[table_name] = n
+
+    # Cross-table check: valid columns are exactly 1..n, so 'demand' and 'costs' agree iff they have the same length.
+    # 'demand' may be left empty when the demand comes from the scenario tables
+    if 'demand' in valid_columns and 'costs' in valid_columns and valid_columns['demand'] != valid_columns['costs'] \
+            and (valid_columns['demand'] or not len(dat.scenario_demand)):
+        n_demand, n_costs = valid_columns['demand'], valid_columns['costs']
+        only_in, not_in = ('demand', 'costs') if n_demand > n_costs else ('costs', 'demand')
+        extra = range(min(n_demand, n_costs) + 1, max(n_demand, n_costs) + 1)
+        failures.append(f'The following indexes exist in {only_in}["{field_name}"] but not in '
+                        f'{not_in}["{field_name}"]: {_listed(extra)}')
+    return failures
 
 
 def check_each_period_id_column(dat):
     """
     Check if all tables in dat object have the appropriate 'Period ID' column, i.e., integer numbers from 1 to the
-    number of rows in the corresponding table, without any gap (but not necessarily ordered).
+    number of rows in the corresponding table, without any gap (but not necessarily ordered), and if 'demand' and
+    'costs' tables have the same 'Period ID' values.
 
     Examples: I = [1, 4, 7, 5, 6, 3, 2] is a valid 'Period ID' column, while I = [3, 5, 4, 1] is not because number 2
     is missing in the latter.
@@ -21,24 +133,100 @@ def check_each_period_id_column(dat):
     Raises
     ------
     ValueError
-        It's raised in two situations: 1) when some 'Period ID' column with non-integer values is found; when an invalid
-        'Period ID' column is found, that is, some 'Period ID' column containing missing value(s). It reports table and
-        field names in the error message.
+        It's raised when find_period_id_failures finds any problem: 1) some 'Period ID' column with non-integer
+        values; 2) some 'Period ID' column with values out of range, duplicated or missing; 3) 'demand' and 'costs'
+        tables with different 'Period ID' values. All problems are reported at once in the error message, one per line,
+        with table and field names and the offending rows or values.
 
     """
-    field_name = 'Period ID'
-    for table_name in input_schema.all_tables:
-        table = dat.__getattribute__(table_name)
-        if field_name in table.columns:
-            # Check for list of integer values
-            I = list(table[field_name])
-            if not all(isinstance(item, int) for item in I):
-                raise ValueError(f"{table_name}['{field_name}'] field only accepts integer values!")
-
-            # Check if there is any missing value
-            I.sort()
-            aux_list = list(range(1, len(I)+1))  # list from 1 to len(I)
-            if not I == aux_list:
-                raise ValueError(f"{table_name}['{field_name}'] field must have all integers from 1 to {len(I)}, "
-                                 f"not necessarily ordered.")
+    failures = find_period_id_failures(dat)
+    if failures:
+        raise ValueError('\n'.join(failures))
+
 
+def period_capacities(I, capacity, overrides=None):
+    """
+    Combine a scalar capacity parameter with per-period overrides into the capacity of each capacitated period.
+
+    Parameters
+    ----------
+    I : list
+        A list containing the 'Period ID' values.
+    capacity : int
+        The scalar capacity parameter ('Production Capacity' or 'Inventory Capacity'), -1 meaning no capacity.
+    overrides : dict, optional
+        A dictionary structured as {period_id: capacity} that takes precedence over the scalar capacity, with -1
+        meaning no capacity in that period, as read from the 'capacities' table.
+
+    Returns
+    -------
+    capacities : dict
+        A dictionary structured as {period_id: capacity}, only for the periods of I that have a capacity.
+    """
+    overrides = overrides or {}
+    capacities = {i: overrides.get(i, capacity) for i in I}
+    return {i: c for i, c in capacities.items() if c != -1}
+
+
+def _without_optional_tables(text):
+    """
+    Remove the optional tables from the lists of missing tables in the messages printed by the ticdat readers, and the
+    whole message when only optional tables are missing.
+    """
+    table_names = set(input_schema.all_tables).union(output_schema.all_tables)
+    optional = set(OPTIONAL_INPUT_TABLES).union(OPTIONAL_OUTPUT_TABLES)
+    lines = []
+    header = None  # the first line of the current message, if any
+    for line in text.split('\n'):
+        if line.startswith('The following table names could not be found'):
+            header, missing = line, []
+        elif header is not None and line in table_names:
+            missing.append(line)
+        elif header is not None:  # the blank line that ends the message
+            required = [table_name for table_name in missing if table_name not in optional]
+            lines += [header, *required, line] if required else [line] if line else []
+            header = None
+        else:
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+@contextmanager
+def quiet_optional_tables():
+    """
+    Context manager for reading data with the ticdat readers (e.g., input_schema.json.create_pan_dat), that keeps them
+    from listing the OPTIONAL_INPUT_TABLES (or OPTIONAL_OUTPUT_TABLES) as missing, e.g., the multi-product tables of a
+    single-product data set. Any other message is printed as is, also when reading raises, since it may explain why.
+    """
+    log = io.StringIO()
+    try:
+        with redirect_stdout(log):
+            yield
+    finally:
+        print(_without_optional_tables(log.getvalue()), end='')
+
+
+def without_empty_optional_tables(sln):
+    """
+    Drop the OPTIONAL_OUTPUT_TABLES that are empty from a solution, e.g., so that they aren't written as empty files.
+
+    Parameters
+    ----------
+    sln : PanDat
+        A PanDat object compatible with the output_schema.
+
+    Returns
+    -------
+    schema : PanDatFactory
+        The output_schema without the dropped tables, with the same data types.
+    sln : PanDat
+        A PanDat object compatible with schema, sharing its tables with the original one.
+    """
+    table_names = [table_name for table_name in output_schema.all_tables
+                   if table_name not in OPTIONAL_OUTPUT_TABLES or len(getattr(sln, table_name))]
+    full_schema = output_schema.schema(include_ancillary_info=True)
+    full_schema.update({key: {table_name: value for table_name, value in full_schema[key].items()
+                              if table_name in table_names}
+                        for key in ('tables_fields', 'data_types', 'default_values')})
+    schema = PanDatFactory.create_from_full_schema(full_schema)
+    return schema, schema.PanDat(**{table_name: getattr(sln, table_name) for table_name in table_names})
@@ -0,0 +1,380 @@
+"""
+Watch mode: re-plan whenever the CSV files of an input directory change, started from the command line with:
+
+>> python -m pastesian watch -i <input_directory> -o <output_directory> --debounce 0.5 --interval 0.25
+
+Unlike `python -m pastesian -i ... -o ...`, which re-reads, re-validates and re-solves everything on every run, the
+Watcher keeps the input tables and the model in memory between runs:
+
+- The input directory is polled for the size and modification time of each table file, and a burst of writes is
+  coalesced into a single update: it only happens once no file changed for 'debounce' seconds.
+- Only the files that changed are read again, and their rows are diffed against the ones in memory, by primary key,
+  into added, removed and changed rows. Files rewritten with the same contents change nothing.
+- Only the affected validation is run: the data types and data row predicates of the added and changed rows, and the
+  'Period ID' checks of pastesian.utils when some period was added or removed.
+- Changed demand, costs, capacities and parameters are applied in place to a pastesian.model.PastesianModel, which is
+  re-solved warm started from the previous solution. Other changes (e.g., periods added) rebuild the model, and the
+  data sets it doesn't support (multiple products, setups, or an engine other than 'pulp') are solved by solve().
+- Only the output files whose contents changed are written, each one atomically (to a temporary file first). As with
+  the command line, the optional output tables that are empty are not written.
+
+Both directories hold one CSV file per table, as read and written by ticdat (input_schema.csv and output_schema.csv).
+"""
+import argparse
+import os
+import time
+import pandas as pd
+from pastesian import input_schema, output_schema
+from pastesian.engines import ENGINES
+from pastesian.integrity import find_integrity_failures
+from pastesian.main import solve
+from pastesian.mip import create_setup_parameters, has_setups
+from pastesian.model import PastesianModel
+from pastesian.multi import is_multi_product
+from pastesian.schemas import OPTIONAL_OUTPUT_TABLES
+from pastesian.utils import find_period_id_failures
+
+# Tables whose changed values are applied in place to the PastesianModel, and tables that solve() doesn't use, so
+# their changes are only validated. Any other change rebuilds the model.
+IN_PLACE_TABLES = ('demand', 'costs', 'parameters', 'capacities')
+UNUSED_TABLES = ('time_periods', 'scenarios', 'scenario_demand')
+# Parameters whose changes are applied in place ('Backlog Cost' is only used by the stochastic mode)
+IN_PLACE_PARAMETERS = ('Production Capacity', 'Inventory Capacity', 'Lasagnas To Be Left', 'Lasagnas To Start',
+                       'Backlog Cost')
+
+
+def table_files(directory, schema=input_schema):
+    """
+    Find the CSV file of each table of schema in directory, matched as ticdat does (case and space insensitive).
+
+    Returns
+    -------
+    files : dict
+        A dictionary structured as {table_name: path}, only for the tables with a file.
+    """
+    names = {f'{table_name.lower()}.csv': table_name for table_name in schema.all_tables}
+    files = {}
+    for entry in os.scandir(directory):
+        table_name = names.get(entry.name.lower().replace(' ', '_'))
+        if table_name is not None and entry.is_file():
+            files[table_name] = entry.path
+    return files
+
+
+def read_table(path, table_name):
+    """
+    Read one table of the input_schema from its CSV file, with the same types as input_schema.csv.create_pan_dat.
+
+    Raises
+    ------
+    ValueError
+        When some field of the table is missing in the file.
+    """
+    fields = list(input_schema.primary_key_fields[table_name] + input_schema.data_fields[table_name])
+    table = pd.read_csv(path, dtype=input_schema._dtypes_for_pandas_read(table_name))
+    missing = [field for field in fields if field not in table.columns]
+    if missing:
+        raise ValueError(f'The following fields are missing in {os.path.basename(path)}: {missing}')
+    # ticdat's post-read adjustments (e.g., of the parameters and datetime fields), on this table only
+    partial = input_schema.PanDat(**{table_name: table[fields]})
+    input_schema._general_post_read_adjustment(partial, push_parameters_to_be_valid=True)
+    return getattr(partial, table_name)
+
+
+def diff_table(old, new, table_name):
+    """
+    Diff two versions of an input table by primary key.
+
+    Parameters
+    ----------
+    old, new : DataFrame
+        The previous and the current version of the table.
+    table_name : str
+        The name of the table in the input_schema.
+
+    Returns
+    -------
+    added : DataFrame
+        The rows of new whose primary key isn't in old.
+    removed : DataFrame
+        The rows of old whose primary key isn't in new.
+    changed : DataFrame
+        The rows of new whose primary key is in old, with some other value. Tables with duplicated primary keys are
+        all changed, as their rows can't be matched.
+    """
+    primary_key = list(input_schema.primary_key_fields[table_name])
+    if old.duplicated(primary_key).any() or new.duplicated(primary_key).any():
+        return new.iloc[:0], old.iloc[:0], new
+    old_keys = pd.MultiIndex.from_frame(old[primary_key])
+    new_keys = pd.MultiIndex.from_frame(new[primary_key])
+    in_old = new_keys.isin(old_keys)
+    added, removed = new[~in_old], old[~old_keys.isin(new_keys)]
+
+    matched = new[in_old]
+    matched_keys = pd.MultiIndex.from_frame(matched[primary_key]) if len(primary_key) > 1 else matched[primary_key[0]]
+    previous = old.set_index(primary_key).reindex(matched_keys)
+    differ = pd.Series(False, index=matched.index)
+    for field in input_schema.data_fields[table_name]:
+        before, after = previous[field].to_numpy(), matched[field]
+        both_null = after.isna().to_numpy() & pd.isna(before)
+        differ |= ~both_null & (after.to_numpy() != before)
+    return added, removed, matched[differ.to_numpy()]
+
+
+class Watcher:
+    """
+    Re-plan whenever the CSV files of an input directory change, see the module docstring.
+
+    Parameters
+    ----------
+    input_directory : str
+        The directory with one CSV file per input table.
+    output_directory : str
+        The directory where one CSV file per output table is written. It's created if it doesn't exist, and it must be
+        another directory than input_directory.
+    debounce : float, optional
+        Seconds without any file change before an update, default=0.5.
+    engine : str, optional
+        The engine used to solve, see solve(). Only 'pulp' (default) re-solves in place, warm started.
+    solver_options : dict, optional
+        Solver options, see pastesian.engines.check_solver_options. Default is None.
+    log : callable, optional
+        A function that receives a one-line summary of every update, default is print.
+
+    Attributes
+    ----------
+    tables : dict
+        The input tables in memory, structured as {table_name: DataFrame}, as of the last valid update.
+    """
+
+    def __init__(self, input_directory, output_directory, debounce=0.5, engine='pulp', solver_options=None, log=print):
+        if not os.path.isdir(input_directory):
+            raise ValueError(f'{input_directory} is not a directory of CSV files')
+        if os.path.splitext(output_directory)[1] or \
+                os.path.abspath(output_directory) == os.path.abspath(input_directory):
+            raise ValueError(f'{output_directory} must be a directory, other than the input one, for the CSV files')
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {', '.join(map(repr, ENGINES))}, not {engine!r}")
+        self.input_directory = input_directory
+        self.output_directory = output_directory
+        self.debounce = debounce
+        self.engine = engine
+        self.solver_options = solver_options
+        self.log = log
+        self.tables = None
+        self._model = None
+        self._outputs = {}
+        self._applied = {}  # file signatures of the last successful update
+        self._attempted = None  # file signatures of the last update, even if invalid or failed to read
+        self._seen = None  # file signatures of the last poll
+        self._changed_at = None
+
+    def _signatures(self):
+        signatures = {}
+        for table_name, path in table_files(self.input_directory).items():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:  # deleted since it was listed
+                continue
+            signatures[table_name] = (stat.st_mtime_ns, stat.st_size)
+        return signatures
+
+    def poll(self, now=None):
+        """
+        Check the input directory once, and update when some file changed and then none for 'debounce' seconds.
+
+        Parameters
+        ----------
+        now : float, optional
+            The current time.monotonic(), which tests may give.
+
+        Returns
+        -------
+        report : dict
+            The report of the update (see update), or None when there was none.
+        """
+        now = time.monotonic() if now is None else now
+        signatures = self._signatures()
+        if signatures != self._seen:
+            self._seen, self._changed_at = signatures, now
+        if self._seen in (self._applied, self._attempted) or now - self._changed_at < self.debounce:
+            return None
+        return self.update()
+
+    def update(self):
+        """
+        Read the files that changed since the last update, validate and apply the changes, re-solve and write the
+        output files whose contents changed. The first update reads all files and writes all output files.
+
+        The files are only marked as applied by a successful update: after an invalid update, or an error reading
+        some file, the next update reads again every file changed since the last successful one.
+
+        Returns
+        -------
+        report : dict
+            A dictionary with the 'changes' of each input table, as (added, removed, changed) row counts, the 'mode'
+            of the update ('in place', 'rebuilt', 'solved', 'unchanged' or 'invalid'), the solver 'status' (None unless
+            solved), the 'failures' found by the validation and the output tables 'written'.
+        """
+        signatures = self._signatures()
+        files = table_files(self.input_directory)
+        stale = [table_name for table_name in input_schema.all_tables
+                 if self.tables is None or signatures.get(table_name) != self._applied.get(table_name)]
+        self._attempted = self._seen = signatures
+
+        # region Read the files that changed and diff them against the tables in memory
+        new_tables = {}
+        for table_name in stale:
+            if table_name in files:
+                new_tables[table_name] = read_table(files[table_name], table_name)
+            else:
+                new_tables[table_name] = getattr(input_schema.PanDat(), table_name)
+        if self.tables is None:
+            diffs = {table_name: (table, table.iloc[:0], table.iloc[:0]) for table_name, table in new_tables.items()}
+        else:
+            diffs = {table_name: diff_table(self.tables[table_name], table, table_name)
+                     for table_name, table in new_tables.items()}
+        diffs = {table_name: diff for table_name, diff in diffs.items() if any(len(rows) for rows in diff)}
+        report = {'changes': {table_name: tuple(len(rows) for rows in diff) for table_name, diff in diffs.items()},
+                  'mode': 'unchanged', 'status': None, 'failures': [], 'written': []}
+        if not diffs and self.tables is not None:
+            self._applied = signatures
+            self.log('No input table changed')
+            return report
+        tables = new_tables if self.tables is None else \
+            {**self.tables, **{table_name: new_tables[table_name] for table_name in diffs}}
+        dat = input_schema.PanDat(**tables)
+        # endregion
+
+        # region Validate the rows that were added or changed, and the 'Period ID' columns when some period was added
+        # or removed
+        rows = {table_name: pd.concat([added, changed]) for table_name, (added, _, changed) in diffs.items()}
+        failures = find_integrity_failures(input_schema.PanDat(**rows))
+        failures = [f'{table_name}: {check} failure ({rule}) in {count} row(s)' for (table_name, check, rule), count
+                    in failures[failures['Check'].isin(['Data Type', 'Data Row'])].groupby(
+                        ['Table', 'Check', 'Rule'], sort=False).size().items()]
+        if self.tables is None or any((len(added) or len(removed)) and 'Period ID' in added.columns
+                                      for added, removed, _ in diffs.values()):
+            failures += find_period_id_failures(dat)
+        if failures:
+            report.update(mode='invalid', failures=failures)
+            self.log(f'{self._describe(report)}: invalid, the previous outputs are kept\n' + '\n'.join(failures))
+            return report
+        # endregion
+
+        # region Re-solve, in place when possible
+        in_place = self._model is not None and all(
+            table_name in IN_PLACE_TABLES + UNUSED_TABLES and
+            not (table_name in ('demand', 'costs') and (len(diff[0]) or len(diff[1]))) and
+            not (table_name == 'parameters' and
+                 not set(pd.concat(diff)['Name']).issubset(IN_PLACE_PARAMETERS))
+            for table_name, diff in diffs.items())
+        if in_place:
+            self._apply(dat, diffs)
+            sln = self._model.solve()
+        else:
+            parameters = input_schema.create_full_parameters_dict(dat)
+            supported = self.engine == 'pulp' and not is_multi_product(dat) and \
+                not has_setups(*create_setup_parameters(dat, list(dat.costs['Period ID']), parameters))
+            self._model = PastesianModel(dat, self.solver_options) if supported else None
+            sln = self._model.solve() if supported else solve(dat, self.engine, solver_options=self.solver_options)
+        self.tables = tables
+        self._applied = signatures
+        status = dict(zip(sln.solver_status['Statistic'], sln.solver_status['Value']))['Status']
+        report.update(mode='in place' if in_place else 'rebuilt' if self._model is not None else 'solved',
+                      status=status)
+        # endregion
+
+        report['written'] = self._write_outputs(sln)
+        self.log(f"{self._describe(report)}: {report['mode']}, {status}, wrote {report['written'] or 'nothing'}")
+        return report
+
+    def _apply(self, dat, diffs):
+        """
+        Apply the changed values to the PastesianModel.
+        """
+        if 'demand' in diffs:
+            changed = diffs['demand'][2]
+            self._model.update_demand(dict(zip(changed['Period ID'], changed['Demand'])))
+        if 'costs' in diffs:
+            changed = diffs['costs'][2]
+            self._model.update_costs(dict(zip(changed['Period ID'], changed['Production Cost'])),
+                                     dict(zip(changed['Period ID'], changed['Inventory Cost'])))
+        if 'parameters' in diffs:
+            parameters = input_schema.create_full_parameters_dict(dat)
+            self._model.update_parameters({name: parameters[name] for name in pd.concat(diffs['parameters'])['Name']})
+        if 'capacities' in diffs:
+            self._model.update_capacities(dat.capacities)
+
+    def _write_outputs(self, sln):
+        os.makedirs(self.output_directory, exist_ok=True)
+        written = []
+        for table_name in sorted(output_schema.all_tables):
+            table = getattr(sln, table_name).reset_index(drop=True)
+            previous = self._outputs.get(table_name)
+            if previous is not None and previous.equals(table):
+                continue
+            path = os.path.join(self.output_directory, f'{table_name}.csv')
+            if table_name in OPTIONAL_OUTPUT_TABLES and table.empty:  # not written, as by the command line
+                if os.path.exists(path):
+                    os.remove(path)
+                self._outputs[table_name] = table
+                if previous is not None:
+                    written.append(table_name)
+                continue
+            table.to_csv(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+            self._outputs[table_name] = table
+            written.append(table_name)
+        return written
+
+    @staticmethod
+    def _describe(report):
+        changes = ', '.join(f'{table_name} (+{added} -{removed} ~{changed})'
+                            for table_name, (added, removed, changed) in report['changes'].items())
+        return f"Changed {changes or 'nothing'}"
+
+    def run(self, interval=0.25, stop=None):
+        """
+        Update right away, then poll every 'interval' seconds until stop is set (or KeyboardInterrupt).
+
+        Parameters
+        ----------
+        interval : float, optional
+            Seconds between polls, default=0.25.
+        stop : threading.Event, optional
+            When given, the watcher stops once it's set.
+        """
+        self.update()
+        while True:
+            if stop is None:
+                time.sleep(interval)
+            elif stop.wait(interval):
+                return
+            try:
+                self.poll()
+            except (ValueError, OSError, pd.errors.ParserError) as e:  # e.g., a file still being written
+                self.log(f'{type(e).__name__}: {e}')
+
+
+def main(argv=None):
+    """
+    Command-line entry point of `python -m pastesian watch`, see the module docstring.
+    """
+    parser = argparse.ArgumentParser(prog='python -m pastesian watch',
+                                     description='Re-plan whenever the CSV files of the input directory change.')
+    parser.add_argument('-i', '--input', required=True, help='directory with the input CSV files')
+    parser.add_argument('-o', '--output', required=True, help='directory where the output CSV files are written')
+    parser.add_argument('--debounce', type=float, default=0.5,
+                        help='seconds without file changes before re-planning, default=0.5')
+    parser.add_argument('--interval', type=float, default=0.25, help='seconds between polls, default=0.25')
+    parser.add_argument('--engine', default='pulp', choices=ENGINES, help='engine used to solve, default=pulp')
+    args = parser.parse_args(argv)
+
+    watcher = Watcher(args.input, args.output, args.debounce, args.engine)
+    print(f'Watching {args.input}, writing to {args.output}')
+    try:
+        watcher.run(args.interval)
+    except KeyboardInterrupt:
+        pass
+    return 0
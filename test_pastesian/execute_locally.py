@@ -7,8 +7,9 @@ execute the script. You may also change the input and output data paths to execu
 instances.
 """
 
-from pastesian import input_schema, output_schema
+from pastesian import input_schema
 from pastesian import solve
+from pastesian.utils import quiet_optional_tables, without_empty_optional_tables
 from test_pastesian.action_local_data_integrity import local_data_integrity_check
 import os
 import inspect
@@ -20,7 +21,8 @@ def _this_directory():
 
 # Create "dat" object, containing all input data
 input_path = os.path.join(_this_directory(), "data/inputs")
-dat = input_schema.csv.create_pan_dat(input_path)
+with quiet_optional_tables():
+    dat = input_schema.csv.create_pan_dat(input_path)
 
 # Check data integrity
 local_data_integrity_check(dat)
@@ -30,4 +32,5 @@ sln = solve(dat)
 
 # Populate the output schema's tables
 output_path = os.path.join(_this_directory(), "data/outputs")
-output_schema.csv.write_directory(sln, output_path)
+schema, sln = without_empty_optional_tables(sln)
+schema.csv.write_directory(sln, output_path)
@@ -9,14 +9,42 @@ three commands (which requires the installation of the `coverage` package):
 - `coverage html`
 """
 
-from pastesian import action_update_demand, solve, input_schema, output_schema
-from pastesian.utils import check_each_period_id_column
-from pastesian.main import create_optimization_parameters
+from pastesian import action_update_demand, solve, solve_many, PastesianModel, SolutionCache, sweep_demand, \
+    solve_stochastic, find_integrity_failures, ScenarioOverlay, solve_decomposed, solve_hierarchical, input_schema, \
+    output_schema
+from pastesian.utils import check_each_period_id_column, quiet_optional_tables
+from pastesian.schemas import OPTIONAL_OUTPUT_TABLES
+from pastesian.main import create_optimization_parameters, create_capacity_parameters, populate_output_schema
+from pastesian.rolling import rolling_horizon_gap, solve_rolling_horizon
+from pastesian.decomposition import find_split_points, group_segments
+from pastesian.hierarchy import bucket_periods, hierarchical_gap
+from pastesian.engines import build_model, pulp_solver
+from pastesian.bench import generate_instance, generate_multi_product_instance, time_phases, run_benchmark, \
+    save_results, load_results, compare, PHASES
+from pastesian.stats import add_callback, remove_callback
+from pastesian import columnar, matrix, multi
+from pastesian.columnar import read_columnar, write_columnar
+from pastesian.__main__ import main
+from pastesian.server import SolveServer
+from pastesian.watch import Watcher
 import unittest
+from unittest import mock
 from math import isclose
 import os
 import pandas as pd
 import inspect
+import tempfile
+import contextlib
+import io
+import tracemalloc
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import sys
+import json
+import urllib.request
+import urllib.error
 
 
 def _this_directory():
@@ -30,8 +58,9 @@ class TestPastesian(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls) -> None:
-        cls.dat = input_schema.json.create_pan_dat(cls.input_data_path)
-        cls.sln = output_schema.json.create_pan_dat(cls.output_data_path)
+        with quiet_optional_tables():
+            cls.dat = input_schema.json.create_pan_dat(cls.input_data_path)
+            cls.sln = output_schema.json.create_pan_dat(cls.output_data_path)
 
     def test_create_optimization_parameters(self):
         # Sample 1: original data set
@@ -81,6 +110,714 @@ class TestPastesian(unittest.TestCase):
         self.assertIsNone(pd.testing.assert_frame_equal(sln.costs, costs_expected, check_dtype=False, rtol=1.0e-5,
                                                         atol=1.0e-8))
 
+        # Sample 2: shuffled rows and solution pairs, expected the same tables, ordered by 'Period ID'
+        dat2 = input_schema.copy_pan_dat(self.dat)
+        dat2.costs = dat2.costs.iloc[[2, 0, 3, 1]]
+        x_sol = [(3, 0.0), (1, 650.0), (4, 250.0), (2, 0.0)]
+        s_sol = [(4, 0.0), (2, 150.0), (1, 500.0), (3, 0.0)]
+        sln2 = populate_output_schema(x_sol, s_sol, dat2)
+        self.assertIsNone(pd.testing.assert_frame_equal(sln2.production_flow, sln.production_flow))
+        self.assertIsNone(pd.testing.assert_frame_equal(sln2.costs, sln.costs))
+
+    def test_capacities(self):
+        # Sample 1: scalar capacities become variable bounds, expected no capacity rows in the model
+        d, pc, ic, I = create_optimization_parameters(self.dat)
+        parameters = dict(input_schema.create_full_parameters_dict(self.dat), **{'Production Capacity': 400})
+        pcap, icap = create_capacity_parameters(self.dat, I, parameters)
+        self.assertDictEqual(pcap, {1: 400, 2: 400, 3: 400, 4: 400})
+        self.assertDictEqual(icap, {})
+        mdl, x, s = build_model(d, pc, ic, I, parameters, pcap, icap)
+        self.assertEqual(len(mdl.constraints), len(I) + 1)  # balance rows plus 'last_storage'
+        self.assertEqual(x[1].upBound, 400)
+
+        # Sample 2: per-period capacities, with a shutdown in period 2, expected the same output from all engines
+        dat2 = input_schema.copy_pan_dat(self.dat)
+        dat2.parameters = pd.DataFrame([['Production Capacity', 500], ['Inventory Capacity', 400]],
+                                       columns=['Name', 'Value'])
+        dat2.capacities = pd.DataFrame([[2, 0, None], [3, -1, 100]],
+                                       columns=['Period ID', 'Production Capacity', 'Inventory Capacity'])
+        pcap, icap = create_capacity_parameters(dat2, I, input_schema.create_full_parameters_dict(dat2))
+        self.assertDictEqual(pcap, {1: 500, 2: 0, 4: 500})
+        self.assertDictEqual(icap, {1: 400, 2: 400, 3: 100, 4: 400})
+        sln = solve(dat2)
+        self.assertEqual(sln.production_flow.loc[1, 'Production Quantity'], 0)
+        for engine in ('highs', 'flow'):
+            sln_engine = solve(dat2, engine=engine)
+            self.assertIsNone(pd.testing.assert_frame_equal(sln_engine.production_flow, sln.production_flow))
+            self.assertIsNone(pd.testing.assert_frame_equal(sln_engine.costs, sln.costs))
+
+    def test_main_solve_flow_engine(self):
+        # Sample 1: original data set, expected the same output as the PuLP model
+        sln = solve(self.dat, engine='flow')
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                        check_dtype=False, rtol=1.0e-5, atol=1.0e-8))
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.costs, self.sln.costs, check_dtype=False, rtol=1.0e-5,
+                                                        atol=1.0e-8))
+
+        # Sample 2: capacities from the README's "Additional Complexities", expected the same output as the PuLP model
+        dat2 = input_schema.copy_pan_dat(self.dat)
+        dat2.parameters = pd.DataFrame([['Production Capacity', 400], ['Inventory Capacity', 200]],
+                                       columns=['Name', 'Value'])
+        sln_pulp = solve(dat2)
+        sln_flow = solve(dat2, engine='flow')
+        self.assertIsNone(pd.testing.assert_frame_equal(sln_flow.production_flow, sln_pulp.production_flow))
+        self.assertIsNone(pd.testing.assert_frame_equal(sln_flow.costs, sln_pulp.costs))
+
+        # Sample 3: infeasible production capacity, expected empty output
+        dat3 = input_schema.copy_pan_dat(self.dat)
+        dat3.parameters = pd.DataFrame([['Production Capacity', 100]], columns=['Name', 'Value'])
+        self.assertTrue(solve(dat3, engine='flow').production_flow.empty)
+
+        # Sample 4: unknown engine, expected ValueError
+        with self.assertRaises(ValueError):
+            solve(self.dat, engine='gurobi')
+
+    def test_main_solve_highs_engine(self):
+        # Sample 1: original data set, expected the same output as the PuLP model
+        sln = solve(self.dat, engine='highs')
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                        check_dtype=False, rtol=1.0e-5, atol=1.0e-8))
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.costs, self.sln.costs, check_dtype=False, rtol=1.0e-5,
+                                                        atol=1.0e-8))
+
+        # Sample 2: infeasible inventory capacity, expected empty output
+        dat2 = input_schema.copy_pan_dat(self.dat)
+        dat2.parameters = pd.DataFrame([['Inventory Capacity', 10], ['Lasagnas To Be Left', 20]],
+                                       columns=['Name', 'Value'])
+        self.assertTrue(solve(dat2, engine='highs').production_flow.empty)
+
+    def test_solver_options(self):
+        # Sample 1: solver options of every engine, expected the same output and a 'solver_status' table
+        options = {'threads': 2, 'time_limit': 30, 'mip_gap': 0.01, 'quiet': True}
+        for engine in ('pulp', 'highs', 'flow'):
+            sln = solve(self.dat, engine=engine, solver_options=options)
+            self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                            check_dtype=False, rtol=1.0e-5, atol=1.0e-8))
+            status = dict(zip(sln.solver_status['Statistic'], sln.solver_status['Value']))
+            self.assertEqual((status['Engine'], status['Status']), (engine, 'Optimal'))
+            self.assertGreater(status['Solve Time (s)'], 0)
+
+        # Sample 2: options passed along to CBC
+        solver = pulp_solver(options, warmStart=True)
+        self.assertEqual((solver.msg, solver.timeLimit), (False, 30))
+        self.assertDictEqual({k: solver.optionsDict[k] for k in ('threads', 'gapRel', 'warmStart')},
+                             {'threads': 2, 'gapRel': 0.01, 'warmStart': True})
+
+        # Sample 3: infeasible model, expected its status in the output instead of a message
+        dat2 = input_schema.copy_pan_dat(self.dat)
+        dat2.parameters = pd.DataFrame([['Production Capacity', 10]], columns=['Name', 'Value'])
+        sln = solve(dat2, solver_options={'quiet': True})
+        self.assertTrue(sln.production_flow.empty)
+        self.assertEqual(sln.solver_status.loc[1, 'Value'], 'Infeasible')
+
+        # Sample 4: unknown option or invalid value, expected ValueError
+        for options in ({'gap': 0.01}, {'threads': 0}, {'time_limit': -1}, {'mip_gap': -0.1}):
+            with self.assertRaises(ValueError):
+                solve(self.dat, solver_options=options)
+
+    def test_feasibility_precheck(self):
+        # Sample 1: production capacity below every demand, expected 'Infeasible' without solving, and the shortfall
+        # of each period in the 'diagnostics' table
+        dat = input_schema.copy_pan_dat(self.dat)
+        dat.parameters = pd.DataFrame([['Production Capacity', 10]], columns=['Name', 'Value'])
+        sln = solve(dat, stats=True)
+        self.assertTrue(sln.production_flow.empty)
+        self.assertEqual(sln.solver_status.loc[1, 'Value'], 'Infeasible')
+        self.assertListEqual(list(sln.diagnostics['Issue'].unique()), ['Production Shortfall'])
+        self.assertListEqual(sln.diagnostics['Amount'].tolist(), [140.0, 340.0, 140.0, 240.0])
+        self.assertNotIn('build', set(sln.run_stats['Phase']))
+
+        # Sample 2: starting inventory above the inventory capacity, expected an overflow in period 1, and the
+        # lasagnas to be left above the inventory capacity in period 4
+        dat.parameters = pd.DataFrame([['Inventory Capacity', 10], ['Lasagnas To Start', 300],
+                                       ['Lasagnas To Be Left', 15]], columns=['Name', 'Value'])
+        sln = solve(dat)
+        self.assertListEqual(sln.diagnostics.values.tolist(), [[1, 'Inventory Overflow', 90.0],
+                                                               [4, 'Lasagnas To Be Left', 5.0]])
+
+        # Sample 3: feasible data set, expected an empty 'diagnostics' table
+        self.assertTrue(solve(self.dat, solver_options={'quiet': True}).diagnostics.empty)
+
+    def test_setups(self):
+        # Sample 1: setup cost and minimum batch size, expected a single run with the setup in its production cost
+        dat = input_schema.copy_pan_dat(self.dat)
+        dat.parameters = pd.DataFrame([['Setup Cost', 500], ['Minimum Batch Size', 300]], columns=['Name', 'Value'])
+        sln = solve(dat, solver_options={'quiet': True}, stats=True)
+        self.assertListEqual(sln.production_flow['Production Quantity'].tolist(), [900, 0, 0, 0])
+        self.assertEqual(sln.costs.loc[0, 'Production Cost'], 900 * 5.5 + 500)
+        run_stats = sln.run_stats.set_index(['Phase', 'Statistic'])['Value']
+        self.assertGreaterEqual(run_stats['build', 'Warm Start Cost'], sln.costs['Total Cost'].sum())
+
+        # Sample 2: per-period setup costs only, expected the optimal plan from the Wagner-Whitin fast path, which
+        # produces for period 4 in period 4 since holding from period 1 costs 0.05 more per lasagna
+        dat.parameters = pd.DataFrame([['Setup Cost', 3000]], columns=['Name', 'Value'])
+        dat.setups = pd.DataFrame([[1, 0, None], [4, 0, None]],
+                                  columns=['Period ID', 'Setup Cost', 'Minimum Batch Size'])
+        sln = solve(dat)
+        self.assertListEqual(sln.production_flow['Production Quantity'].tolist(), [650, 0, 0, 250])
+        self.assertEqual(sln.solver_status.loc[1, 'Value'], 'Optimal')
+
+        # Sample 3: setups with the 'flow' engine or with window, expected ValueError
+        with self.assertRaises(ValueError):
+            solve(dat, engine='flow')
+        with self.assertRaises(ValueError):
+            solve(dat, window=2)
+
+    def test_multi_product(self):
+        quiet = {'quiet': True}
+        # Sample 1: the original data set as a single (product, site) pair, expected the same plan as solve()
+        dat = input_schema.PanDat(time_periods=self.dat.time_periods,
+                                  product_costs=self.dat.costs.assign(**{'Product ID': 'lasagna', 'Site ID': 'A'}),
+                                  product_demand=self.dat.demand.assign(**{'Product ID': 'lasagna', 'Site ID': 'A'}),
+                                  product_inventory=pd.DataFrame([['lasagna', 'A', 50, 0]], columns=[
+                                      'Product ID', 'Site ID', 'Starting Inventory', 'Ending Inventory']))
+        for engine in ('pulp', 'highs', 'flow'):
+            sln = solve(dat, engine=engine, solver_options=quiet)
+            self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                            check_dtype=False))
+            self.assertListEqual(sln.product_flow['Production Quantity'].tolist(),
+                                 self.sln.production_flow['Production Quantity'].tolist())
+
+        # Sample 2: sparse instances, expected the same cost from all engines, within the shared capacities
+        for capacity in ('none', 'tight'):
+            dat = generate_multi_product_instance(5, 3, 8, seed=3, density=0.6, capacity=capacity)
+            sln = solve(dat, solver_options=quiet)
+            self.assertEqual(len(sln.product_flow), len(dat.product_costs))
+            self.assertAlmostEqual(solve(dat, engine='highs').costs['Total Cost'].sum(),
+                                   sln.costs['Total Cost'].sum(), places=4)
+            produced = sln.product_flow.groupby(['Site ID', 'Period ID'])['Production Quantity'].sum()
+            capacities = dat.sites.set_index('Site ID')['Production Capacity'].replace(-1, float('inf'))
+            self.assertTrue((produced <= capacities.reindex(produced.index.get_level_values(0)).values + 1e-6).all())
+        relaxed = input_schema.copy_pan_dat(dat)
+        relaxed.sites = relaxed.sites.iloc[:0]
+        self.assertGreater(sln.costs['Total Cost'].sum(), solve(relaxed, engine='flow').costs['Total Cost'].sum())
+        run_stats = solve(dat, engine='flow', stats=True).run_stats.set_index(['Phase', 'Statistic'])['Value']
+        self.assertGreater(run_stats['solve', 'Binding Sites'], 0)
+        self.assertEqual(run_stats['solve', 'Status'], 'Optimal')
+
+        # Sample 3: binding capacities without scipy, expected the same cost from the PuLP model of the binding sites
+        with mock.patch.object(multi, 'linprog', None):
+            self.assertAlmostEqual(solve(dat, solver_options=quiet).costs['Total Cost'].sum(),
+                                   sln.costs['Total Cost'].sum(), places=4)
+
+        # Sample 4: inconsistent multi-product tables, expected ValueError
+        dat2 = input_schema.copy_pan_dat(dat)
+        dat2.product_costs = dat2.product_costs[dat2.product_costs['Period ID'] != 4]  # periods 3 and 5 of every pair
+        with self.assertRaises(ValueError):
+            solve(dat2)
+        dat2 = input_schema.copy_pan_dat(dat)
+        dat2.product_demand.loc[0, 'Product ID'] = 'P99'
+        with self.assertRaises(ValueError):
+            solve(dat2)
+        dat2 = input_schema.copy_pan_dat(dat)
+        dat2.product_costs = pd.concat([dat2.product_costs, dat2.product_costs.iloc[:1]])
+        with self.assertRaises(ValueError):
+            check_each_period_id_column(dat2)
+
+    def test_main_solve_rolling_horizon(self):
+        # Sample 1: a window with all periods, expected the same output as the full horizon
+        sln = solve(self.dat, engine='flow', window=4)
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                        check_dtype=False, rtol=1.0e-5, atol=1.0e-8))
+
+        # Sample 2: windows of 2 periods without overlap, expected a feasible plan that is not cheaper than the optimal
+        sln = solve(self.dat, engine='flow', window=2)
+        self.assertListEqual(list(sln.production_flow['Period ID']), [1, 2, 3, 4])
+        self.assertGreaterEqual(sln.costs['Total Cost'].sum(), self.sln.costs['Total Cost'].sum() - 1e-6)
+        d, pc, ic, I = create_optimization_parameters(self.dat)
+        parameters = input_schema.create_full_parameters_dict(self.dat)
+        pcap, icap = create_capacity_parameters(self.dat, I, parameters)
+        rolling_cost, full_cost, gap = rolling_horizon_gap(d, pc, ic, I, parameters, pcap, icap, window=2)
+        self.assertTrue(isclose(rolling_cost, sln.costs['Total Cost'].sum(), rel_tol=1e-6))
+        self.assertTrue(isclose(full_cost, self.sln.costs['Total Cost'].sum(), rel_tol=1e-6))
+        self.assertGreaterEqual(gap, 0)
+
+        # Sample 3: overlap not smaller than window, expected ValueError
+        with self.assertRaises(ValueError):
+            solve(self.dat, engine='flow', window=2, overlap=2)
+
+        # Sample 4: a demand peak beyond the production capacity after the first window, expected lasagnas built up
+        # ahead of it, for every overlap and engine
+        d, I = {1: 10, 2: 10, 3: 300, 4: 10}, [1, 2, 3, 4]
+        pc, ic = {i: 1.0 for i in I}, {i: 0.5 for i in I}
+        parameters = {'Lasagnas To Start': 0, 'Lasagnas To Be Left': 0, 'Production Capacity': 150,
+                      'Inventory Capacity': -1}
+        for overlap, engine in [(0, 'flow'), (1, 'flow'), (0, 'pulp'), (1, 'highs')]:
+            x_sol, s_sol, status = solve_rolling_horizon(d, pc, ic, I, parameters, None, None, 2, overlap, engine)
+            self.assertEqual(status, 'Optimal')
+            self.assertTrue(isclose(dict(s_sol)[2], 150, abs_tol=1e-6))
+
+        # Sample 5: a starting inventory that the first window can't use, expected it carried into the next one
+        parameters = {'Lasagnas To Start': 50, 'Lasagnas To Be Left': 0, 'Production Capacity': -1,
+                      'Inventory Capacity': -1}
+        x_sol, s_sol, status = solve_rolling_horizon({1: 0, 2: 0, 3: 100, 4: 100}, pc, ic, I, parameters, None, None, 2)
+        self.assertEqual(status, 'Optimal')
+        self.assertListEqual([value for _, value in s_sol], [50, 50, 0, 0])
+
+    def test_solve_decomposed(self):
+        d = {i: 10 for i in range(1, 5)}
+        pc, ic = {1: 1, 2: 5, 3: 1, 4: 5}, {i: 1 for i in range(1, 5)}
+        parameters = {'Lasagnas To Start': 0, 'Lasagnas To Be Left': 0}
+
+        # Sample 1: producing in period 3 is cheaper than holding from period 1, expected a regeneration after period 2
+        self.assertDictEqual(find_split_points(d, pc, ic, list(d), parameters, {}, {}), {2: 0.0})
+
+        # Sample 2: no inventory capacity in period 3, expected its inventory pinned to 0 as well
+        self.assertDictEqual(find_split_points(d, pc, ic, list(d), parameters, {}, {3: 0}), {2: 0.0, 3: 0.0})
+        self.assertListEqual(group_segments([2, 3], 4, 2), [(1, 2), (3, 4)])
+
+        # Sample 3: a generated instance solved in segments, expected the same plan and costs as the whole horizon
+        dat = generate_instance(200, seed=3)
+        sln = solve_decomposed(dat, segments=4, workers=2, engine='flow')
+        expected = solve(dat, engine='flow')
+        status = dict(zip(sln.solver_status['Statistic'], sln.solver_status['Value']))
+        self.assertEqual(status['Status'], 'Optimal')
+        self.assertEqual(status['Segments'], 4)
+        self.assertTrue(isclose(sln.costs['Total Cost'].sum(), expected.costs['Total Cost'].sum(), rel_tol=1e-9))
+        self.assertListEqual(sln.production_flow['Period ID'].tolist(), list(range(1, 201)))
+
+    def test_solve_hierarchical(self):
+        dat = generate_instance(120, seed=5, freq='D', capacity='loose')
+
+        # Sample 1: 120 days from 2000-01-01, expected 4 monthly buckets of 31, 29 (leap year), 31 and 29 days
+        self.assertListEqual(bucket_periods(dat, 'M'), [(1, 31), (32, 60), (61, 91), (92, 120)])
+
+        # Sample 2: the refined plan, expected feasible, within its bounds, which bound the cost of the full solve
+        sln = solve_hierarchical(dat, 'M', workers=2, engine='flow')
+        status = dict(zip(sln.solver_status['Statistic'], sln.solver_status['Value']))
+        self.assertEqual(status['Status'], 'Optimal')
+        self.assertEqual(status['Buckets'], 4)
+        self.assertListEqual(sln.production_flow['Period ID'].tolist(), list(range(1, 121)))
+        full_cost = solve(dat, engine='flow').costs['Total Cost'].sum()
+        self.assertLessEqual(status['Lower Bound'], full_cost + 1e-6)
+        self.assertGreaterEqual(status['Upper Bound'], full_cost - 1e-6)
+        hierarchical_cost, cost, gap = hierarchical_gap(dat, 'M')
+        self.assertTrue(isclose(cost, full_cost) and 0 <= gap <= status['Gap'] + 1e-9)
+
+    def test_solve_many(self):
+        # Scenario 'bad' has a gap in demand['Period ID'], expected its ValueError to be returned, not raised
+        bad_dat = input_schema.copy_pan_dat(self.dat)
+        bad_dat.demand.drop(0, axis=0, inplace=True)
+        results = {key: (sln, error) for key, sln, error in solve_many({'good': self.dat, 'bad': bad_dat}, workers=2)}
+
+        self.assertSetEqual(set(results), {'good', 'bad'})
+        sln, error = results['good']
+        self.assertIsNone(error)
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                        check_dtype=False, rtol=1.0e-5, atol=1.0e-8))
+        sln, error = results['bad']
+        self.assertIsNone(sln)
+        self.assertIsInstance(error, ValueError)
+
+    def test_pastesian_model(self):
+        # Sample 1: original data set, expected the same output as solve()
+        mdl = PastesianModel(self.dat)
+        sln = mdl.solve()
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                        check_dtype=False, rtol=1.0e-5, atol=1.0e-8))
+
+        # Sample 2: updated model, expected the same output as solving the updated data from scratch
+        mdl.update_demand({2: 100})
+        mdl.update_costs(production_cost={4: 1.0}, inventory_cost={1: 0.5})
+        mdl.update_parameters({'Production Capacity': 400, 'Inventory Capacity': 200, 'Lasagnas To Start': 20})
+        sln = mdl.solve()
+        sln_expected = solve(mdl.dat)
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, sln_expected.production_flow))
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.costs, sln_expected.costs))
+        self.assertEqual(self.dat.demand.loc[self.dat.demand['Period ID'] == 2, 'Demand'].item(), 350)  # unchanged
+
+        # Sample 3: unknown period or parameter, expected ValueError
+        with self.assertRaises(ValueError):
+            mdl.update_demand({5: 100})
+        with self.assertRaises(ValueError):
+            mdl.update_parameters({'Freezer Capacity': 100})
+
+        # Sample 4: setup cost, expected ValueError, at construction and on update, with the parameters unchanged
+        with self.assertRaises(ValueError):
+            mdl.update_parameters({'Setup Cost': 100})
+        self.assertEqual(mdl.parameters['Setup Cost'], 0)
+        dat2 = input_schema.copy_pan_dat(self.dat)
+        dat2.parameters = pd.DataFrame([['Minimum Batch Size', 300]], columns=['Name', 'Value'])
+        with self.assertRaises(ValueError):
+            PastesianModel(dat2)
+
+        # Sample 5: production capacity too low, expected 'Infeasible' with the same diagnostics as solve()
+        mdl.update_parameters({'Production Capacity': 100})
+        sln = mdl.solve()
+        self.assertEqual(dict(zip(sln.solver_status['Statistic'], sln.solver_status['Value']))['Status'], 'Infeasible')
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.diagnostics, solve(mdl.dat).diagnostics))
+        self.assertFalse(sln.diagnostics.empty)
+
+    def test_solution_cache(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SolutionCache(maxsize=1, directory=directory)
+
+            # Sample 1: first call is a miss, the same data with shuffled rows is a hit
+            sln = solve(self.dat, cache=cache)
+            dat2 = input_schema.copy_pan_dat(self.dat)
+            dat2.demand = dat2.demand.iloc[::-1]
+            dat2.costs = dat2.costs.iloc[::-1]
+            sln2 = solve(dat2, cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, sln2.production_flow))
+            self.assertIsNone(pd.testing.assert_frame_equal(sln.costs, sln2.costs))
+
+            # Sample 2: different demand and different engine are misses
+            dat3 = input_schema.copy_pan_dat(self.dat)
+            dat3.demand['Demand'] = dat3.demand['Demand'] + 1
+            solve(dat3, cache=cache)
+            solve(self.dat, engine='flow', cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+            # Sample 3: evicted from memory (maxsize=1), expected hit from disk
+            solve(self.dat, cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (2, 3))
+            self.assertEqual(len(cache), 1)
+
+            # Sample 4: truncated files on disk, e.g., from a killed process, expected misses, then stored again
+            for entry in os.scandir(directory):
+                with open(entry.path, 'r+b') as f:
+                    f.truncate(10)
+            cache = SolutionCache(directory=directory)
+            sln2 = solve(self.dat, cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (0, 1))
+            self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, sln2.production_flow))
+            self.assertFalse([name for name in os.listdir(directory) if not name.endswith('.pkl')])
+            cache = SolutionCache(directory=directory)
+            solve(self.dat, cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+
+    def test_bench(self):
+        # Sample 1: same seed, expected the same instance, which passes all data integrity checks
+        dat = generate_instance(100, seed=7, demand='seasonal', capacity='tight')
+        dat2 = generate_instance(100, seed=7, demand='seasonal', capacity='tight')
+        for table_name in input_schema.all_tables:
+            self.assertIsNone(pd.testing.assert_frame_equal(getattr(dat, table_name), getattr(dat2, table_name)))
+        self.assertFalse(input_schema.find_data_type_failures(dat))
+        self.assertFalse(input_schema.find_foreign_key_failures(dat))
+
+        # Sample 2: tight capacity is still feasible, with every phase timed
+        seconds, status = time_phases(dat, engine='pulp')
+        self.assertEqual(status, 'Optimal')
+        self.assertSetEqual(set(seconds), set(PHASES))
+        self.assertGreater(seconds['presolve'], 0)
+
+        # Sample 3: capacity below the average demand, expected the presolve status without building a model
+        dat3 = input_schema.copy_pan_dat(dat)
+        dat3.parameters.loc[dat3.parameters['Name'] == 'Production Capacity', 'Value'] = 1
+        seconds, status = time_phases(dat3, engine='pulp')
+        self.assertEqual(status, 'Infeasible')
+        self.assertGreater(seconds['presolve'], 0)
+        self.assertEqual(seconds['build'], 0)
+
+        # Sample 4: results saved as JSON and compared against a baseline that was twice as fast
+        results = run_benchmark(sizes=(10, 50), engines=('flow', 'highs'))
+        self.assertEqual(len(results['cases']), 4)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            save_results(results, path)
+            baseline = load_results(path)
+        self.assertListEqual(compare(results, baseline, min_seconds=0.0), [])
+        for case in baseline['cases']:
+            case['seconds'] = {phase: value / 2 for phase, value in case['seconds'].items()}
+        regressions = compare(results, baseline, min_seconds=0.0)
+        self.assertTrue(regressions)
+        self.assertTrue(all(r['ratio'] > 1.25 for r in regressions))
+
+    def test_run_stats(self):
+        # Sample 1: default solve, expected empty run_stats table
+        self.assertTrue(solve(self.dat).run_stats.empty)
+
+        # Sample 2: stats=True, expected times of every phase, model size and status
+        run_stats = solve(self.dat, engine='highs', stats=True).run_stats.set_index(['Phase', 'Statistic'])['Value']
+        for phase in PHASES + ('total',):
+            self.assertGreaterEqual(run_stats[phase, 'Wall Time (s)'], 0)
+            self.assertGreater(run_stats[phase, 'Peak Memory (MB)'], 0)
+        self.assertEqual(run_stats['build', 'Variables'], 8)
+        self.assertEqual(run_stats['build', 'Constraints'], 4)
+        self.assertEqual(run_stats['solve', 'Status'], 'Optimal')
+        self.assertFalse(output_schema.find_data_type_failures(solve(self.dat, engine='flow', stats=True)))
+
+        # Sample 3: callbacks passed to solve and registered globally, expected one call each
+        calls = []
+        add_callback(calls.append)
+        try:
+            sln = solve(self.dat, engine='flow', callback=lambda run_stats: calls.append('callback'))
+        finally:
+            remove_callback(calls.append)
+        self.assertTrue(sln.run_stats.empty)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[1], 'callback')
+        self.assertEqual(calls[0].records['solve', 'Status'], 'Optimal')
+
+        # Sample 4: stats=True on invalid data, expected ValueError and tracemalloc stopped
+        dat2 = input_schema.copy_pan_dat(self.dat)
+        dat2.demand = dat2.demand.iloc[1:]
+        with self.assertRaises(ValueError):
+            solve(dat2, stats=True)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_sweep_demand(self):
+        # Sample 1: every multiplier, interpolated or not, expected the same total cost as solving it from scratch
+        multipliers = [0.5, 0.75, 1.0, 1.25, 1.5, 1.75, 2.0]
+        sweep = sweep_demand(self.dat, multipliers + [1.0])
+        self.assertEqual(len(sweep), len(multipliers) * 4)
+        curve = sweep.groupby('Multiplier')['Total Cost'].sum()
+        for multiplier in multipliers:
+            dat2 = input_schema.copy_pan_dat(self.dat)
+            dat2.demand['Demand'] = dat2.demand['Demand'] * multiplier
+            self.assertTrue(isclose(curve[multiplier], solve(dat2, engine='highs').costs['Total Cost'].sum(),
+                                    abs_tol=1e-1))
+
+        # Sample 2: production capacity of 500, expected the infeasible multipliers with their status and no plan
+        dat3 = input_schema.copy_pan_dat(self.dat)
+        dat3.parameters = pd.DataFrame([['Production Capacity', 500]], columns=['Name', 'Value'])
+        sweep = sweep_demand(dat3, multipliers)
+        optimal = sweep[sweep['Status'] == 'Optimal']
+        self.assertListEqual(sorted(optimal['Multiplier'].unique()), [0.5, 0.75, 1.0, 1.25, 1.5, 1.75])
+        self.assertListEqual(sweep.loc[sweep['Multiplier'] == 2.0, 'Status'].tolist(), ['Infeasible'] * 4)
+        self.assertTrue(sweep.loc[sweep['Multiplier'] == 2.0, 'Total Cost'].isna().all())
+
+        # Sample 3: setup costs and multiple products, expected ValueError
+        dat3.parameters = pd.DataFrame([['Setup Cost', 500]], columns=['Name', 'Value'])
+        with self.assertRaises(ValueError):
+            sweep_demand(dat3, multipliers)
+        with self.assertRaises(ValueError):
+            sweep_demand(generate_multi_product_instance(2, 2, 4, seed=0), multipliers)
+
+    @unittest.skipIf(matrix.linprog is None, 'scipy is not installed')
+    def test_solve_stochastic(self):
+        # Sample 1: a single scenario with the original demand, expected the same plan as solve()
+        dat = input_schema.copy_pan_dat(self.dat)
+        dat.scenario_demand = dat.demand.assign(**{'Scenario ID': 'forecast'})
+        dat.demand = dat.demand.iloc[:0]
+        sln = solve_stochastic(dat, workers=2)
+        status = dict(zip(sln.solver_status['Statistic'], sln.solver_status['Value']))
+        self.assertEqual(status['Status'], 'Optimal')
+        self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                        check_dtype=False, atol=1e-6))
+        self.assertAlmostEqual(status['Expected Cost'], self.sln.costs['Total Cost'].sum(), places=2)
+
+        # Sample 2: low and high demand scenarios (chunks of one scenario), expected the cost of the plan in each of
+        # them to average out to the expected cost, with no backlog when backlog is expensive
+        high = dat.scenario_demand.assign(**{'Scenario ID': 'high', 'Demand': dat.scenario_demand['Demand'] * 2})
+        dat.scenario_demand = pd.concat([dat.scenario_demand, high], ignore_index=True)
+        dat.scenarios = pd.DataFrame([['high', 0.25]], columns=['Scenario ID', 'Probability'])
+        sln = solve_stochastic(dat, chunk_size=1)
+        status = dict(zip(sln.solver_status['Statistic'], sln.solver_status['Value']))
+        self.assertEqual(status['Status'], 'Optimal')
+        self.assertLessEqual(status['Lower Bound'], status['Expected Cost'] + 1e-6)
+        costs = sln.scenario_costs.set_index('Scenario ID')
+        self.assertAlmostEqual(costs.loc['forecast', 'Total Cost'] * 0.75 + costs.loc['high', 'Total Cost'] * 0.25,
+                               status['Expected Cost'], places=1)
+        self.assertEqual(costs['Backlog Cost'].sum(), 0)
+
+        # Sample 3: cheap backlog, expected some backlog in the high scenario
+        dat.parameters = pd.DataFrame([['Backlog Cost', 0.5]], columns=['Name', 'Value'])
+        costs = solve_stochastic(dat).scenario_costs.set_index('Scenario ID')
+        self.assertGreater(costs.loc['high', 'Backlog Cost'], 0)
+
+        # Sample 4: probabilities over 1, expected ValueError
+        dat.scenarios = pd.DataFrame([['high', 0.6], ['forecast', 0.6]], columns=['Scenario ID', 'Probability'])
+        with self.assertRaises(ValueError):
+            solve_stochastic(dat)
+
+    @unittest.skipIf(columnar.pa is None, 'pyarrow is not installed')
+    def test_columnar(self):
+        with tempfile.TemporaryDirectory() as directory:
+            # Sample 1: Parquet and Feather round trips, expected the same tables with the schema's types
+            for extension in ('.parquet', '.feather'):
+                path = os.path.join(directory, 'inputs' + extension)
+                write_columnar(input_schema, self.dat, path)
+                dat = read_columnar(input_schema, path)
+                for table_name in ('parameters', 'demand', 'costs'):
+                    self.assertIsNone(pd.testing.assert_frame_equal(getattr(dat, table_name),
+                                                                    getattr(self.dat, table_name)))
+                self.assertEqual(dat.demand['Demand'].dtype, 'int64')
+                self.assertTrue(dat.capacities.empty)
+
+            # Sample 2: command line from Parquet to Feather, expected the same output as solve
+            output_path = os.path.join(directory, 'outputs.feather')
+            self.assertEqual(main(['-i', os.path.join(directory, 'inputs.parquet'), '-o', output_path]), 0)
+            sln = read_columnar(output_schema, output_path)
+            self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                            check_dtype=False))
+
+            # Sample 3: directory without a columnar extension, expected ValueError
+            with self.assertRaises(ValueError):
+                read_columnar(input_schema, directory)
+
+    def test_main_optional_tables(self):
+        with tempfile.TemporaryDirectory() as directory:
+            input_path = os.path.join(directory, 'input.json')
+            input_schema.json.write_file(self.dat, input_path)
+            output_path = os.path.join(directory, 'outputs')
+            os.makedirs(output_path)
+            with open(os.path.join(output_path, 'diagnostics.csv'), 'w') as f:
+                f.write('Period ID,Issue,Amount\n1,Production Shortfall,10\n')
+
+            # Sample 1: single-product data set, expected no missing table listed and no empty optional output table,
+            # even from a previous run
+            with contextlib.redirect_stdout(io.StringIO()) as log:
+                self.assertEqual(main(['-i', input_path, '-o', output_path]), 0)
+            self.assertNotIn('could not be found', log.getvalue())
+            self.assertSetEqual(set(os.listdir(output_path)),
+                                {f'{table_name}.csv' for table_name in ('production_flow', 'costs', 'solver_status')})
+
+            # Sample 2: a required table missing, expected it listed, without the optional ones
+            with contextlib.redirect_stdout(io.StringIO()) as log:
+                with quiet_optional_tables():
+                    input_schema.json.create_pan_dat(json.dumps({'demand': json.loads(
+                        input_schema.json.write_file(self.dat, ''))['demand']}))
+            self.assertIn('costs', log.getvalue().split())
+            self.assertNotIn('capacities', log.getvalue().split())
+
+            # Sample 3: the same data set without the context manager, expected ticdat's message that it filters, i.e.,
+            # its header followed by one missing table per line (if this fails, ticdat changed its wording or layout)
+            with contextlib.redirect_stdout(io.StringIO()) as log:
+                input_schema.json.create_pan_dat(json.dumps({'demand': json.loads(
+                    input_schema.json.write_file(self.dat, ''))['demand']}))
+            lines = log.getvalue().split('\n')
+            header = [i for i, line in enumerate(lines)
+                      if line.startswith('The following table names could not be found')]
+            self.assertEqual(len(header), 1)
+            self.assertIn('costs', lines[header[0] + 1:])
+            self.assertIn('capacities', lines[header[0] + 1:])
+
+            # Sample 4: reading raises, expected what was printed before to be printed anyway
+            with contextlib.redirect_stdout(io.StringIO()) as log:
+                with self.assertRaises(ValueError):
+                    with quiet_optional_tables():
+                        print('the reason of the failure')
+                        raise ValueError
+            self.assertIn('the reason of the failure', log.getvalue())
+
+    def test_solve_server(self):
+        def request(url, data=None):
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, data=data)) as response:
+                    return response.status, response.read().decode()
+            except urllib.error.HTTPError as e:
+                return e.code, e.read().decode()
+
+        payload = input_schema.json.write_file(self.dat, '').encode()
+        with SolveServer(port=0, workers=1, max_queue=0, timeout=30) as server:
+            # Sample 1: valid data set, expected the same output as solve
+            status, body = request(server.url + '/solve?engine=flow', payload)
+            self.assertEqual(status, 200)
+            sln = output_schema.json.create_pan_dat(body)
+            self.assertIsNone(pd.testing.assert_frame_equal(sln.production_flow, self.sln.production_flow,
+                                                            check_dtype=False))
+
+            # Sample 2: invalid data set and unknown solve argument, expected 400
+            self.assertEqual(request(server.url + '/solve', b'[1, 2]')[0], 400)
+            self.assertEqual(request(server.url + '/solve?solver=cbc', payload)[0], 400)
+
+            # Sample 3: solve longer than the timeout, expected 504
+            server.timeout = 1e-3
+            self.assertEqual(request(server.url + '/solve', payload)[0], 504)
+
+            # Sample 4: health and metrics endpoints
+            self.assertEqual(json.loads(request(server.url + '/health')[1]), {'status': 'ok', 'workers': 1})
+            metrics = json.loads(request(server.url + '/metrics')[1])
+            self.assertEqual((metrics['requests'], metrics['succeeded'], metrics['failed'], metrics['timed_out']),
+                             (3, 1, 1, 1))
+
+            # Sample 5: the worker killed while solving, expected 500, then the pool started again and no slot leaked
+            def in_flight():
+                return json.loads(request(server.url + '/metrics')[1])['in_flight']
+
+            while in_flight():  # the solve that timed out
+                time.sleep(0.01)
+            server.timeout = 30
+            big_payload = input_schema.json.write_file(generate_instance(20000, seed=0), '').encode()
+            with ThreadPoolExecutor(1) as executor:
+                response = executor.submit(request, server.url + '/solve?engine=flow', big_payload)
+                while not in_flight():
+                    time.sleep(0.01)
+                for pid in list(server._pool._processes):
+                    os.kill(pid, signal.SIGKILL)
+                self.assertEqual(response.result()[0], 500)
+            for _ in range(2):
+                self.assertEqual(request(server.url + '/solve?engine=flow', payload)[0], 200)
+            metrics = json.loads(request(server.url + '/metrics')[1])
+            self.assertEqual((metrics['requests'], metrics['succeeded'], metrics['failed'], metrics['in_flight']),
+                             (6, 3, 2, 0))
+
+    def test_watcher(self):
+        with tempfile.TemporaryDirectory() as in_dir, tempfile.TemporaryDirectory() as out_dir:
+            input_schema.csv.write_directory(self.dat, in_dir)
+            watcher = Watcher(in_dir, out_dir, debounce=1, log=lambda message: None)
+
+            # Sample 1: first update, expected all output tables written, with the same plan as solve()
+            report = watcher.update()
+            self.assertEqual((report['mode'], report['status']), ('rebuilt', 'Optimal'))
+            self.assertSetEqual(set(report['written']),
+                                set(output_schema.all_tables).difference(OPTIONAL_OUTPUT_TABLES))
+            self.assertFalse(os.path.exists(os.path.join(out_dir, 'diagnostics.csv')))
+            with quiet_optional_tables():
+                costs = output_schema.csv.create_pan_dat(out_dir).costs
+            self.assertTrue(isclose(costs['Total Cost'].sum(), solve(self.dat).costs['Total Cost'].sum(),
+                                    rel_tol=1e-6))
+
+            # Sample 2: a demand change, debounced, expected an in place re-solve rewriting only changed outputs
+            demand = self.dat.demand.assign(Demand=self.dat.demand['Demand'] + 10)
+            demand.to_csv(os.path.join(in_dir, 'demand.csv'), index=False)
+            self.assertIsNone(watcher.poll(now=100.0))
+            self.assertIsNone(watcher.poll(now=100.5))
+            report = watcher.poll(now=101.0)
+            self.assertEqual((report['mode'], report['changes']), ('in place', {'demand': (0, 0, len(demand))}))
+            self.assertIn('production_flow', report['written'])
+            self.assertNotIn('parameters', report['written'])
+            expected = solve(input_schema.PanDat(**{**{t: getattr(self.dat, t) for t in input_schema.all_tables},
+                                                    'demand': demand}))
+            with quiet_optional_tables():
+                costs = output_schema.csv.create_pan_dat(out_dir).costs
+            self.assertTrue(isclose(costs['Total Cost'].sum(), expected.costs['Total Cost'].sum(), rel_tol=1e-6))
+            self.assertIsNone(watcher.poll(now=102.0))
+
+            # Sample 3: same contents rewritten, expected 'unchanged' and nothing written
+            path = os.path.join(in_dir, 'demand.csv')
+            demand.to_csv(path, index=False)
+            os.utime(path, ns=(os.stat(path).st_mtime_ns + 10 ** 9,) * 2)
+            report = watcher.update()
+            self.assertEqual((report['mode'], report['written']), ('unchanged', []))
+
+            # Sample 4: a negative demand, expected 'invalid' and the previous outputs kept
+            demand.assign(Demand=-demand['Demand']).to_csv(path, index=False)
+            os.utime(path, ns=(os.stat(path).st_mtime_ns + 2 * 10 ** 9,) * 2)
+            report = watcher.update()
+            self.assertEqual((report['mode'], report['written']), ('invalid', []))
+            self.assertTrue(report['failures'])
+
+            # Sample 5: a valid demand and an invalid costs file in the same batch, then only costs fixed, expected
+            # the demand change applied by the fix
+            demand.assign(Demand=demand['Demand'] + 100).to_csv(path, index=False)
+            costs_path = os.path.join(in_dir, 'costs.csv')
+            self.dat.costs.assign(**{'Production Cost': -1}).to_csv(costs_path, index=False)
+            for file_path in (path, costs_path):
+                os.utime(file_path, ns=(os.stat(file_path).st_mtime_ns + 3 * 10 ** 9,) * 2)
+            self.assertEqual(watcher.update()['mode'], 'invalid')
+            self.dat.costs.to_csv(costs_path, index=False)
+            os.utime(costs_path, ns=(os.stat(costs_path).st_mtime_ns + 4 * 10 ** 9,) * 2)
+            report = watcher.update()
+            self.assertEqual(report['mode'], 'in place')
+            self.assertEqual(report['changes']['demand'], (0, 0, len(demand)))
+            self.assertListEqual(list(watcher.tables['demand']['Demand']), list(demand['Demand'] + 100))
+
+    def test_import_time(self):
+        # Importing the package (e.g., for its *_config dicts) must not import the heavy dependencies, and must fit in
+        # a budget far below the ~1s they take
+        budget = 0.3  # seconds
+        code = ('import sys, time; start = time.perf_counter(); import pastesian; pastesian.input_tables_config; '
+                'print(time.perf_counter() - start); print(*sorted({"ticdat", "pandas", "pulp", "numpy"} & '
+                'set(sys.modules)))')
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(_this_directory()))
+        elapsed, heavy_modules = result.stdout.split('\n')[:2]
+        self.assertEqual(heavy_modules, '')
+        self.assertLess(float(elapsed), budget)
+
     def test_action_update_demand(self):
         # Safe operation
         demand_expected = self.dat.demand.copy()
@@ -94,6 +831,36 @@ class TestPastesian(unittest.TestCase):
         self.assertIsNone(pd.testing.assert_frame_equal(demand_expected, demand_to_test, check_dtype=False,
                                                         rtol=1.0e-5, atol=1.0e-8))
 
+    def test_scenario_overlay(self):
+        demand = (self.dat.demand['Demand'] * 1.1).round().astype(int)
+        scenario = ScenarioOverlay(self.dat, columns={('demand', 'Demand'): demand})
+        dat = input_schema.copy_pan_dat(self.dat)
+        dat.demand = dat.demand.assign(Demand=demand)
+
+        # Sample 1: unchanged tables are shared with the base, which is left untouched, expected the same solution as
+        # the copied data set
+        self.assertIs(scenario.costs, self.dat.costs)
+        self.assertIs(scenario.time_periods, self.dat.time_periods)
+        self.assertEqual(scenario.changed_tables, ['demand'])
+        self.assertEqual(list(scenario.demand['Demand']), list(demand))
+        self.assertFalse(self.dat.demand['Demand'].equals(demand))
+        self.assertTrue(input_schema.good_pan_dat_object(scenario))
+        sln, expected = solve(scenario), solve(dat)
+        self.assertEqual(sln.production_flow['Production Quantity'].tolist(),
+                         expected.production_flow['Production Quantity'].tolist())
+        self.assertEqual(sln.costs['Total Cost'].tolist(), expected.costs['Total Cost'].tolist())
+
+        # Sample 2: a scenario of a scenario, expected both changes on top of the original base
+        derived = scenario.with_changes(columns={('costs', 'Production Cost'): self.dat.costs['Production Cost'] * 2})
+        self.assertIs(derived.base, self.dat)
+        self.assertEqual(derived.changed_tables, ['costs', 'demand'])
+        self.assertEqual(list(derived.demand['Demand']), list(demand))
+        self.assertIs(scenario.costs, self.dat.costs)
+
+        # Sample 3: values of the wrong length, expected a ValueError
+        with self.assertRaises(ValueError):
+            ScenarioOverlay(self.dat, columns={('demand', 'Demand'): [1, 2]}).demand
+
     def test_check_each_period_id_column(self):
         # Sample 1: original good demand.csv
         self.assertIsNone(check_each_period_id_column(self.dat))
@@ -110,6 +877,59 @@ class TestPastesian(unittest.TestCase):
         with self.assertRaises(ValueError):
             check_each_period_id_column(dat3)
 
+        # Sample 4: problems in several tables, expected all of them in a single ValueError
+        dat4 = input_schema.copy_pan_dat(self.dat)
+        dat4.demand[self.period_id_field_name] = dat4.demand[self.period_id_field_name] * 1.532
+        dat4.time_periods.drop(0, axis=0, inplace=True)
+        with self.assertRaisesRegex(ValueError, r"(?s)demand\['Period ID'\].*time_periods\['Period ID'\]"):
+            check_each_period_id_column(dat4)
+
+        # Sample 5: valid columns, but 'costs' with fewer periods than 'demand', expected ValueError
+        dat5 = input_schema.copy_pan_dat(self.dat)
+        dat5.costs = dat5.costs[dat5.costs[self.period_id_field_name] <= 2]
+        with self.assertRaisesRegex(ValueError, 'exist in demand'):
+            check_each_period_id_column(dat5)
+
+    def test_find_integrity_failures(self):
+        # Sample 1: clean input and output, expected no failure
+        self.assertTrue(find_integrity_failures(self.dat).empty)
+        self.assertTrue(find_integrity_failures(self.sln, output_schema).empty)
+
+        # Sample 2: one failure of each check, expected the same failures as ticdat, in a single table
+        dat = input_schema.copy_pan_dat(self.dat)
+        dat.demand = pd.concat([dat.demand, dat.demand.iloc[[0]]], ignore_index=True).astype(object)
+        dat.demand.loc[1, 'Demand'] = -3
+        dat.costs.loc[0, 'Period ID'] = 9
+        dat.parameters = pd.DataFrame([['Lasagnas To Start', 1.5], ['Lasagnas', 1]], columns=['Name', 'Value'])
+        failures = find_integrity_failures(dat)
+        self.assertListEqual(failures.values.tolist(), [
+            ['costs', 'Foreign Key', 'time_periods (Period ID)', 0],
+            ['demand', 'Data Type', 'Demand', 1],
+            ['demand', 'Duplicate', 'Period ID', 4],
+            ['parameters', 'Data Row', 'Good Name/Value Check', 0],
+            ['parameters', 'Data Row', 'Good Name/Value Check', 1]])
+        self.assertSetEqual({(table, check) for table, check, _, _ in failures.values},
+                            {(key[0], check) for check, found in (
+                                ('Data Type', input_schema.find_data_type_failures(dat)),
+                                ('Duplicate', {(k,): v for k, v in input_schema.find_duplicates(dat).items()}),
+                                ('Foreign Key', input_schema.find_foreign_key_failures(dat)),
+                                ('Data Row', input_schema.find_data_row_failures(dat))) for key in found})
+
+        # Sample 3: output with a wrong total, expected a failure of the vectorized predicate
+        sln = output_schema.copy_pan_dat(self.sln)
+        sln.costs.loc[2, 'Total Cost'] += 1
+        self.assertListEqual(find_integrity_failures(sln, output_schema).values.tolist(),
+                             [['costs', 'Data Row', 'Total Cost = Production Cost + Inventory Cost', 2]])
+
+        # Sample 4: totals on both sides of the tolerance, expected the same data row failures as ticdat
+        sln.costs.loc[0, 'Total Cost'] += 0.009
+        sln.costs.loc[1, 'Total Cost'] -= 0.011
+        failures = find_integrity_failures(sln, output_schema)
+        self.assertListEqual(sorted(failures.loc[failures['Check'] == 'Data Row', 'Row']),
+                             sorted(row for found in output_schema.find_data_row_failures(sln, as_table=False).values()
+                                    for row in found[found].index))
+        self.assertListEqual(sorted(failures['Row']), [1, 2])
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)